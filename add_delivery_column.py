@@ -8,6 +8,8 @@ import sys
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+from brdata_processor.backfill import backfill_column
+
 # Load environment variables
 load_dotenv()
 
@@ -49,53 +51,30 @@ def add_ready_by_column():
     
     return True
 
+def delivery_dates(frame):
+    """Sample delivery year for each property, spread evenly by ID"""
+    mod = frame['id'] % 7
+    return (2024 + mod).astype(str).where(mod != 0, 'Ready')
+
 def populate_delivery_dates():
     """Populate ready_by column with sample delivery dates"""
     try:
         print("🔧 Populating delivery dates...")
         
-        # Get total count of properties
-        result = supabase.table('brdata_properties').select('id', count='exact').execute()
-        total_count = result.count or 0
+        # Values are computed a chunk at a time and applied with one backfill_column call per chunk
+        def on_chunk(report):
+            print(f"📝 Updated {report.rows_read:,} properties so far ({report.rows_updated:,} changed)")
         
-        print(f"📊 Total properties: {total_count}")
+        report = backfill_column(
+            'brdata_properties', 'ready_by', delivery_dates,
+            base_url=SUPABASE_URL, api_key=SUPABASE_KEY, on_chunk=on_chunk,
+        )
         
-        if total_count == 0:
+        if report.rows_read == 0:
             print("⚠️  No properties found to update")
             return True
         
-        # Update in batches to avoid timeouts
-        batch_size = 1000
-        updated_count = 0
-        
-        for offset in range(0, total_count, batch_size):
-            # Get batch of properties
-            result = supabase.table('brdata_properties')\
-                .select('id')\
-                .range(offset, offset + batch_size - 1)\
-                .execute()
-            
-            if not result.data:
-                break
-            
-            # Update each property with a delivery date
-            for i, prop in enumerate(result.data):
-                prop_id = prop['id']
-                
-                # Generate sample delivery dates based on ID
-                delivery_date = generate_delivery_date(prop_id)
-                
-                # Update the property
-                supabase.table('brdata_properties')\
-                    .update({'ready_by': delivery_date})\
-                    .eq('id', prop_id)\
-                    .execute()
-                
-                updated_count += 1
-            
-            print(f"📝 Updated batch: {offset + 1} to {min(offset + batch_size, total_count)}")
-        
-        print(f"✅ Successfully updated {updated_count} properties with delivery dates!")
+        print(f"✅ Successfully updated {report.rows_updated} properties with delivery dates!")
         
     except Exception as e:
         print(f"❌ Error populating delivery dates: {e}")
@@ -103,26 +82,6 @@ def populate_delivery_dates():
     
     return True
 
-def generate_delivery_date(prop_id):
-    """Generate a sample delivery year based on property ID"""
-    # Use modulo to distribute years evenly
-    mod = prop_id % 7
-    
-    if mod == 0:
-        return 'Ready'
-    elif mod == 1:
-        return '2025'
-    elif mod == 2:
-        return '2026'
-    elif mod == 3:
-        return '2027'
-    elif mod == 4:
-        return '2028'
-    elif mod == 5:
-        return '2029'
-    elif mod == 6:
-        return '2030'
-
 def verify_column():
     """Verify the column was added correctly"""
     try:
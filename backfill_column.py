@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Backfill one column of an inventory table from a rule computed locally
+
+Example:
+    python backfill_column.py --table brdata_properties --column price_per_meter \
+        --expr "price_in_egp / unit_area" --source price_in_egp unit_area --filter unit_area=gt.0
+
+Needs the backfill_column function from supabase/migrations/010_backfill_column_rpc.sql
+and a key allowed to update the table.
+"""
+
+import argparse
+import logging
+import os
+
+from brdata_processor.backfill import DEFAULT_CHUNK_ROWS, backfill_column, expression_rule
+from brdata_processor.config import SUPABASE_KEY, SUPABASE_URL
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compute a column locally and apply it set-based")
+    parser.add_argument('--table', default='brdata_properties', help="inventory table to update")
+    parser.add_argument('--column', required=True, help="column to fill")
+    parser.add_argument('--expr', required=True,
+                        help="pandas DataFrame.eval expression over the source columns and the key")
+    parser.add_argument('--source', nargs='*', default=[], help="columns the expression reads")
+    parser.add_argument('--filter', nargs='*', default=[], metavar='COLUMN=OP.VALUE',
+                        help="PostgREST filters limiting the rows, e.g. ready_by=is.null")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_ROWS, help="rows per update call")
+    parser.add_argument('--resume', action='store_true', help="continue after the last chunk a previous run applied")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    filters = dict(item.split('=', 1) for item in args.filter)
+    api_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY', SUPABASE_KEY)
+
+    print(f"🧮 Backfilling {args.table}.{args.column} = {args.expr}")
+
+    def on_chunk(report):
+        print(f"📝 Chunk {report.chunks}: {report.rows_read:,} rows read, {report.rows_updated:,} changed "
+              f"({report.rows_read / report.elapsed if report.elapsed else 0:,.0f} rows/s)")
+
+    report = backfill_column(
+        args.table, args.column, expression_rule(args.expr), args.source, filters,
+        chunk_rows=args.chunk_size, resume=args.resume,
+        base_url=SUPABASE_URL, api_key=api_key, on_chunk=on_chunk,
+    )
+    print(f"✅ {report.rows_updated:,} of {report.rows_sent:,} rows changed in {report.chunks} calls, "
+          f"{report.elapsed:.1f}s")
+
+if __name__ == "__main__":
+    main()
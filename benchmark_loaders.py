@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Benchmark every load strategy against the local PostgREST stand-in
+
+Each REST strategy loads the same pre-transformed rows into a fresh local
+server with the same injected latency and failure rate, so the rows/s
+column compares the strategies themselves. With --database-url the COPY and
+shadow-swap loaders are timed against that Postgres too (they read and
+transform the CSV themselves, so their numbers include that work).
+
+    python benchmark_loaders.py --csv brdata_properties.csv --rows 20000 --latency 0.05
+"""
+
+import argparse
+import itertools
+import logging
+import random
+
+import requests
+
+from brdata_processor.config import rest_headers, rest_url
+from brdata_processor.local_rest import FaultProfile, LocalRestServer
+from brdata_processor.metrics import REPORT_DIR, RunMetrics
+from brdata_processor.serialization import dumps
+from brdata_processor.streaming import stream_csv_batches
+from brdata_processor.sync import sync_batches
+from brdata_processor.uploader import DEFAULT_BATCH_ROWS, ConcurrentUploader
+from brdata_processor.upsert import deactivate_missing, mark_active, upsert_uploader
+
+TABLE = 'brdata_properties'
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare load strategies by rows/s on a local REST stand-in")
+    parser.add_argument('--csv', required=True, help="processed BRData CSV to load")
+    parser.add_argument('--rows', type=int, default=20000, help="rows to load per strategy")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_ROWS)
+    parser.add_argument('--in-flight', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds the stand-in adds to every request")
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="share of writes answered 503")
+    parser.add_argument('--max-body-kb', type=int, default=None, help="stand-in answers larger bodies with 413")
+    parser.add_argument('--strategies', nargs='*', help="run only these strategies")
+    parser.add_argument('--database-url', default=None, help="also benchmark the COPY and swap loaders here")
+    parser.add_argument('--report-dir', default=REPORT_DIR)
+    return parser.parse_args()
+
+def batched(records, size):
+    return (records[i:i + size] for i in range(0, len(records), size))
+
+def sequential(url, records, args, stage):
+    """One request per batch, one at a time, a new connection each: how the scripts used to upload"""
+    rows = 0
+    for batch in batched(records, args.batch_size):
+        response = requests.post(rest_url(TABLE, url), data=dumps(batch), headers=rest_headers(), timeout=60)
+        stage.observe_request(response.elapsed.total_seconds(), ok=response.ok)
+        rows += len(batch) if response.ok else 0
+    return rows
+
+def fixed_batches(url, records, args, stage):
+    """Pooled concurrent uploads at a fixed batch size"""
+    uploader = ConcurrentUploader(TABLE, max_in_flight=args.in_flight, requests_per_second=None,
+                                  base_url=url, adaptive=False)
+    report = uploader.upload(batched(records, args.batch_size))
+    stage.add_upload(report)
+    return report.rows_uploaded
+
+def adaptive(url, records, args, stage, compress=False):
+    """Pooled concurrent uploads cut to the AIMD byte budget"""
+    uploader = ConcurrentUploader(TABLE, max_in_flight=args.in_flight, requests_per_second=None,
+                                  base_url=url, compress=compress)
+    report = uploader.upload(batched(records, args.batch_size))
+    stage.add_upload(report)
+    return report.rows_uploaded
+
+def adaptive_gzip(url, records, args, stage):
+    return adaptive(url, records, args, stage, compress=True)
+
+def upsert(url, records, args, stage):
+    """Merge on the unit id and deactivate units missing from the snapshot"""
+    seen = set()
+    uploader = upsert_uploader(TABLE, max_in_flight=args.in_flight, requests_per_second=None, base_url=url)
+    report = uploader.upload(mark_active(batched(records, args.batch_size), 'id', seen))
+    stage.add_upload(report)
+    deactivate_missing(TABLE, seen, url)
+    return report.rows_uploaded
+
+def preload(url, records, args):
+    """Untimed initial sync, so the table carries the fingerprints the timed sync diffs against"""
+    sync_batches(TABLE, batched(records, args.batch_size), args.batch_size, url,
+                 max_in_flight=args.in_flight, requests_per_second=None)
+
+def sync_changed(url, records, args, stage):
+    """Hash diff against an already loaded table where 1% of the units changed"""
+    changed = [dict(row) for row in records]
+    for row in random.Random(0).sample(changed, max(1, len(changed) // 100)):
+        row['price_in_egp'] = (row.get('price_in_egp') or 0) + 1
+    report = sync_batches(TABLE, batched(changed, args.batch_size), args.batch_size, url,
+                          max_in_flight=args.in_flight, requests_per_second=None)
+    stage.add_upload(report.upload)
+    # Throughput is snapshot rows reconciled, not just the 1% sent
+    return len(changed)
+
+# name -> (untimed preparation or None, timed load)
+REST_STRATEGIES = {
+    'sequential': (None, sequential),
+    'fixed_batches': (None, fixed_batches),
+    'adaptive': (None, adaptive),
+    'adaptive_gzip': (None, adaptive_gzip),
+    'upsert': (None, upsert),
+    'sync_1pct': (preload, sync_changed),
+}
+
+def load_with_postgres(name, args):
+    """Direct-connection loaders; they stream the whole CSV"""
+    if name == 'copy':
+        from brdata_processor.copy_loader import copy_csv_to_postgres
+        return copy_csv_to_postgres(args.csv, TABLE, args.database_url).rows_copied
+    from brdata_processor.swap_loader import swap_load_csv
+    return swap_load_csv(args.csv, TABLE, args.database_url, min_active_ratio=0).rows_loaded
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    profile = FaultProfile(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate,
+                           max_body_bytes=args.max_body_kb * 1024 if args.max_body_kb else None, seed=0)
+    selected = args.strategies or list(REST_STRATEGIES) + (['copy', 'swap'] if args.database_url else [])
+
+    print(f"📖 Transforming the first {args.rows:,} rows of {args.csv}...")
+    rows = itertools.chain.from_iterable(stream_csv_batches(args.csv, args.batch_size))
+    records = list(itertools.islice(rows, args.rows))
+    print(f"🧪 Stand-in latency {args.latency * 1000:.0f}±{args.jitter * 1000:.0f}ms, "
+          f"failure rate {args.failure_rate:.0%}, {args.in_flight} in flight")
+
+    metrics = RunMetrics('loader_benchmark', args.report_dir)
+    metrics.labels = {'rows': str(len(records)), 'latency': str(args.latency), 'failure_rate': str(args.failure_rate)}
+
+    for name in selected:
+        if name in REST_STRATEGIES:
+            prepare, load = REST_STRATEGIES[name]
+            with LocalRestServer(profile=profile) as server:
+                if prepare:
+                    prepare(server.url, records, args)
+                with metrics.stage(name) as stage:
+                    stage.rows = load(server.url, records, args, stage)
+        elif name in ('copy', 'swap'):
+            with metrics.stage(name) as stage:
+                stage.rows = load_with_postgres(name, args)
+        else:
+            print(f"⚠️ Unknown strategy {name}")
+            continue
+        print(f"✅ {name}: {stage.rows:,} rows at {stage.rows_per_second:,.0f} rows/s")
+
+    print("\n⏱️  Results:")
+    for line in metrics.summary():
+        print(f"   {line}")
+    report_path, prom_path, regressions = metrics.write()
+    print(f"📝 Run report: {report_path} (Prometheus textfile: {prom_path})")
+    for regression in regressions:
+        print(f"🐢 Slower than last run - {regression}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""BRData property pipeline: shared transform and upload helpers for the import scripts"""
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Set-based column backfill: compute values locally, apply them a chunk per request
+
+Rows are read by keyset paging with only the key and the source columns, the
+new values are computed for the whole chunk at once (a vectorised function or
+a DataFrame.eval rule), and each chunk is applied by one call to the
+backfill_column database function. A checkpoint of the last key applied lets
+an interrupted backfill resume where it stopped.
+"""
+
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+import requests
+
+from brdata_processor.config import SUPABASE_KEY, SUPABASE_URL, rest_headers, rpc_url
+from brdata_processor.ledger import LEDGER_DIR
+from brdata_processor.serialization import dumps
+from brdata_processor.uploader import RETRYABLE_STATUS
+from brdata_processor.upsert import conflict_key, fetch_rows
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_ROWS = 5000
+
+@dataclass
+class BackfillReport:
+    """Totals for one backfill run"""
+    rows_read: int = 0
+    rows_sent: int = 0
+    rows_updated: int = 0
+    chunks: int = 0
+    elapsed: float = 0.0
+    resumed_after: Any = None
+
+def expression_rule(expression: str) -> Callable[[pd.DataFrame], pd.Series]:
+    """Rule from a DataFrame.eval expression over the source columns, e.g. 'price_in_egp / unit_area'"""
+    def compute(frame: pd.DataFrame) -> pd.Series:
+        return frame.eval(expression)
+    return compute
+
+def _checkpoint_path(table: str, column: str, directory: str = LEDGER_DIR) -> str:
+    return os.path.join(directory, f'backfill_{table}_{column}.json')
+
+def _read_checkpoint(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_checkpoint(path: str, state: Dict[str, Any]) -> None:
+    """Replace the checkpoint atomically so a crash never leaves half a file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def _chunks(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _apply_chunk(session: requests.Session, url: str, headers: Dict[str, str], body: bytes,
+                 max_attempts: int = 3) -> int:
+    """One backfill_column call; returns the number of rows it changed"""
+    for attempt in range(1, max_attempts + 1):
+        response = session.post(url, data=body, headers=headers, timeout=120)
+        if response.ok:
+            return int(response.json() or 0)
+        if response.status_code not in RETRYABLE_STATUS or attempt == max_attempts:
+            response.raise_for_status()
+        time.sleep(2 ** (attempt - 1))
+    return 0
+
+def backfill_column(
+    table: str,
+    column: str,
+    compute: Callable[[pd.DataFrame], Any],
+    source_columns: List[str] | None = None,
+    filters: Dict[str, str] | None = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    resume: bool = False,
+    base_url: str = SUPABASE_URL,
+    api_key: str = SUPABASE_KEY,
+    on_chunk: Callable[[BackfillReport], None] | None = None,
+) -> BackfillReport:
+    """Compute column for every matching row and apply the values set-based
+
+    compute receives a DataFrame with the key and source columns and returns
+    the new values in the same order. NaN/None values set the column to NULL.
+    """
+    key = conflict_key(table)
+    session = requests.Session()
+    url = rpc_url('backfill_column', base_url)
+    headers = rest_headers(api_key, prefer=None)
+    checkpoint = _checkpoint_path(table, column)
+
+    state = _read_checkpoint(checkpoint) if resume else {}
+    report = BackfillReport(resumed_after=state.get('last_key'))
+    if report.resumed_after is not None:
+        logger.info(f"🔁 Resuming {table}.{column} after {key}={report.resumed_after}")
+
+    started = time.monotonic()
+    rows = fetch_rows(table, key, source_columns or [], filters, base_url, api_key, session,
+                      after=report.resumed_after)
+
+    for chunk in _chunks(rows, chunk_rows):
+        frame = pd.DataFrame(chunk)
+        values = pd.Series(np.asarray(compute(frame), dtype=object), index=frame.index)
+        values = values.where(pd.notna(values), None)
+
+        pairs = [{key: k, column: v} for k, v in zip(frame[key].tolist(), values.tolist())]
+        body = dumps({'target_table': table, 'key_column': key, 'value_column': column, 'pairs': pairs})
+        report.rows_updated += _apply_chunk(session, url, headers, body)
+        report.rows_read += len(chunk)
+        report.rows_sent += len(pairs)
+        report.chunks += 1
+
+        state = {'last_key': chunk[-1][key], 'rows_sent': state.get('rows_sent', 0) + len(pairs)}
+        _write_checkpoint(checkpoint, state)
+        report.elapsed = time.monotonic() - started
+        if on_chunk:
+            on_chunk(report)
+
+    report.elapsed = time.monotonic() - started
+    # A finished backfill starts from the beginning next time
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return report
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""BR commission rates: compiled from the workbook, matched onto the inventory
+
+BR Commissions.xlsx is the source of truth. compile_commissions (run by
+read_commissions.py and at the start of every import) converts it into
+public/commission_rates.json, the only file the app and the pipeline read.
+That file is a compact, versioned table: each developer name once, plus
+[developer index, compound, percentage] rows. The workbook is converted only
+when its SHA-256 differs from the one recorded in the table, so an unchanged
+workbook costs one hash and pandas never parses the Excel file.
+
+The sheet's {Developer, Compound, BR Percentage} rows use
+free-text names such as "ZED west" or "Swanlake Res". The inventory spells
+the same compounds the Nawy way ("ZED West", "Swan Lake Residence").
+CommissionMatcher indexes the sheet once under progressively looser keys.
+It then resolves each inventory (compound, developer) pair to a rate and
+records which tier matched:
+
+    name      normalised words (search_index.normalize_text)
+    compact   the same without spaces ("silversands" == "silver sands")
+    skeleton  consonant skeleton of the compact form ("hights" == "heights")
+    prefix    one name is the start of the other ("swanlakeres...")
+    developer the developer's rate when all its sheet rows agree
+
+When a key matches several sheet rows with different rates, the developer
+decides. If it cannot, that tier is skipped, so a unit never gets a rate
+from an ambiguous match. The looser skeleton and prefix tiers only accept
+sheet rows of the unit's own developer, since short or similar-sounding
+names ("Westown" / "Eastown", "Joya" / "Gaia") collide across developers.
+The developer tier is refused when the unit's developer matches more than
+one sheet developer ("Orascom" is both "Orascom" and "Orascom Gouna").
+Rows without a percentage are left out.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from brdata_processor.ledger import file_sha256
+from brdata_processor.search_index import normalize_text, skeleton
+
+logger = logging.getLogger(__name__)
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMISSIONS_XLSX = os.getenv(
+    'COMMISSIONS_XLSX', os.path.join(_ROOT, 'brdata_processor', 'processed_data', 'BR Commissions.xlsx')
+)
+COMMISSIONS_JSON = os.getenv('COMMISSIONS_JSON', os.path.join(_ROOT, 'public', 'commission_rates.json'))
+TABLE_VERSION = 1
+SHEET_COLUMNS = ['Developer', 'Compound', 'BR Percentage']
+MATCH_TIERS = ('name', 'compact', 'skeleton', 'prefix', 'developer')
+# Shorter compact names are too generic to match as a prefix ("one", "gaia")
+MIN_PREFIX = 6
+# Shorter skeletons are shared by unrelated names ("stn": "westown", "eastown")
+MIN_SKELETON = 4
+
+_SPACES = re.compile(r'\s+')
+
+def clean_name(value: Any) -> str:
+    """Sheet text without non-breaking or repeated spaces"""
+    if value is None or (isinstance(value, float) and not math.isfinite(value)):
+        return ''
+    return _SPACES.sub(' ', str(value)).strip()
+
+def build_commission_table(rows: List[Dict[str, Any]], source: str, source_hash: str | None) -> Dict[str, Any]:
+    """Compact table from sheet rows; rows without a finite rate and exact repeats are dropped
+
+    Developer spellings that normalise alike ("PALM HILLS", "Palm hills ") share
+    one entry under their first spelling.
+    """
+    developers: List[str] = []
+    developer_index: Dict[str, int] = {}
+    rates: List[List[Any]] = []
+    seen = set()
+    for row in rows:
+        rate = row.get('BR Percentage')
+        if not isinstance(rate, (int, float)) or not math.isfinite(rate):
+            continue
+        developer, compound = clean_name(row.get('Developer')), clean_name(row.get('Compound'))
+        if not developer and not compound:
+            continue
+        key = normalize_text(developer)
+        if key not in developer_index:
+            developer_index[key] = len(developers)
+            developers.append(developer)
+        entry = (developer_index[key], compound, round(float(rate), 4))
+        if entry not in seen:
+            seen.add(entry)
+            rates.append(list(entry))
+    return {
+        'version': TABLE_VERSION,
+        'source': source,
+        'source_hash': source_hash,
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'columns': ['developer', 'compound', 'percent'],
+        'developers': developers,
+        'rates': rates,
+    }
+
+def write_commission_table(table: Dict[str, Any], path: str = COMMISSIONS_JSON) -> int:
+    """Write the table compactly and atomically; returns its size in bytes"""
+    data = json.dumps(table, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    with open(f'{path}.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(f'{path}.tmp', path)
+    return len(data)
+
+def load_commission_table(path: str = COMMISSIONS_JSON) -> Dict[str, Any]:
+    with open(path, encoding='utf-8') as f:
+        table = json.load(f)
+    if table.get('version') != TABLE_VERSION:
+        raise ValueError(f"{path} is commission table version {table.get('version')}, expected {TABLE_VERSION}")
+    return table
+
+def compile_commissions(
+    workbook: str = COMMISSIONS_XLSX, path: str = COMMISSIONS_JSON, force: bool = False
+) -> Dict[str, Any] | None:
+    """Convert the workbook if its hash changed; returns the new table, or None when it was current"""
+    source_hash = file_sha256(workbook)
+    if not force:
+        try:
+            if load_commission_table(path).get('source_hash') == source_hash:
+                return None
+        except (OSError, ValueError):
+            pass
+    sheet = pd.read_excel(workbook)
+    missing = [c for c in SHEET_COLUMNS if c not in sheet.columns]
+    if missing:
+        raise ValueError(f"{workbook} has no {', '.join(missing)} column")
+    table = build_commission_table(sheet[SHEET_COLUMNS].to_dict('records'), os.path.basename(workbook), source_hash)
+    write_commission_table(table, path)
+    default_matcher.cache_clear()
+    return table
+
+def load_commission_rows(path: str = COMMISSIONS_JSON) -> List[Dict[str, Any]]:
+    """The compiled table expanded back to sheet rows, each with a rate"""
+    table = load_commission_table(path)
+    developers = table['developers']
+    return [
+        {'Developer': developers[developer], 'Compound': compound, 'BR Percentage': rate}
+        for developer, compound, rate in table['rates']
+    ]
+
+def compact_name(name: Any) -> str:
+    return normalize_text(name).replace(' ', '')
+
+def _tier_keys(name: Any) -> Dict[str, str]:
+    compact = compact_name(name)
+    return {'name': normalize_text(name), 'compact': compact, 'skeleton': skeleton(compact)}
+
+def _same_developer(inventory: str, sheet: str) -> bool:
+    """'palmhillsdevelopments' and 'palmhills' name the same developer"""
+    return bool(inventory and sheet) and (inventory.startswith(sheet) or sheet.startswith(inventory))
+
+@dataclass(frozen=True)
+class CommissionMatch:
+    rate: float
+    tier: str
+    sheet_compound: str
+
+class CommissionMatcher:
+    """Sheet rates indexed by tier key; resolve() results are cached per name pair"""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        # tier -> key -> [(compact developer, rate, sheet compound)]
+        self.index: Dict[str, Dict[str, List[Tuple[str, float, str]]]] = {
+            tier: defaultdict(list) for tier in ('name', 'compact', 'skeleton')
+        }
+        developer_rates: Dict[str, set] = defaultdict(set)
+        for row in rows:
+            compound = str(row.get('Compound') or '').strip()
+            developer = compact_name(row.get('Developer'))
+            rate = float(row['BR Percentage'])
+            if developer:
+                developer_rates[developer].add(rate)
+            if not compact_name(compound):
+                continue
+            for tier, key in _tier_keys(compound).items():
+                if key:
+                    self.index[tier][key].append((developer, rate, compound))
+        self.compacts = sorted(self.index['compact'])
+        self.developers = sorted(developer_rates)
+        self.developer_rates = {dev: rates.pop() for dev, rates in developer_rates.items() if len(rates) == 1}
+        self.resolved: Dict[Tuple[str, str], CommissionMatch | None] = {}
+        # Units per (compound, developer) seen without a rate, and per matched tier
+        self.unmatched_units: Counter = Counter()
+        self.tier_units: Counter = Counter()
+
+    @staticmethod
+    def _pick(candidates: List[Tuple[str, float, str]], developer: str,
+              own_developer: bool = False) -> Tuple[float, str] | None:
+        """The single rate among the candidates, narrowed to the developer's rows if they disagree
+
+        With own_developer, only the developer's rows are considered at all.
+        """
+        if own_developer or len({rate for _, rate, _ in candidates}) > 1:
+            candidates = [c for c in candidates if _same_developer(developer, c[0])]
+        rates = {rate for _, rate, _ in candidates}
+        return (rates.pop(), candidates[0][2]) if len(rates) == 1 else None
+
+    def resolve(self, compound: str | None, developer: str | None = None) -> CommissionMatch | None:
+        """The BR rate of one inventory compound, or None when nothing matches unambiguously"""
+        cache_key = (compound or '', developer or '')
+        if cache_key in self.resolved:
+            return self.resolved[cache_key]
+        match = None
+        dev = compact_name(developer)
+        if compound and compact_name(compound):
+            keys = _tier_keys(compound)
+            for tier in ('name', 'compact', 'skeleton'):
+                if tier == 'skeleton' and len(keys[tier]) < MIN_SKELETON:
+                    continue
+                picked = self._pick(self.index[tier].get(keys[tier], []), dev, own_developer=tier == 'skeleton')
+                if picked:
+                    match = CommissionMatch(picked[0], tier, picked[1])
+                    break
+            if match is None and len(keys['compact']) >= MIN_PREFIX:
+                compact = keys['compact']
+                candidates = [
+                    entry for key in self.compacts
+                    if len(key) >= MIN_PREFIX and (key.startswith(compact) or compact.startswith(key))
+                    for entry in self.index['compact'][key]
+                ]
+                picked = self._pick(candidates, dev, own_developer=True)
+                if picked:
+                    match = CommissionMatch(picked[0], 'prefix', picked[1])
+        if match is None and dev:
+            sheet_devs = [sheet_dev for sheet_dev in self.developers if _same_developer(dev, sheet_dev)]
+            if len(sheet_devs) == 1 and sheet_devs[0] in self.developer_rates:
+                match = CommissionMatch(self.developer_rates[sheet_devs[0]], 'developer', '')
+        self.resolved[cache_key] = match
+        return match
+
+    def rates(self, compounds: pd.Series, developers: pd.Series) -> pd.Series:
+        """BR percentage per unit (NaN when unmatched), resolving each distinct name pair once"""
+        pairs = compounds.fillna('').astype(str) + '\x1f' + developers.fillna('').astype(str)
+        codes, uniques = pd.factorize(pairs, sort=False)
+        matches = [self.resolve(*(part or None for part in pair.split('\x1f'))) for pair in uniques]
+        table = np.array([m.rate if m else np.nan for m in matches] + [np.nan])
+        units = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        for pair, match, n in zip(uniques, matches, units):
+            if match:
+                self.tier_units[match.tier] += int(n)
+            elif n and pair.split('\x1f')[0]:
+                self.unmatched_units[pair] += int(n)
+        return pd.Series(table[codes], index=compounds.index)
+
+    def report(self) -> Dict[str, Any]:
+        """Units matched per tier and the unmatched compounds, most units first"""
+        unmatched = [
+            {'compound': pair.split('\x1f')[0], 'developer': pair.split('\x1f')[1] or None, 'units': n}
+            for pair, n in self.unmatched_units.most_common()
+        ]
+        return {
+            'matched_units': {tier: self.tier_units[tier] for tier in MATCH_TIERS if self.tier_units[tier]},
+            'unmatched_units': sum(self.unmatched_units.values()),
+            'unmatched': unmatched,
+        }
+
+    def reset_report(self) -> None:
+        self.unmatched_units.clear()
+        self.tier_units.clear()
+
+@lru_cache(maxsize=1)
+def default_matcher() -> CommissionMatcher:
+    """Matcher over COMMISSIONS_JSON, built once per process; empty if the file cannot be read"""
+    try:
+        return CommissionMatcher(load_commission_rows())
+    except (OSError, ValueError) as e:
+        logger.warning('Could not read commission rates from %s: %s', COMMISSIONS_JSON, e)
+        return CommissionMatcher([])
+
+def unit_commissions(compounds: pd.Series, developers: pd.Series, prices: pd.Series,
+                     matcher: CommissionMatcher | None = None) -> Tuple[pd.Series, pd.Series]:
+    """(commission_percent, commission_egp) of every unit; NaN without a rate or a price"""
+    rates = (matcher or default_matcher()).rates(compounds, developers)
+    prices = pd.to_numeric(prices, errors='coerce')
+    commission = (prices.where(prices > 0) * rates / 100).round(2)
+    return rates, commission
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Per-compound summary with the BR commission rate joined in
+
+Brokers keep asking the same question about a compound: how many units,
+what price and price-per-meter range, which bedroom mix and delivery years,
+and what commission BR earns on it. The import answers it once per load.
+It groups the snapshot by compound and developer and matches the rate from the
+compiled commission table (commissions.CommissionMatcher) for each pair. The result is one row per
+compound and developer in compound_summary (migrations 016, 018), keyed by a hash of the pair, since
+the same compound name can belong to different developers ("Jirian" is Palm Hills' and Mountain View's).
+
+Every run recomputes all compounds from the snapshot, which takes a few
+hundred milliseconds. Each row carries a summary_hash, so only compounds
+whose summary changed are upserted. Compounds that left the inventory are
+deleted.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, Iterator, List
+
+import numpy as np
+import pandas as pd
+import requests
+
+from brdata_processor.commissions import CommissionMatcher, default_matcher
+from brdata_processor.config import SUPABASE_KEY, SUPABASE_URL, rest_headers, rest_url
+from brdata_processor.serialization import dumps
+from brdata_processor.streaming import iter_csv_chunks
+from brdata_processor.transform import object_name
+from brdata_processor.upsert import IN_FILTER_CHUNK, conflict_key, fetch_rows
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TABLE = 'compound_summary'
+SUMMARY_VERSION = 2
+NAMED_COLUMNS = ['compound', 'developer', 'area', 'property_type']
+SOURCE_COLUMNS = NAMED_COLUMNS + [
+    'number_of_bedrooms', 'price_in_egp', 'price_per_meter', 'unit_area', 'ready_by', 'image', 'is_active',
+]
+PUBLISH_CHUNK = 500
+
+def compound_key(name: str, developer: str | None = None) -> str:
+    """Stable, URL-safe key of a compound name and its developer"""
+    text = f"{name}\x1f{developer or ''}"
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+def _positive(values: pd.Series) -> pd.Series:
+    """0 means unknown in the transformed records"""
+    values = pd.to_numeric(values, errors='coerce')
+    return values.where((values > 0) & np.isfinite(values))
+
+def _round(value: Any, digits: int = 2) -> float | None:
+    return round(float(value), digits) if pd.notna(value) else None
+
+class CompoundSummaryBuilder:
+    """Narrow per-unit frames accumulated chunk by chunk, grouped by compound at the end"""
+
+    def __init__(self, matcher: CommissionMatcher | None = None):
+        self.matcher = matcher or default_matcher()
+        self.parts: List[pd.DataFrame] = []
+
+    def add_frame(self, frame: pd.DataFrame) -> None:
+        """Add one chunk; rows explicitly marked inactive are left out"""
+        if 'is_active' in frame.columns:
+            frame = frame[frame['is_active'].fillna(True).astype(bool)]
+        if 'compound' not in frame.columns or frame.empty:
+            return
+        part = pd.DataFrame(index=frame.index)
+        for column in NAMED_COLUMNS:
+            part[column] = frame[column].map(object_name) if column in frame.columns else None
+        part = part[part['compound'].notna()]
+        # Units without a developer form their own group rather than dropping out of the groupby
+        part['developer'] = part['developer'].fillna('')
+        frame = frame.loc[part.index]
+
+        bedrooms = _positive(frame['number_of_bedrooms']) if 'number_of_bedrooms' in frame.columns else np.nan
+        part['bedrooms'] = pd.Series(bedrooms, index=part.index).map(lambda n: str(int(n)) if pd.notna(n) else None)
+        for column in ('price_in_egp', 'price_per_meter', 'unit_area'):
+            part[column] = _positive(frame[column]) if column in frame.columns else np.nan
+        if 'ready_by' in frame.columns:
+            ready_by = frame['ready_by'].astype(str)
+            years = ready_by.str.extract(r'\b(20\d{2})\b', expand=False)
+            part['year'] = years.mask(ready_by.str.strip().str.lower().eq('ready'), 'Ready')
+        else:
+            part['year'] = None
+        if 'image' in frame.columns:
+            images = frame['image'].where(frame['image'].astype(str).str.strip().ne(''))
+            part['image'] = images.where(~images.isin(['None', 'null', 'nan']))
+        else:
+            part['image'] = None
+        self.parts.append(part)
+
+    def track(self, batches: Iterable[List[Dict[str, Any]]]) -> Iterator[List[Dict[str, Any]]]:
+        """Pass record batches through, summarising them on the way"""
+        for batch in batches:
+            frame = pd.DataFrame.from_records(batch, columns=[c for c in SOURCE_COLUMNS if batch and c in batch[0]])
+            self.add_frame(frame)
+            yield batch
+
+    def commission_percent(self, compound: str, developer: str | None) -> float | None:
+        match = self.matcher.resolve(compound, developer)
+        return match.rate if match else None
+
+    def rows(self, updated_at: str) -> List[Dict[str, Any]]:
+        """One summary row per compound and developer, in that order"""
+        if not self.parts:
+            return []
+        units = pd.concat(self.parts, ignore_index=True)
+        keys = ['compound', 'developer']
+        grouped = units.groupby(keys, sort=True)
+        stats = grouped.agg(
+            unit_count=('compound', 'size'),
+            price_min=('price_in_egp', 'min'),
+            price_max=('price_in_egp', 'max'),
+            price_per_meter_min=('price_per_meter', 'min'),
+            price_per_meter_max=('price_per_meter', 'max'),
+            price_per_meter_avg=('price_per_meter', 'mean'),
+            unit_area_min=('unit_area', 'min'),
+            unit_area_max=('unit_area', 'max'),
+            image=('image', 'first'),
+        )
+
+        def most_common(column: str) -> Dict[tuple, str]:
+            counts = units.groupby(keys + [column]).size().reset_index(name='n')
+            counts = counts.sort_values(keys + ['n', column], ascending=[True, True, False, True])
+            return counts.drop_duplicates(keys).set_index(keys)[column].to_dict()
+
+        def mix(column: str) -> Dict[tuple, Dict[str, int]]:
+            result: Dict[tuple, Dict[str, int]] = {}
+            for (compound, developer, value), n in units.groupby(keys + [column]).size().items():
+                result.setdefault((compound, developer), {})[value] = int(n)
+            return result
+
+        areas = most_common('area')
+        bedroom_mix, type_mix, year_mix = mix('bedrooms'), mix('property_type'), mix('year')
+
+        rows = []
+        for pair, stat in stats.iterrows():
+            compound, developer = pair[0], pair[1] or None
+            row = {
+                'compound_key': compound_key(compound, developer),
+                'compound': compound,
+                'developer': developer,
+                'area': areas.get(pair),
+                'version': SUMMARY_VERSION,
+                'unit_count': int(stat['unit_count']),
+                'price_min': _round(stat['price_min']),
+                'price_max': _round(stat['price_max']),
+                'price_per_meter_min': _round(stat['price_per_meter_min']),
+                'price_per_meter_max': _round(stat['price_per_meter_max']),
+                'price_per_meter_avg': _round(stat['price_per_meter_avg']),
+                'unit_area_min': _round(stat['unit_area_min']),
+                'unit_area_max': _round(stat['unit_area_max']),
+                'bedroom_mix': dict(sorted(bedroom_mix.get(pair, {}).items(), key=lambda item: int(item[0]))),
+                'property_types': dict(sorted(type_mix.get(pair, {}).items())),
+                'delivery_years': dict(sorted(year_mix.get(pair, {}).items())),
+                'image': stat['image'] if isinstance(stat['image'], str) else None,
+                'commission_percent': self.commission_percent(compound, developer),
+            }
+            content = json.dumps(row, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+            row['summary_hash'] = hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+            row['updated_at'] = updated_at
+            rows.append(row)
+        return rows
+
+def summarize_csv(csv_file: str, max_memory_mb: float = 256,
+                  matcher: CommissionMatcher | None = None) -> CompoundSummaryBuilder:
+    """Summary straight from a CSV, for loaders that never build record batches (COPY, swap)"""
+    builder = CompoundSummaryBuilder(matcher)
+    for chunk in iter_csv_chunks(csv_file, max_memory_mb, usecols=lambda c: c in SOURCE_COLUMNS):
+        builder.add_frame(chunk)
+    return builder
+
+def publish_compound_summary(
+    builder: CompoundSummaryBuilder,
+    base_url: str = SUPABASE_URL,
+    api_key: str = SUPABASE_KEY,
+) -> Dict[str, int]:
+    """Upsert the compounds whose summary changed and delete the ones that left; returns the counts"""
+    rows = builder.rows(time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()))
+    session = requests.Session()
+    url = rest_url(SUMMARY_TABLE, base_url)
+    key = conflict_key(SUMMARY_TABLE)
+    stored = {row[key]: row.get('summary_hash') for row in fetch_rows(SUMMARY_TABLE, key, ['summary_hash'], None,
+                                                                       base_url, api_key, session)}
+
+    changed = [row for row in rows if stored.get(row[key]) != row['summary_hash']]
+    for i in range(0, len(changed), PUBLISH_CHUNK):
+        response = session.post(
+            url,
+            params={'on_conflict': key},
+            headers=rest_headers(api_key, 'resolution=merge-duplicates,return=minimal'),
+            data=dumps(changed[i:i + PUBLISH_CHUNK]),
+            timeout=60,
+        )
+        response.raise_for_status()
+
+    gone = sorted(set(stored) - {row[key] for row in rows})
+    for i in range(0, len(gone), IN_FILTER_CHUNK):
+        response = session.delete(
+            url, params={key: f"in.({','.join(gone[i:i + IN_FILTER_CHUNK])})"}, headers=rest_headers(api_key), timeout=60
+        )
+        response.raise_for_status()
+
+    return {'compounds': len(rows), 'updated': len(changed), 'removed': len(gone)}
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Bulk loading through Postgres COPY into a staging table, then one set-based merge
+
+Full reloads skip PostgREST entirely: each CSV chunk is rendered to CSV text by
+pandas and streamed with COPY ... FROM STDIN into a temporary staging table over
+a direct connection. A single INSERT ... ON CONFLICT then merges the staging
+table into the target, and units missing from the snapshot are deactivated,
+all in one transaction. Point DATABASE_URL at a local Postgres to try it out.
+"""
+
+import csv
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from typing import Iterator, List, Tuple
+
+import pandas as pd
+import psycopg
+from psycopg import sql
+
+from brdata_processor.config import DATABASE_URL
+from brdata_processor.streaming import iter_csv_chunks
+from brdata_processor.transform import JSON_COLUMNS, canonical_json, to_supabase_safe_frame
+from brdata_processor.upsert import conflict_key
+
+logger = logging.getLogger(__name__)
+
+# brdata_properties columns in table order (correct_table_structure.sql), then the columns
+# to_supabase_safe_frame derives (migrations 014, 015, 017); import_data_psql.sql copies
+# exactly these from the file write_copy_csv produces
+BRDATA_COPY_COLUMNS = [
+    'id', 'unit_id', 'original_unit_id', 'sale_type', 'unit_number', 'unit_area',
+    'number_of_bedrooms', 'number_of_bathrooms', 'ready_by', 'finishing', 'garden_area',
+    'roof_area', 'floor_number', 'building_number', 'price_per_meter', 'price_in_egp',
+    'last_inventory_update', 'currency', 'payment_plans', 'image', 'offers', 'is_launch',
+    'compound', 'area', 'developer', 'phase', 'property_type',
+    'search_tokens', 'sort_key', 'commission_percent', 'commission_egp',
+]
+
+# Columns the merge manages itself rather than copying from the file
+MERGE_MANAGED_COLUMNS = {'is_active', 'row_hash', 'created_at', 'updated_at'}
+
+@dataclass
+class CopyReport:
+    """Row counts and timings of one COPY load"""
+    rows_copied: int = 0
+    rows_merged: int = 0
+    rows_deactivated: int = 0
+    copy_seconds: float = 0.0
+    merge_seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = self.copy_seconds + self.merge_seconds
+        return self.rows_copied / elapsed if elapsed else 0.0
+
+def copy_ready_frame(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Column types of the REST path, with the JSON columns turned into real JSON text for jsonb"""
+    frame = to_supabase_safe_frame(chunk)
+    for col in JSON_COLUMNS:
+        if col in frame.columns:
+            frame[col] = frame[col].map(canonical_json)
+    return frame
+
+def _csv_text(frame: pd.DataFrame, columns: List[str], header: bool = False) -> str:
+    """CSV rendering COPY understands: unquoted empty fields are NULL"""
+    return frame.reindex(columns=columns).to_csv(
+        index=False, header=header, na_rep='', quoting=csv.QUOTE_MINIMAL, lineterminator='\n'
+    )
+
+def table_columns(cur: psycopg.Cursor, table: str) -> List[str]:
+    """Columns of a public table in ordinal order"""
+    cur.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = 'public' AND table_name = %s ORDER BY ordinal_position",
+        (table,),
+    )
+    return [row[0] for row in cur.fetchall()]
+
+def copy_frames(
+    cur: psycopg.Cursor, target: str, frames: Iterator[pd.DataFrame], target_columns: List[str]
+) -> Tuple[List[str], int]:
+    """COPY prepared frames into a table; returns the columns loaded and the row count"""
+    first = next(frames, None)
+    if first is None:
+        return [], 0
+    columns = [c for c in target_columns if c in first.columns and c not in MERGE_MANAGED_COLUMNS]
+
+    rows = 0
+    copy_sql = sql.SQL("COPY {} ({}) FROM STDIN (FORMAT csv)").format(
+        sql.Identifier(target), sql.SQL(', ').join(map(sql.Identifier, columns)))
+    with cur.copy(copy_sql) as copy:
+        for frame in itertools.chain([first], frames):
+            copy.write(_csv_text(frame, columns))
+            rows += len(frame)
+    return columns, rows
+
+def merge_statement(
+    table: str, staging: str, key: str, columns: List[str], has_active: bool, has_hash: bool
+) -> sql.Composed:
+    """INSERT ... ON CONFLICT from staging, skipping rows whose values did not change"""
+    insert_cols = columns + (['is_active'] if has_active else [])
+    select_cols = [sql.Identifier(c) for c in columns] + ([sql.Literal(True)] if has_active else [])
+    updated = [c for c in insert_cols if c != key]
+    assignments = [sql.SQL("{col} = EXCLUDED.{col}").format(col=sql.Identifier(c)) for c in updated]
+    if has_hash:
+        # The sync fingerprint describes the old content; clearing it makes the next sync re-hash the unit
+        assignments.append(sql.SQL("row_hash = NULL"))
+
+    return sql.SQL(
+        "INSERT INTO {table} ({insert_cols}) "
+        "SELECT DISTINCT ON ({key}) {select_cols} FROM {staging} ORDER BY {key} "
+        "ON CONFLICT ({key}) DO UPDATE SET {assignments} "
+        # Unchanged rows are left alone, so a reload does not rewrite every tuple
+        "WHERE ({current}) IS DISTINCT FROM ({incoming})"
+    ).format(
+        table=sql.Identifier(table),
+        insert_cols=sql.SQL(', ').join(map(sql.Identifier, insert_cols)),
+        select_cols=sql.SQL(', ').join(select_cols),
+        staging=sql.Identifier(staging),
+        key=sql.Identifier(key),
+        assignments=sql.SQL(', ').join(assignments),
+        current=sql.SQL(', ').join(sql.SQL("{}.{}").format(sql.Identifier(table), sql.Identifier(c)) for c in updated),
+        incoming=sql.SQL(', ').join(sql.SQL("EXCLUDED.{}").format(sql.Identifier(c)) for c in updated),
+    )
+
+def copy_csv_to_postgres(
+    csv_file: str,
+    table: str = 'brdata_properties',
+    database_url: str | None = DATABASE_URL,
+    max_memory_mb: float = 256,
+    deactivate_missing: bool = True,
+) -> CopyReport:
+    """Stream a processed CSV into the table with COPY and merge it on the unit id"""
+    if not database_url:
+        raise ValueError("The COPY loader needs a direct Postgres connection; set DATABASE_URL")
+
+    key = conflict_key(table)
+    staging = f'{table}_staging'
+    report = CopyReport()
+    chunks: Iterator[pd.DataFrame] = (copy_ready_frame(chunk) for chunk in iter_csv_chunks(csv_file, max_memory_mb))
+
+    # One transaction: readers see the old rows until the merge commits
+    with psycopg.connect(database_url) as conn, conn.cursor() as cur:
+        target_columns = table_columns(cur, table)
+        if not target_columns:
+            raise ValueError(f"Table '{table}' does not exist")
+        has_active = 'is_active' in target_columns
+
+        cur.execute(sql.SQL("CREATE TEMP TABLE {} (LIKE {} INCLUDING DEFAULTS) ON COMMIT DROP").format(
+            sql.Identifier(staging), sql.Identifier(table)))
+
+        started = time.monotonic()
+        columns, report.rows_copied = copy_frames(cur, staging, chunks, target_columns)
+        if not report.rows_copied:
+            logger.warning(f"⚠️ {csv_file} has no rows; nothing to load")
+            return report
+        report.copy_seconds = time.monotonic() - started
+        logger.info(f"📥 Copied {report.rows_copied:,} rows into {staging} in {report.copy_seconds:.1f}s")
+
+        started = time.monotonic()
+        cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(staging)))
+        cur.execute(merge_statement(table, staging, key, columns, has_active, 'row_hash' in target_columns))
+        report.rows_merged = cur.rowcount
+
+        if deactivate_missing and has_active:
+            cur.execute(sql.SQL(
+                "UPDATE {table} t SET is_active = false WHERE t.is_active "
+                "AND NOT EXISTS (SELECT 1 FROM {staging} s WHERE s.{key} = t.{key})"
+            ).format(table=sql.Identifier(table), staging=sql.Identifier(staging), key=sql.Identifier(key)))
+            report.rows_deactivated = cur.rowcount
+        report.merge_seconds = time.monotonic() - started
+        logger.info(f"🔀 Merged {report.rows_merged:,} new or changed rows in {report.merge_seconds:.1f}s")
+
+    return report
+
+def write_copy_csv(csv_file: str, output_file: str, max_memory_mb: float = 256) -> int:
+    """Write the COPY-ready CSV that import_data_psql.sql loads with \\copy; returns the row count"""
+    rows = 0
+    with open(output_file, 'w', encoding='utf-8', newline='') as out:
+        for index, chunk in enumerate(iter_csv_chunks(csv_file, max_memory_mb)):
+            frame = copy_ready_frame(chunk)
+            out.write(_csv_text(frame, BRDATA_COPY_COLUMNS, header=index == 0))
+            rows += len(frame)
+    return rows
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Dead-letter file for rows the server rejected on their own
+
+When a batch fails on a data error the uploader bisects it until only the
+offending rows are left; those rows land here, one JSON line each with the
+server's error, so the rest of the batch can still be loaded.
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict
+
+from brdata_processor.ledger import LEDGER_DIR
+from brdata_processor.uploader import BatchResult
+
+class DeadLetterFile:
+    """Append-only JSON-lines file of rejected rows for one import run"""
+
+    def __init__(self, name: str, directory: str = LEDGER_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{name}_{time.strftime('%Y%m%d_%H%M%S')}.dead.jsonl")
+        self.count = 0
+        self._file = None
+
+    def write(self, result: BatchResult, batch: int | None = None) -> None:
+        """Append the rejected rows of a batch result, if any"""
+        if not result.dead_letters:
+            return
+        # Created lazily so a clean run leaves no empty file behind
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        for letter in result.dead_letters:
+            entry: Dict[str, Any] = {'batch': result.index if batch is None else batch, **letter}
+            self._file.write(json.dumps(entry, default=str) + '\n')
+        self._file.flush()
+        self.count += len(result.dead_letters)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
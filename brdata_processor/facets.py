@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Filter-option facets computed once per load instead of in every browser
+
+The inventory filter modal needs the distinct compounds, areas, developers,
+types, finishings, bedroom/bathroom counts and delivery years of the active
+units, plus which compounds each developer has. The import counts them while
+the snapshot streams past and publishes the result as one small JSON document
+in inventory_facets (migration 011), optionally also as a static file.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, Iterator, List
+
+import pandas as pd
+import requests
+
+from brdata_processor.config import SUPABASE_KEY, SUPABASE_URL, rest_headers, rest_url
+from brdata_processor.serialization import dumps
+from brdata_processor.streaming import iter_csv_chunks
+from brdata_processor.transform import object_name
+from brdata_processor.upsert import conflict_key
+
+logger = logging.getLogger(__name__)
+
+FACETS_TABLE = 'inventory_facets'
+FACETS_VERSION = 1
+
+# Facet name in the frontend's filter options -> source column holding a {'id', 'name'} object
+NAMED_FACETS = {
+    'compounds': 'compound',
+    'areas': 'area',
+    'developers': 'developer',
+    'propertyTypes': 'property_type',
+}
+# Facet name -> plain source column
+VALUE_FACETS = {
+    'finishingOptions': 'finishing',
+    'bedroomOptions': 'number_of_bedrooms',
+    'bathroomOptions': 'number_of_bathrooms',
+}
+SOURCE_COLUMNS = list(NAMED_FACETS.values()) + list(VALUE_FACETS.values()) + ['ready_by', 'is_active']
+
+class FacetCounter:
+    """Distinct values with counts, accumulated chunk by chunk"""
+
+    def __init__(self):
+        self.counts: Dict[str, Counter] = {facet: Counter() for facet in [*NAMED_FACETS, *VALUE_FACETS]}
+        self.counts['readyByYearOptions'] = Counter()
+        self.developer_compounds: Dict[str, Counter] = defaultdict(Counter)
+        self.rows = 0
+
+    def add_frame(self, frame: pd.DataFrame) -> None:
+        """Count one chunk; rows explicitly marked inactive are left out"""
+        if 'is_active' in frame.columns:
+            frame = frame[frame['is_active'].fillna(True).astype(bool)]
+        self.rows += len(frame)
+
+        names = {}
+        for facet, column in NAMED_FACETS.items():
+            if column in frame.columns:
+                names[column] = frame[column].map(object_name)
+                self.counts[facet].update(names[column].dropna().value_counts().to_dict())
+        for facet, column in VALUE_FACETS.items():
+            if column in frame.columns:
+                values = frame[column].dropna()
+                if values.dtype.kind == 'f' and (values % 1 == 0).all():
+                    values = values.astype(int)
+                self.counts[facet].update(values.value_counts().to_dict())
+        if 'ready_by' in frame.columns:
+            years = frame['ready_by'].dropna().astype(str).str.extract(r'\b(20\d{2})\b', expand=False).dropna()
+            self.counts['readyByYearOptions'].update(years.value_counts().to_dict())
+        if 'developer' in names and 'compound' in names:
+            pairs = pd.DataFrame({'developer': names['developer'], 'compound': names['compound']}).dropna()
+            for (developer, compound), count in pairs.value_counts().items():
+                self.developer_compounds[developer][compound] += count
+
+    def track(self, batches: Iterable[List[Dict[str, Any]]]) -> Iterator[List[Dict[str, Any]]]:
+        """Pass record batches through, counting them on the way"""
+        for batch in batches:
+            frame = pd.DataFrame.from_records(batch, columns=[c for c in SOURCE_COLUMNS if batch and c in batch[0]])
+            self.add_frame(frame)
+            yield batch
+
+    def to_dict(self, source_table: str) -> Dict[str, Any]:
+        """The published document: each facet as [{value, count}] in display order"""
+        def ordered(counter: Counter, numeric: bool = False) -> List[Dict[str, Any]]:
+            values = sorted(counter, key=(lambda v: float(v)) if numeric else (lambda v: str(v).lower()))
+            return [{'value': v, 'count': int(counter[v])} for v in values]
+
+        facets: Dict[str, Any] = {
+            'version': FACETS_VERSION,
+            'source_table': source_table,
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'row_count': self.rows,
+        }
+        for facet in NAMED_FACETS:
+            facets[facet] = ordered(self.counts[facet])
+        facets['finishingOptions'] = ordered(self.counts['finishingOptions'])
+        facets['bedroomOptions'] = ordered(self.counts['bedroomOptions'], numeric=True)
+        facets['bathroomOptions'] = ordered(self.counts['bathroomOptions'], numeric=True)
+        facets['readyByYearOptions'] = ordered(self.counts['readyByYearOptions'])
+        facets['developerCompounds'] = {
+            developer: sorted(compounds, key=str.lower)
+            for developer, compounds in sorted(self.developer_compounds.items())
+        }
+        return facets
+
+def count_csv_facets(csv_file: str, max_memory_mb: float = 256) -> FacetCounter:
+    """Facets straight from a CSV, for loaders that never build record batches (COPY, swap)"""
+    counter = FacetCounter()
+    for chunk in iter_csv_chunks(csv_file, max_memory_mb, usecols=lambda c: c in SOURCE_COLUMNS):
+        counter.add_frame(chunk)
+    return counter
+
+def publish_facets(
+    facets: Dict[str, Any],
+    base_url: str = SUPABASE_URL,
+    api_key: str = SUPABASE_KEY,
+) -> None:
+    """Replace the table's row in inventory_facets"""
+    row = {
+        'source_table': facets['source_table'],
+        'facets': facets,
+        'row_count': facets['row_count'],
+        'generated_at': facets['generated_at'],
+    }
+    response = requests.post(
+        rest_url(FACETS_TABLE, base_url),
+        params={'on_conflict': conflict_key(FACETS_TABLE)},
+        headers=rest_headers(api_key, 'resolution=merge-duplicates,return=minimal'),
+        data=dumps([row]),
+        timeout=60,
+    )
+    response.raise_for_status()
+
+def write_facets_json(facets: Dict[str, Any], path: str) -> int:
+    """Write the facets as a static file for hosting next to the app; returns its size in bytes"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(facets, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(f'{path}.tmp', path)
+    return os.path.getsize(path)
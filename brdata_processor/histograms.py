@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Log-scale histograms behind the price and area range sliders
+
+The sliders need exact bounds, and a density curve helps too. The import
+bins price_in_egp, unit_area and price_per_meter of the active units on a
+fixed log scale (BINS_PER_DECADE bins per power of ten). It does this
+overall and per area and compound, and publishes one row per histogram
+to inventory_histograms (migration 013). The edges are shared by every
+histogram of a measure, so the app can also add histograms together or
+estimate how many units a price range matches without querying.
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+import requests
+
+from brdata_processor.config import SUPABASE_KEY, SUPABASE_URL, rest_headers, rest_url
+from brdata_processor.serialization import dumps
+from brdata_processor.streaming import iter_csv_chunks
+from brdata_processor.transform import object_name
+from brdata_processor.upsert import conflict_key
+
+logger = logging.getLogger(__name__)
+
+HISTOGRAMS_TABLE = 'inventory_histograms'
+MEASURES = ['price_in_egp', 'unit_area', 'price_per_meter']
+# Dimension -> source column holding a {'id', 'name'} object; 'all' covers every active unit
+DIMENSIONS = {'area': 'area', 'compound': 'compound'}
+SOURCE_COLUMNS = MEASURES + list(DIMENSIONS.values()) + ['is_active']
+
+# Bin i spans [10^(i/10), 10^((i+1)/10)): each edge is ~26% above the previous one
+BINS_PER_DECADE = 10
+PUBLISH_CHUNK = 500
+
+def bin_edge(index: int) -> float:
+    return float(f'{10 ** (index / BINS_PER_DECADE):.6g}')
+
+class HistogramCounter:
+    """Binned counts and exact bounds per (measure, dimension, value), accumulated chunk by chunk"""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.bounds: Dict[Tuple[str, str, str], List[float]] = {}
+
+    def add_frame(self, frame: pd.DataFrame) -> None:
+        """Count one chunk; rows explicitly marked inactive are left out"""
+        if 'is_active' in frame.columns:
+            frame = frame[frame['is_active'].fillna(True).astype(bool)]
+        groups = {'all': pd.Series('all', index=frame.index)}
+        for dimension, column in DIMENSIONS.items():
+            if column in frame.columns:
+                groups[dimension] = frame[column].map(object_name)
+
+        for measure in MEASURES:
+            if measure not in frame.columns:
+                continue
+            values = pd.to_numeric(frame[measure], errors='coerce')
+            # 0 means unknown in the transformed records
+            values = values[(values > 0) & np.isfinite(values)]
+            bins = np.floor(np.log10(values) * BINS_PER_DECADE).astype(int)
+            for dimension, names in groups.items():
+                keyed = pd.DataFrame({'value': names[values.index], 'bin': bins, 'x': values}).dropna(subset=['value'])
+                for (value, index), n in keyed.groupby(['value', 'bin']).size().items():
+                    self.counts[(measure, dimension, value, index)] += int(n)
+                for value, (low, high) in keyed.groupby('value')['x'].agg(['min', 'max']).iterrows():
+                    bounds = self.bounds.setdefault((measure, dimension, value), [low, high])
+                    bounds[0], bounds[1] = min(bounds[0], low), max(bounds[1], high)
+
+    def track(self, batches: Iterable[List[Dict[str, Any]]]) -> Iterator[List[Dict[str, Any]]]:
+        """Pass record batches through, counting them on the way"""
+        for batch in batches:
+            frame = pd.DataFrame.from_records(batch, columns=[c for c in SOURCE_COLUMNS if batch and c in batch[0]])
+            self.add_frame(frame)
+            yield batch
+
+    def rows(self, source_table: str, generated_at: str) -> List[Dict[str, Any]]:
+        """One row per histogram, counts running from its lowest to its highest non-empty bin"""
+        bins: Dict[Tuple[str, str, str], Dict[int, int]] = {}
+        for (measure, dimension, value, index), n in self.counts.items():
+            bins.setdefault((measure, dimension, value), {})[index] = n
+
+        rows = []
+        for (measure, dimension, value), counts in sorted(bins.items()):
+            first, last = min(counts), max(counts)
+            low, high = self.bounds[(measure, dimension, value)]
+            rows.append({
+                'cell_key': f'{source_table}|{measure}|{dimension}|{value}',
+                'source_table': source_table,
+                'measure': measure,
+                'dimension': dimension,
+                'value': value,
+                'unit_count': sum(counts.values()),
+                'min_value': float(low),
+                'max_value': float(high),
+                'edges': [bin_edge(i) for i in range(first, last + 2)],
+                'counts': [counts.get(i, 0) for i in range(first, last + 1)],
+                'generated_at': generated_at,
+            })
+        return rows
+
+def count_csv_histograms(csv_file: str, max_memory_mb: float = 256) -> HistogramCounter:
+    """Histograms straight from a CSV, for loaders that never build record batches (COPY, swap)"""
+    counter = HistogramCounter()
+    for chunk in iter_csv_chunks(csv_file, max_memory_mb, usecols=lambda c: c in SOURCE_COLUMNS):
+        counter.add_frame(chunk)
+    return counter
+
+def publish_histograms(
+    counter: HistogramCounter,
+    source_table: str,
+    base_url: str = SUPABASE_URL,
+    api_key: str = SUPABASE_KEY,
+) -> int:
+    """Replace the table's histograms; returns how many were written"""
+    generated_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    rows = counter.rows(source_table, generated_at)
+    session = requests.Session()
+    url = rest_url(HISTOGRAMS_TABLE, base_url)
+
+    for i in range(0, len(rows), PUBLISH_CHUNK):
+        response = session.post(
+            url,
+            params={'on_conflict': conflict_key(HISTOGRAMS_TABLE)},
+            headers=rest_headers(api_key, 'resolution=merge-duplicates,return=minimal'),
+            data=dumps(rows[i:i + PUBLISH_CHUNK]),
+            timeout=60,
+        )
+        response.raise_for_status()
+
+    # Areas and compounds that left the inventory keep their old generation
+    response = session.delete(
+        url,
+        params={'source_table': f'eq.{source_table}', 'generated_at': f'lt.{generated_at}'},
+        headers=rest_headers(api_key),
+        timeout=60,
+    )
+    response.raise_for_status()
+    return len(rows)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Durable per-run upload ledger so an interrupted import can resume where it stopped
+
+The ledger is an append-only JSON-lines file: a header naming the input file
+hash, table, mode and batch size, then one line each time a batch is sent and
+when its outcome is known. Lines are flushed and fsynced as they are written,
+so after a crash the file says exactly which batches were confirmed.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from brdata_processor.uploader import BatchResult
+
+LEDGER_DIR = '.import_ledgers'
+
+class LedgerMismatch(Exception):
+    """The existing ledger was written with a different batch layout"""
+
+def file_sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    """Hash of the input file, which identifies the snapshot a ledger belongs to"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ImportLedger:
+    """Records batch boundaries and outcomes for one table load"""
+
+    def __init__(self, path: str, header: Dict[str, Any], entries: List[Dict[str, Any]] | None = None):
+        self.path = path
+        self.header = header
+        self.status: Dict[int, Dict[str, Any]] = {}
+        for entry in entries or []:
+            self.status[entry['batch']] = entry
+        # Uploader index -> (ledger batch, start row, end row) for the batches sent this run
+        self.sent: List[Tuple[int, int, int]] = []
+        self.skipped_rows = 0
+        self._file = open(path, 'a', encoding='utf-8')
+
+    @classmethod
+    def open(
+        cls,
+        input_file: str,
+        table: str,
+        batch_size: int,
+        mode: str,
+        resume: bool = False,
+        directory: str = LEDGER_DIR,
+        name: str | None = None,
+    ) -> 'ImportLedger':
+        """Start a fresh ledger, or reload the one for this loader and input file when resuming
+
+        name distinguishes loaders that batch the same file into the same table
+        differently; it defaults to the table name.
+        """
+        os.makedirs(directory, exist_ok=True)
+        input_sha256 = file_sha256(input_file)
+        # One ledger per loader and input snapshot, so --resume finds it from the file alone
+        path = os.path.join(directory, f'{name or table}_{input_sha256[:12]}.jsonl')
+        header = {
+            'type': 'header',
+            'input_file': os.path.abspath(input_file),
+            'input_sha256': input_sha256,
+            'table': table,
+            'mode': mode,
+            'batch_size': batch_size,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+
+        if resume and os.path.exists(path):
+            previous, entries = cls._read(path)
+            for field in ('table', 'batch_size'):
+                if previous.get(field) != header[field]:
+                    raise LedgerMismatch(
+                        f"Ledger {path} was written with {field}={previous.get(field)!r}, "
+                        f"this run has {header[field]!r}; run without --resume to start over"
+                    )
+            return cls(path, previous, entries)
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(header) + '\n')
+        return cls(path, header)
+
+    @staticmethod
+    def _read(path: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Header and batch entries of an existing ledger, ignoring a torn last line"""
+        header, entries = {}, []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get('type') == 'header':
+                    header = entry
+                else:
+                    entries.append(entry)
+        return header, entries
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        self.status[entry['batch']] = entry
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    @property
+    def confirmed(self) -> set:
+        """Batches whose last recorded outcome is success"""
+        return {index for index, entry in self.status.items() if entry['status'] == 'ok'}
+
+    def track(self, batches: Iterable[List[Dict[str, Any]]]) -> Iterator[List[Dict[str, Any]]]:
+        """Skip confirmed batches and record the boundaries of every batch sent"""
+        confirmed = self.confirmed
+        start = 0
+        for index, batch in enumerate(batches):
+            end = start + len(batch)
+            if index in confirmed:
+                recorded = self.status[index]
+                if (recorded['start'], recorded['end']) != (start, end):
+                    raise LedgerMismatch(
+                        f"Batch {index} covered rows {recorded['start']}-{recorded['end']} in the ledger "
+                        f"but rows {start}-{end} now; run without --resume to start over"
+                    )
+                self.skipped_rows += len(batch)
+            else:
+                self.sent.append((index, start, end))
+                self._write({'batch': index, 'start': start, 'end': end, 'rows': len(batch), 'status': 'sent'})
+                yield batch
+            start = end
+
+    def boundaries(self, upload_index: int) -> Tuple[int, int, int]:
+        """(ledger batch, start row, end row) of the n-th batch sent this run"""
+        return self.sent[upload_index]
+
+    def record(self, result: BatchResult) -> None:
+        """Persist the outcome of a batch reported by the uploader"""
+        index, start, end = self.sent[result.index]
+        self._write({
+            'batch': index,
+            'start': start,
+            'end': end,
+            'rows': result.rows,
+            'status': 'ok' if result.ok else 'failed',
+            'attempts': result.attempts,
+            'rejected': len(result.dead_letters),
+            'error': result.error,
+        })
+
+    def summary(self) -> Dict[str, int]:
+        """Batch counts per last known status"""
+        counts: Dict[str, int] = {}
+        for entry in self.status.values():
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+        return counts
+
+    def close(self) -> None:
+        self._file.close()
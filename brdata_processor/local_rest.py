@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""Local PostgREST stand-in over SQLite, with injectable latency and failures
+
+Implements the slice of /rest/v1 the pipeline uses: bulk insert, upsert
+(Prefer: resolution=merge-duplicates with on_conflict), PATCH and DELETE with
+filters, GET with select/order/limit/offset and Prefer: count=exact, gzip
+request bodies and the backfill_column RPC. Tables are created on first
+write and grow a column for every new key, keyed on the same natural keys
+as the real tables.
+
+It is meant for exercising and benchmarking the uploaders without touching
+the Supabase project; SQLite serialises writes, so compare strategies with
+each other rather than with production numbers.
+
+    python -m brdata_processor.local_rest --port 54321 --latency 0.05 --failure-rate 0.02
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=local python import_supabase_safe.py ...
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+from brdata_processor.upsert import conflict_key
+
+logger = logging.getLogger(__name__)
+
+FILTER_OPERATORS = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+RESERVED_PARAMS = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns'}
+
+class RestError(Exception):
+    """An error answered with PostgREST's status code and JSON error body"""
+
+    def __init__(self, status: int, code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+@dataclass
+class FaultProfile:
+    """Latency and failures injected into every request"""
+    latency: float = 0.0  # seconds added to each request
+    jitter: float = 0.0  # up to this many extra seconds, uniformly
+    failure_rate: float = 0.0  # share of write requests answered 503
+    max_body_bytes: int | None = None  # larger request bodies get 413
+    max_rows: int | None = None  # most rows one GET returns, like PostgREST's db-max-rows
+    accept_gzip: bool = True
+    # column -> value; rows carrying it are refused with 400 like a check constraint violation
+    reject_values: Dict[str, Any] = field(default_factory=dict)
+    seed: int | None = None
+
+def _literal(value: str) -> Any:
+    """A filter value as the type SQLite compares it with"""
+    if value in ('true', 'false'):
+        return int(value == 'true')
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+class SqliteStore:
+    """Schemaless tables keyed on the pipeline's natural keys"""
+
+    def __init__(self, database: str = ':memory:'):
+        self.conn = sqlite3.connect(database, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        self.columns: Dict[str, List[str]] = {}
+        # Columns whose values are decoded on the way out: 'bool' or 'json'
+        self.kinds: Dict[str, Dict[str, str]] = {}
+        self.conn.execute('CREATE TABLE IF NOT EXISTS _column_kinds (table_name, column_name, kind, '
+                          'PRIMARY KEY (table_name, column_name))')
+        # A database file from an earlier run keeps its tables, so pick their columns back up
+        tables = self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name != '_column_kinds'")
+        for (table,) in tables.fetchall():
+            self.columns[table] = [row[1] for row in self.conn.execute(f'PRAGMA table_info("{table}")')]
+            self.kinds[table] = {}
+        for table, column, kind in self.conn.execute('SELECT table_name, column_name, kind FROM _column_kinds'):
+            self.kinds[table][column] = kind
+
+    def _ensure(self, table: str, names: List[str], sample: Dict[str, Any] | None = None) -> None:
+        if table not in self.columns:
+            key = conflict_key(table)
+            self.conn.execute(f'CREATE TABLE "{table}" ("{key}" UNIQUE)')
+            self.columns[table] = [key]
+            self.kinds[table] = {}
+        for name in names:
+            if name not in self.columns[table]:
+                self.conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{name}"')
+                self.columns[table].append(name)
+            value = (sample or {}).get(name)
+            kind = 'bool' if isinstance(value, bool) else 'json' if isinstance(value, (dict, list)) else None
+            if kind and self.kinds[table].get(name) != kind:
+                self.kinds[table][name] = kind
+                self.conn.execute('INSERT OR REPLACE INTO _column_kinds VALUES (?, ?, ?)', (table, name, kind))
+
+    def _where(self, table: str, filters: List[Tuple[str, str]]) -> Tuple[str, List[Any]]:
+        clauses, args = [], []
+        for column, expression in filters:
+            if column not in self.columns.get(table, []):
+                raise RestError(400, '42703', f'column {table}.{column} does not exist')
+            negate = expression.startswith('not.')
+            if negate:
+                expression = expression[4:]
+            op, _, value = expression.partition('.')
+            if op == 'in':
+                items = [_literal(v) for v in value.strip('()').split(',') if v != '']
+                clause = f'"{column}" IN ({",".join("?" * len(items))})' if items else '0'
+                args.extend(items)
+            elif op == 'is':
+                clause = f'"{column}" IS NULL' if value == 'null' else f'"{column}" IS {_literal(value)}'
+            elif op in FILTER_OPERATORS:
+                clause = f'"{column}" {FILTER_OPERATORS[op]} ?'
+                args.append(_literal(value))
+            else:
+                raise RestError(400, 'PGRST100', f'unknown operator "{op}"')
+            clauses.append(f'NOT ({clause})' if negate else clause)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', args
+
+    def _encode(self, value: Any) -> Any:
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, separators=(',', ':'))
+        if isinstance(value, bool):
+            return int(value)
+        return value
+
+    def _decode(self, table: str, column: str, value: Any) -> Any:
+        kind = self.kinds[table].get(column)
+        if value is None or kind is None:
+            return value
+        return bool(value) if kind == 'bool' else json.loads(value)
+
+    def insert(self, table: str, rows: List[Dict[str, Any]], on_conflict: str | None, resolution: str | None) -> int:
+        if not rows:
+            return 0
+        names = list(dict.fromkeys(name for row in rows for name in row))
+        with self.lock:
+            self._ensure(table, names, {k: v for row in rows for k, v in row.items() if v is not None})
+            if on_conflict and on_conflict != conflict_key(table):
+                self.conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{table}_{on_conflict}_key" '
+                                  f'ON "{table}" ("{on_conflict}")')
+            quoted = ', '.join(f'"{n}"' for n in names)
+            sql = f'INSERT INTO "{table}" ({quoted}) VALUES ({", ".join("?" * len(names))})'
+            if resolution == 'merge-duplicates' and on_conflict:
+                updates = ', '.join(f'"{n}" = excluded."{n}"' for n in names if n != on_conflict)
+                sql += f' ON CONFLICT ("{on_conflict}") DO ' + (f'UPDATE SET {updates}' if updates else 'NOTHING')
+            elif resolution == 'ignore-duplicates':
+                sql += ' ON CONFLICT DO NOTHING'
+            # One transaction per request: a failing row fails the whole request, as in Postgres
+            self.conn.execute('BEGIN')
+            try:
+                self.conn.executemany(sql, ([self._encode(row.get(n)) for n in names] for row in rows))
+            except sqlite3.Error as e:
+                self.conn.execute('ROLLBACK')
+                if isinstance(e, sqlite3.IntegrityError):
+                    raise RestError(409, '23505', f'duplicate key value violates unique constraint: {e}')
+                raise
+            self.conn.execute('COMMIT')
+        return len(rows)
+
+    def select(
+        self, table: str, columns: List[str], filters: List[Tuple[str, str]],
+        order: List[Tuple[str, str]], limit: int | None, offset: int,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Matching rows and the total count before limit/offset"""
+        with self.lock:
+            if table not in self.columns:
+                return [], 0
+            known = self.columns[table]
+            wanted = known if columns == ['*'] else [c for c in columns if c in known]
+            where, args = self._where(table, filters)
+            total = self.conn.execute(f'SELECT COUNT(*) FROM "{table}"{where}', args).fetchone()[0]
+            quoted = ', '.join(f'"{c}"' for c in wanted)
+            sql = f'SELECT {quoted} FROM "{table}"{where}'
+            if order:
+                sql += ' ORDER BY ' + ', '.join(f'"{c}" {d}' for c, d in order if c in known)
+            sql += f' LIMIT {limit if limit is not None else -1} OFFSET {offset}'
+            rows = self.conn.execute(sql, args).fetchall()
+            missing = [c for c in columns if c != '*' and c not in known]
+            return [
+                {**{c: self._decode(table, c, v) for c, v in zip(wanted, row)}, **dict.fromkeys(missing)}
+                for row in rows
+            ], total
+
+    def update(self, table: str, values: Dict[str, Any], filters: List[Tuple[str, str]]) -> int:
+        with self.lock:
+            if table not in self.columns:
+                return 0
+            self._ensure(table, list(values), values)
+            where, args = self._where(table, filters)
+            assignments = ', '.join(f'"{c}" = ?' for c in values)
+            cursor = self.conn.execute(f'UPDATE "{table}" SET {assignments}{where}',
+                                       [self._encode(v) for v in values.values()] + args)
+            return cursor.rowcount
+
+    def delete(self, table: str, filters: List[Tuple[str, str]]) -> int:
+        with self.lock:
+            if table not in self.columns:
+                return 0
+            where, args = self._where(table, filters)
+            return self.conn.execute(f'DELETE FROM "{table}"{where}', args).rowcount
+
+    def backfill_column(self, target_table: str, key_column: str, value_column: str, pairs: List[Dict[str, Any]]) -> int:
+        """Same contract as the backfill_column SQL function: rows actually changed"""
+        with self.lock:
+            if target_table not in self.columns:
+                return 0
+            self._ensure(target_table, [value_column], next((p for p in pairs if p.get(value_column) is not None), {}))
+            cursor = self.conn.executemany(
+                f'UPDATE "{target_table}" SET "{value_column}" = ? '
+                f'WHERE "{key_column}" = ? AND "{value_column}" IS NOT ?',
+                ((self._encode(p.get(value_column)), p[key_column], self._encode(p.get(value_column))) for p in pairs),
+            )
+            return cursor.rowcount
+
+class _Handler(BaseHTTPRequestHandler):
+    server: 'LocalRestServer'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format % args)
+
+    def _route(self) -> Tuple[str, List[Tuple[str, str]]]:
+        url = urlparse(self.path)
+        match = re.fullmatch(r'/rest/v1/(rpc/)?(\w+)', url.path)
+        if not match:
+            raise RestError(404, 'PGRST125', f'invalid path {url.path}')
+        return (match.group(1) or '') + match.group(2), parse_qsl(url.query, keep_blank_values=True)
+
+    def _prefer(self) -> Dict[str, str]:
+        prefs = {}
+        for item in self.headers.get('Prefer', '').split(','):
+            name, _, value = item.strip().partition('=')
+            if name:
+                prefs[name] = value
+        return prefs
+
+    def _body(self) -> Any:
+        raw = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        profile = self.server.profile
+        if profile.max_body_bytes and len(raw) > profile.max_body_bytes:
+            raise RestError(413, 'PGRST413', 'request entity too large')
+        if self.headers.get('Content-Encoding') == 'gzip':
+            if not profile.accept_gzip:
+                raise RestError(400, 'PGRST102', 'Empty or invalid json')
+            raw = gzip.decompress(raw)
+        try:
+            return json.loads(raw) if raw else None
+        except ValueError:
+            raise RestError(400, 'PGRST102', 'Empty or invalid json')
+
+    def _send(self, status: int, payload: Any = None, headers: Dict[str, str] | None = None) -> None:
+        body = b'' if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if payload is not None:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _handle(self, method: str) -> None:
+        server = self.server
+        server.count(method)
+        try:
+            # Read the body first so a refused request never leaves it on the connection
+            body = self._body() if method in ('POST', 'PATCH') else None
+            server.delay()
+            if method != 'GET' and server.fail():
+                raise RestError(503, 'PGRST000', 'injected failure')
+            target, params = self._route()
+            getattr(self, f'_{method.lower()}')(target, params, body)
+        except sqlite3.Error as e:
+            self._send(400, {'code': 'PGRST000', 'message': str(e), 'details': None, 'hint': None})
+        except RestError as e:
+            self._send(e.status, {'code': e.code, 'message': e.message, 'details': None, 'hint': None})
+
+    def _filters(self, params: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        return [(k, v) for k, v in params if k not in RESERVED_PARAMS]
+
+    def _get(self, target: str, params: List[Tuple[str, str]], body: Any) -> None:
+        options = dict(params)
+        columns = [c.strip() for c in options.get('select', '*').split(',') if c.strip()]
+        order = []
+        for item in filter(None, options.get('order', '').split(',')):
+            column, _, direction = item.partition('.')
+            order.append((column, 'DESC' if direction.startswith('desc') else 'ASC'))
+        limit = int(options['limit']) if 'limit' in options else None
+        offset = int(options.get('offset', 0))
+        range_header = re.fullmatch(r'(\d+)-(\d*)', self.headers.get('Range', ''))
+        if range_header:
+            offset = int(range_header.group(1))
+            if range_header.group(2):
+                limit = int(range_header.group(2)) - offset + 1
+
+        max_rows = self.server.profile.max_rows
+        if max_rows is not None:
+            limit = min(limit, max_rows) if limit is not None else max_rows
+        rows, total = self.server.store.select(target, columns, self._filters(params), order, limit, offset)
+        end = f'{offset}-{offset + len(rows) - 1}' if rows else '*'
+        exact = self._prefer().get('count') == 'exact'
+        self._send(200, rows, {'Content-Range': f'{end}/{total if exact else "*"}'})
+
+    def _post(self, target: str, params: List[Tuple[str, str]], body: Any) -> None:
+        store = self.server.store
+        if target.startswith('rpc/'):
+            function = target[4:]
+            if function != 'backfill_column' or not isinstance(body, dict):
+                raise RestError(404, 'PGRST202', f'Could not find the function public.{function}')
+            self._send(200, store.backfill_column(**body))
+            return
+
+        rows = body if isinstance(body, list) else [body]
+        if not all(isinstance(row, dict) for row in rows):
+            raise RestError(400, 'PGRST102', 'All object keys must match')
+        for column, value in self.server.profile.reject_values.items():
+            if any(row.get(column) == value for row in rows):
+                raise RestError(400, '23514', f'new row for relation "{target}" violates check constraint on {column}')
+        prefer = self._prefer()
+        inserted = store.insert(target, rows, dict(params).get('on_conflict'), prefer.get('resolution'))
+        self.server.rows_written += inserted
+        self._send(201, rows if prefer.get('return') == 'representation' else None,
+                   {'Content-Range': f'*/{inserted}'})
+
+    def _patch(self, target: str, params: List[Tuple[str, str]], body: Any) -> None:
+        if not isinstance(body, dict):
+            raise RestError(400, 'PGRST102', 'Empty or invalid json')
+        updated = self.server.store.update(target, body, self._filters(params))
+        self._send(204, headers={'Content-Range': f'*/{updated}'})
+
+    def _delete(self, target: str, params: List[Tuple[str, str]], body: Any) -> None:
+        deleted = self.server.store.delete(target, self._filters(params))
+        self._send(204, headers={'Content-Range': f'*/{deleted}'})
+
+    def do_GET(self) -> None:
+        self._handle('GET')
+
+    def do_HEAD(self) -> None:
+        self._handle('GET')
+
+    def do_POST(self) -> None:
+        self._handle('POST')
+
+    def do_PATCH(self) -> None:
+        self._handle('PATCH')
+
+    def do_DELETE(self) -> None:
+        self._handle('DELETE')
+
+class LocalRestServer(ThreadingHTTPServer):
+    """The stand-in server; use as a context manager to run it on a background thread"""
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, profile: FaultProfile | None = None, database: str = ':memory:'):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.profile = profile or FaultProfile()
+        self.store = SqliteStore(database)
+        self.random = random.Random(self.profile.seed)
+        self.random_lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        self.rows_written = 0
+        self.thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass wherever SUPABASE_URL is expected"""
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # A client that timed out on an injected delay has hung up; that is not a server fault
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    def count(self, method: str) -> None:
+        with self.random_lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+
+    def delay(self) -> None:
+        profile = self.profile
+        if profile.latency or profile.jitter:
+            with self.random_lock:
+                extra = self.random.uniform(0, profile.jitter) if profile.jitter else 0.0
+            time.sleep(profile.latency + extra)
+
+    def fail(self) -> bool:
+        if not self.profile.failure_rate:
+            return False
+        with self.random_lock:
+            return self.random.random() < self.profile.failure_rate
+
+    def start(self) -> 'LocalRestServer':
+        self.thread = threading.Thread(target=self.serve_forever, name='local-rest', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> 'LocalRestServer':
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve a local PostgREST stand-in over SQLite")
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--database', default=':memory:', help="SQLite file to keep the data between runs")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument('--jitter', type=float, default=0.0, help="up to this many extra seconds per request")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="share of writes answered 503")
+    parser.add_argument('--max-body-kb', type=int, default=None, help="answer larger request bodies with 413")
+    parser.add_argument('--max-rows', type=int, default=None, help="most rows returned by one GET")
+    parser.add_argument('--no-gzip', action='store_true', help="refuse gzipped request bodies")
+    parser.add_argument('--reject', nargs='*', default=[], metavar='COLUMN=VALUE',
+                        help="refuse rows whose column holds this JSON value, e.g. price_in_egp='\"bad\"'")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    profile = FaultProfile(
+        latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate,
+        max_body_bytes=args.max_body_kb * 1024 if args.max_body_kb else None,
+        max_rows=args.max_rows,
+        accept_gzip=not args.no_gzip,
+        reject_values={k: json.loads(v) for k, v in (item.split('=', 1) for item in args.reject)},
+    )
+    server = LocalRestServer(args.port, profile, args.database)
+    logger.info(f"🧪 Local REST stand-in on {server.url}/rest/v1 (latency {args.latency}s, "
+                f"failure rate {args.failure_rate:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
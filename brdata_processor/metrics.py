@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""Per-stage run metrics with a JSON run report and a Prometheus textfile
+
+A pipeline run is split into named stages (scrape, transform, upload, verify,
+...). Each stage records wall time, rows, bytes in and out, requests, retries,
+peak RSS and a histogram of HTTP latencies. At the end of the run the totals
+are written as a timestamped JSON report and as {pipeline}.prom for the
+node_exporter textfile collector, and compared with the previous report of the
+same pipeline so a slowdown shows up in the run's own output.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from brdata_processor.streaming import peak_rss_mb
+from brdata_processor.uploader import UploadReport
+
+REPORT_DIR = '.run_reports'
+
+# Upper bounds in seconds; PostgREST inserts sit around 0.1-2s, scraper pages a little lower
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# A stage this much slower (or this much lower in rows/s) than last run is flagged
+REGRESSION_TOLERANCE = 0.2
+MIN_COMPARABLE_SECONDS = 1.0
+
+def _sample(value: float) -> str:
+    """Exposition-format number: integers stay exact, floats keep their precision"""
+    return str(int(value)) if float(value).is_integer() else repr(round(float(value), 6))
+
+@dataclass
+class LatencyHistogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+    buckets: Sequence[float] = LATENCY_BUCKETS
+    counts: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    total: float = 0.0
+    count: int = 0
+
+    def observe(self, seconds: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += seconds
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, count) pairs including +Inf"""
+        pairs = []
+        running = 0
+        for bound, n in zip(list(self.buckets) + [float('inf')], self.counts):
+            running += n
+            pairs.append(('+Inf' if bound == float('inf') else f'{bound:g}', running))
+        return pairs
+
+    def quantile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for bound, n in zip(self.buckets, self.counts):
+            running += n
+            if running >= target:
+                return bound
+        return float('inf')
+
+@dataclass
+class StageMetrics:
+    """Counters for one pipeline stage"""
+    name: str
+    seconds: float = 0.0
+    rows: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    requests: int = 0
+    retries: int = 0
+    errors: int = 0
+    peak_rss_mb: float = 0.0  # process peak when the stage ended
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def observe_request(self, seconds: float, bytes_in: int = 0, bytes_out: int = 0, ok: bool = True) -> None:
+        """One HTTP round trip; safe to call from upload threads"""
+        with self._lock:
+            self.requests += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.errors += 0 if ok else 1
+            self.latency.observe(seconds)
+
+    def add_upload(self, report: UploadReport) -> None:
+        """Fold an uploader report into the stage"""
+        with self._lock:
+            self.rows += report.rows_uploaded
+            self.bytes_out += report.bytes_sent
+            self.requests += report.requests
+            self.retries += report.retries
+            self.errors += report.rows_failed + report.rows_rejected
+            for result in report.results:
+                for seconds in result.latencies:
+                    self.latency.observe(seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'seconds': round(self.seconds, 3),
+            'rows': self.rows,
+            'rows_per_second': round(self.rows_per_second, 2),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'requests': self.requests,
+            'retries': self.retries,
+            'errors': self.errors,
+            'peak_rss_mb': round(self.peak_rss_mb, 1),
+            'latency': {
+                'count': self.latency.count,
+                'sum': round(self.latency.total, 4),
+                'p50': self.latency.quantile(0.5),
+                'p95': self.latency.quantile(0.95),
+                'buckets': dict(self.latency.cumulative()),
+            },
+        }
+
+class RunMetrics:
+    """Stages of one pipeline run and the reports written at the end"""
+
+    def __init__(self, pipeline: str, directory: str = REPORT_DIR):
+        self.pipeline = pipeline
+        self.directory = directory
+        self.started_at = time.time()
+        self.stages: Dict[str, StageMetrics] = {}
+        self.labels: Dict[str, str] = {}
+
+    def get(self, name: str) -> StageMetrics:
+        if name not in self.stages:
+            self.stages[name] = StageMetrics(name)
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageMetrics]:
+        """Time a block as a stage; re-entering a stage adds to its totals"""
+        stage = self.get(name)
+        started = time.monotonic()
+        try:
+            yield stage
+        finally:
+            stage.seconds += time.monotonic() - started
+            stage.peak_rss_mb = max(stage.peak_rss_mb, peak_rss_mb())
+
+    def timed(self, name: str, items: Iterable[Any], rows=len) -> Iterator[Any]:
+        """Pass items through, charging the time spent producing each one to a stage
+
+        Used for lazy stages such as the CSV transform, which run inside the
+        consumer's loop and so cannot be timed with a block of their own. The
+        consumer's stage still includes this time in its own wall time.
+        """
+        stage = self.get(name)
+        source = iter(items)
+        while True:
+            started = time.monotonic()
+            try:
+                item = next(source)
+            except StopIteration:
+                return
+            finally:
+                stage.seconds += time.monotonic() - started
+            stage.rows += rows(item)
+            stage.peak_rss_mb = max(stage.peak_rss_mb, peak_rss_mb())
+            yield item
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'pipeline': self.pipeline,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            'seconds': round(time.time() - self.started_at, 3),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'labels': self.labels,
+            'stages': {name: stage.to_dict() for name, stage in self.stages.items()},
+        }
+
+    def previous_report(self) -> Dict[str, Any] | None:
+        """The most recent JSON report of this pipeline, if any"""
+        if not os.path.isdir(self.directory):
+            return None
+        prefix = f'{self.pipeline}_'
+        # The timestamp suffix keeps brdata_import from matching brdata_import_sync reports
+        reports = sorted(
+            f for f in os.listdir(self.directory)
+            if f.startswith(prefix) and f[len(prefix):len(prefix) + 1].isdigit() and f.endswith('.json')
+        )
+        if not reports:
+            return None
+        with open(os.path.join(self.directory, reports[-1]), encoding='utf-8') as f:
+            return json.load(f)
+
+    def regressions(self, previous: Dict[str, Any] | None, tolerance: float = REGRESSION_TOLERANCE) -> List[str]:
+        """Stages that got noticeably slower than in the previous report"""
+        if not previous:
+            return []
+        found = []
+        for name, stage in self.stages.items():
+            before = previous.get('stages', {}).get(name)
+            # Sub-second stages are mostly noise
+            if not before or max(stage.seconds, before.get('seconds', 0)) < MIN_COMPARABLE_SECONDS:
+                continue
+            if stage.rows and before.get('rows'):
+                if stage.rows_per_second < before['rows_per_second'] * (1 - tolerance):
+                    found.append(f"{name}: {stage.rows_per_second:,.0f} rows/s, was {before['rows_per_second']:,.0f}")
+            elif stage.seconds > before['seconds'] * (1 + tolerance):
+                found.append(f"{name}: {stage.seconds:.1f}s, was {before['seconds']:.1f}s")
+        return found
+
+    def prometheus_text(self) -> str:
+        """Exposition-format text for the node_exporter textfile collector"""
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[Tuple[Dict[str, str], float]]) -> None:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                rendered = ','.join(f'{k}="{v}"' for k, v in {'pipeline': self.pipeline, **labels}.items())
+                lines.append(f'{name}{{{rendered}}} {_sample(value)}')
+
+        stages = list(self.stages.values())
+
+        def per_stage(attr: str) -> List[Tuple[Dict[str, str], float]]:
+            return [({'stage': s.name}, getattr(s, attr)) for s in stages]
+
+        metric('brdata_run_timestamp_seconds', 'gauge', 'Start time of the last run.', [({}, self.started_at)])
+        metric('brdata_stage_seconds', 'gauge', 'Wall time spent in the stage.', per_stage('seconds'))
+        metric('brdata_stage_rows', 'gauge', 'Rows handled by the stage.', per_stage('rows'))
+        metric('brdata_stage_rows_per_second', 'gauge', 'Stage throughput.', per_stage('rows_per_second'))
+        metric('brdata_stage_bytes_in', 'gauge', 'Bytes the stage received.', per_stage('bytes_in'))
+        metric('brdata_stage_bytes_out', 'gauge', 'Bytes the stage sent.', per_stage('bytes_out'))
+        metric('brdata_stage_requests', 'gauge', 'HTTP requests made by the stage.', per_stage('requests'))
+        metric('brdata_stage_retries', 'gauge', 'Requests the stage retried.', per_stage('retries'))
+        metric('brdata_stage_errors', 'gauge', 'Failed requests or rows in the stage.', per_stage('errors'))
+        metric('brdata_stage_peak_rss_bytes', 'gauge', 'Process peak RSS at the end of the stage.',
+               [({'stage': s.name}, s.peak_rss_mb * 1024 * 1024) for s in stages])
+
+        name = 'brdata_http_request_duration_seconds'
+        lines.append(f'# HELP {name} HTTP round-trip latency per stage.')
+        lines.append(f'# TYPE {name} histogram')
+        for s in stages:
+            if not s.latency.count:
+                continue
+            base = f'pipeline="{self.pipeline}",stage="{s.name}"'
+            for le, count in s.latency.cumulative():
+                lines.append(f'{name}_bucket{{{base},le="{le}"}} {count}')
+            lines.append(f'{name}_sum{{{base}}} {_sample(s.latency.total)}')
+            lines.append(f'{name}_count{{{base}}} {s.latency.count}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self) -> Tuple[str, str, List[str]]:
+        """Write the JSON report and the textfile; returns both paths and any regressions"""
+        os.makedirs(self.directory, exist_ok=True)
+        regressions = self.regressions(self.previous_report())
+
+        stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(self.started_at))
+        report_path = os.path.join(self.directory, f'{self.pipeline}_{stamp}.json')
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({**self.to_dict(), 'regressions': regressions}, f, indent=2)
+
+        # The collector may read at any moment, so the textfile is replaced atomically
+        prom_path = os.path.join(self.directory, f'{self.pipeline}.prom')
+        with open(f'{prom_path}.tmp', 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(f'{prom_path}.tmp', prom_path)
+        return report_path, prom_path, regressions
+
+    def summary(self) -> List[str]:
+        """One line per stage for the end-of-run printout"""
+        lines = []
+        for s in self.stages.values():
+            line = f"{s.name:<14} {s.seconds:7.1f}s {s.rows:>9,} rows {s.rows_per_second:>9,.0f} rows/s"
+            if s.requests:
+                p95 = s.latency.quantile(0.95)
+                line += f"  {s.requests:,} requests, {s.retries} retries"
+                if p95 is not None:
+                    line += f", p95 ≤ {p95:g}s"
+            lines.append(line)
+        return lines
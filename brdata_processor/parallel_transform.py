@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Process-pool parsing of the nested JSON columns into Arrow record batches
+
+The snapshot is split into contiguous row-range partitions. Each worker parses
+its partition and sends back an Arrow IPC stream rather than pickled dicts, and
+partitions are reassembled in row order so the output is deterministic.
+Importers that upload the JSON values as objects send the canonical text as
+serialization.RawJSON, so nothing is parsed or encoded again on the main
+thread.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Sequence, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from brdata_processor.serialization import dumps
+from brdata_processor.transform import JSON_COLUMNS, parse_json_field
+
+# Columns whose parsed value is a {'id': ..., 'name': ...} object
+NAMED_COLUMNS = ['compound', 'area', 'developer', 'phase', 'property_type']
+
+# More partitions than workers keeps cores busy when some rows carry heavier JSON
+PARTITIONS_PER_WORKER = 4
+
+def _output_schema(columns: Sequence[str]) -> pa.Schema:
+    """Arrow schema of one parsed partition"""
+    fields = [pa.field('row_index', pa.int64())]
+    for col in columns:
+        fields.append(pa.field(col, pa.string()))
+        if col in NAMED_COLUMNS:
+            fields.append(pa.field(f'{col}_id', pa.int64()))
+            fields.append(pa.field(f'{col}_name', pa.string()))
+    if 'payment_plans' in columns:
+        fields += [
+            pa.field('down_payment_value', pa.float64()),
+            pa.field('down_payment_percent', pa.float64()),
+            pa.field('monthly_installment', pa.float64()),
+            pa.field('payment_years', pa.int64()),
+        ]
+    return pa.schema(fields)
+
+def _as_number(value, cast):
+    """Cast a scalar pulled out of the JSON, or None if it is not numeric"""
+    try:
+        return cast(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def parse_partition(start: int, raw_columns: Dict[str, List[Any]]) -> bytes:
+    """Parse one row range and return it as a serialised Arrow record batch"""
+    columns = list(raw_columns)
+    row_count = len(next(iter(raw_columns.values()))) if raw_columns else 0
+    out: Dict[str, List[Any]] = {'row_index': list(range(start, start + row_count))}
+
+    for col in columns:
+        canonical, ids, names = [], [], []
+        payments: List[Tuple] = []
+
+        for raw in raw_columns[col]:
+            parsed = parse_json_field(raw)
+            # Encoded as the uploaders encode rows, so the text can be sent as it is
+            canonical.append(dumps(parsed).decode('utf-8') if parsed is not None else None)
+
+            if col in NAMED_COLUMNS:
+                obj = parsed if isinstance(parsed, dict) else {}
+                ids.append(_as_number(obj.get('id'), int))
+                names.append(obj.get('name'))
+
+            if col == 'payment_plans':
+                # Same convention as the importers: the first plan is the headline plan
+                plan = parsed[0] if isinstance(parsed, list) and parsed and isinstance(parsed[0], dict) else {}
+                payments.append((
+                    _as_number(plan.get('down_payment_value'), float),
+                    _as_number(plan.get('down_payment'), float),
+                    _as_number(plan.get('equal_installments_value'), float),
+                    _as_number(plan.get('years'), int),
+                ))
+
+        out[col] = canonical
+        if col in NAMED_COLUMNS:
+            out[f'{col}_id'] = ids
+            out[f'{col}_name'] = names
+        if col == 'payment_plans':
+            for i, name in enumerate(['down_payment_value', 'down_payment_percent',
+                                      'monthly_installment', 'payment_years']):
+                out[name] = [p[i] for p in payments]
+
+    batch = pa.RecordBatch.from_pydict(out, schema=_output_schema(columns))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+def _read_batch(payload: bytes) -> pa.RecordBatch:
+    """Deserialise a worker's IPC stream back into its single record batch"""
+    return pa.ipc.open_stream(payload).read_next_batch()
+
+def _partitions(df: pd.DataFrame, columns: Sequence[str], partition_rows: int):
+    """Yield (start, raw column lists) for each contiguous row range"""
+    for start in range(0, len(df), partition_rows):
+        chunk = df.iloc[start:start + partition_rows]
+        yield start, {col: chunk[col].tolist() for col in columns}
+
+def parse_json_columns(
+    df: pd.DataFrame,
+    columns: Sequence[str] | None = None,
+    workers: int | None = None,
+    partition_rows: int | None = None,
+) -> pa.Table:
+    """Parse the nested JSON columns of a snapshot on all cores
+
+    Returns an Arrow table aligned with df by position: canonical JSON text per
+    column, the id/name of each named object and the headline payment plan fields.
+    """
+    columns = [c for c in (columns or JSON_COLUMNS) if c in df.columns]
+    workers = workers or os.cpu_count() or 1
+    if partition_rows is None:
+        partition_rows = max(1, -(-len(df) // (workers * PARTITIONS_PER_WORKER)))
+
+    schema = _output_schema(columns)
+    if len(df) == 0:
+        return schema.empty_table()
+
+    if workers == 1:
+        payloads = [parse_partition(start, raw) for start, raw in _partitions(df, columns, partition_rows)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() yields results in submission order, so row order is preserved
+            starts, raws = zip(*_partitions(df, columns, partition_rows))
+            payloads = list(pool.map(parse_partition, starts, raws))
+
+    return pa.Table.from_batches([_read_batch(p) for p in payloads], schema=schema)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Developer -> area -> compound -> property type rollup of a full snapshot
+
+Every level of the hierarchy gets the same figures: unit count, price
+min / max / mean / median, the range of unit ids and the sale type mix.
+Each JSON name column is parsed once per distinct string. The four levels
+are integer codes, and each level is one pandas groupby over the whole
+snapshot, so no Python loop runs per row.
+
+The artifact is a small JSON tree. Its children are keyed by name and
+sorted, and its figures are positional arrays named once in `columns`, so
+two snapshots' trees diff cleanly line by line or through diff_rollups().
+Nodes can be looked up by path with find_node().
+"""
+
+import json
+import os
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from brdata_processor.streaming import iter_csv_chunks
+from brdata_processor.transform import parse_json_field
+
+ROLLUP_VERSION = 1
+LEVELS = ['developer', 'area', 'compound', 'property_type']
+STAT_COLUMNS = ['units', 'price_min', 'price_max', 'price_mean', 'price_median', 'id_min', 'id_max']
+SOURCE_COLUMNS = ['id', 'price_in_egp', 'sale_type', 'is_active'] + LEVELS
+UNKNOWN = 'Unknown'
+
+@lru_cache(maxsize=8192)
+def _reference(text: str) -> Tuple[str, int | None]:
+    parsed = parse_json_field(text)
+    if not isinstance(parsed, dict) or not parsed.get('name'):
+        return UNKNOWN, None
+    ref = parsed.get('id')
+    return str(parsed['name']).strip(), int(ref) if isinstance(ref, (int, float)) and ref == ref else None
+
+def _level_codes(values: pd.Series) -> Tuple[np.ndarray, List[str], List[int | None]]:
+    """Codes of a JSON name column with the name and Nawy id behind each code; each distinct string parsed once"""
+    codes, uniques = pd.factorize(values.fillna(''), sort=False)
+    refs = [_reference(text) if isinstance(text, str) and text else (UNKNOWN, None) for text in uniques]
+    # Strings that differ only in spacing or key order name the same entity
+    names = sorted({name for name, _ in refs})
+    position = {name: i for i, name in enumerate(names)}
+    remap = np.array([position[name] for name, _ in refs], dtype=np.int64)
+    ids: List[int | None] = [None] * len(names)
+    for name, ref in refs:
+        if ids[position[name]] is None:
+            ids[position[name]] = ref
+    return remap[codes] if len(codes) else codes.astype(np.int64), names, ids
+
+def _number(value: float) -> float | int | None:
+    if value is None or not np.isfinite(value):
+        return None
+    return int(value) if float(value).is_integer() else round(float(value), 2)
+
+class RollupBuilder:
+    """Narrow coded frames accumulated chunk by chunk, grouped once at the end"""
+
+    def __init__(self):
+        self.parts: List[pd.DataFrame] = []
+
+    def add_frame(self, frame: pd.DataFrame) -> None:
+        if 'is_active' in frame.columns:
+            frame = frame[frame['is_active'].fillna(True).astype(bool)]
+        part = pd.DataFrame(index=frame.index)
+        for level in LEVELS:
+            part[level] = frame[level] if level in frame.columns else None
+        price = pd.to_numeric(frame['price_in_egp'], errors='coerce') if 'price_in_egp' in frame.columns else np.nan
+        part['price'] = pd.Series(price, index=frame.index).where(lambda p: p > 0)
+        part['id'] = pd.to_numeric(frame['id'], errors='coerce') if 'id' in frame.columns else np.nan
+        sale_type = frame['sale_type'] if 'sale_type' in frame.columns else pd.Series(None, index=frame.index)
+        part['sale_type'] = sale_type.fillna(UNKNOWN).astype(str)
+        self.parts.append(part)
+
+    def build(self, source: str = '') -> Dict[str, Any]:
+        """The rollup tree"""
+        units = pd.concat(self.parts, ignore_index=True) if self.parts else pd.DataFrame(
+            columns=LEVELS + ['price', 'id', 'sale_type'])
+        names: Dict[str, List[str]] = {}
+        refs: Dict[str, List[int | None]] = {}
+        for level in LEVELS:
+            units[level], names[level], refs[level] = _level_codes(units[level].astype(object))
+        sale_codes, sale_types = pd.factorize(units['sale_type'], sort=True)
+        units['sale'] = sale_codes
+
+        tree: Dict[str, Any] = {'stats': self._stats(units), 'sale_mix': self._mix(units, len(sale_types)),
+                                'children': {}}
+        # One groupby per level; node dicts are shared so deeper levels attach to them by key
+        nodes: Dict[Tuple[int, ...], Dict[str, Any]] = {(): tree}
+        for depth, level in enumerate(LEVELS, start=1):
+            keys = LEVELS[:depth]
+            grouped = units.groupby(keys, sort=True)
+            stats = grouped.agg(
+                units=('sale', 'size'),
+                price_min=('price', 'min'),
+                price_max=('price', 'max'),
+                price_mean=('price', 'mean'),
+                price_median=('price', 'median'),
+                id_min=('id', 'min'),
+                id_max=('id', 'max'),
+            )
+            mix = units.groupby(keys + ['sale'], sort=True).size().unstack('sale', fill_value=0)
+            mix = mix.reindex(columns=range(len(sale_types)), fill_value=0).reindex(stats.index)
+            for path, row, counts in zip(stats.index, stats.itertuples(index=False), mix.to_numpy()):
+                path = path if isinstance(path, tuple) else (path,)
+                node = {
+                    'id': refs[level][path[-1]],
+                    'stats': [_number(v) for v in row],
+                    'sale_mix': [int(n) for n in counts],
+                }
+                if depth < len(LEVELS):
+                    node['children'] = {}
+                nodes[path[:-1]]['children'][names[level][path[-1]]] = node
+                nodes[path] = node
+
+        return {
+            'version': ROLLUP_VERSION,
+            'source': source,
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'levels': LEVELS,
+            'columns': STAT_COLUMNS,
+            'sale_types': list(sale_types),
+            'tree': tree,
+        }
+
+    @staticmethod
+    def _stats(units: pd.DataFrame) -> List[Any]:
+        price, ids = units['price'], units['id']
+        return [len(units), _number(price.min()), _number(price.max()), _number(price.mean()),
+                _number(price.median()), _number(ids.min()), _number(ids.max())]
+
+    @staticmethod
+    def _mix(units: pd.DataFrame, kinds: int) -> List[int]:
+        return np.bincount(units['sale'].to_numpy(np.int64), minlength=kinds).tolist() if len(units) else [0] * kinds
+
+def rollup_csv(csv_file: str, max_memory_mb: float = 256) -> Dict[str, Any]:
+    builder = RollupBuilder()
+    for chunk in iter_csv_chunks(csv_file, max_memory_mb, usecols=lambda c: c in SOURCE_COLUMNS):
+        builder.add_frame(chunk)
+    return builder.build(os.path.basename(csv_file))
+
+def write_rollup(rollup: Dict[str, Any], path: str) -> int:
+    """One line per top-level key, children sorted, so text diffs stay readable; returns bytes written"""
+    text = json.dumps(rollup, ensure_ascii=False, sort_keys=True, indent=1, separators=(',', ':'))
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(f'{path}.tmp', path)
+    return len(text.encode('utf-8'))
+
+def load_rollup(path: str) -> Dict[str, Any]:
+    with open(path, encoding='utf-8') as f:
+        rollup = json.load(f)
+    if rollup.get('version') != ROLLUP_VERSION:
+        raise ValueError(f"{path} is rollup version {rollup.get('version')}, expected {ROLLUP_VERSION}")
+    return rollup
+
+def node_stats(rollup: Dict[str, Any], node: Dict[str, Any]) -> Dict[str, Any]:
+    """A node's figures by column name, with its sale mix by sale type"""
+    stats = dict(zip(rollup['columns'], node['stats']))
+    stats['sale_mix'] = {kind: n for kind, n in zip(rollup['sale_types'], node['sale_mix']) if n}
+    return stats
+
+def find_node(rollup: Dict[str, Any], *path: str) -> Dict[str, Any] | None:
+    """The node at a developer[, area[, compound[, type]]] path, or None"""
+    node = rollup['tree']
+    for name in path:
+        node = node.get('children', {}).get(name)
+        if node is None:
+            return None
+    return node
+
+def iter_nodes(rollup: Dict[str, Any]):
+    """(path, node) for every node below the root, depth first in key order"""
+    stack = [((), rollup['tree'])]
+    while stack:
+        path, node = stack.pop()
+        for name in sorted(node.get('children', {}), reverse=True):
+            stack.append((path + (name,), node['children'][name]))
+        if path:
+            yield path, node
+
+def diff_rollups(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Nodes added, removed, or whose unit count or price range changed between two rollups"""
+    before = {path: node_stats(old, node) for path, node in iter_nodes(old)}
+    after = {path: node_stats(new, node) for path, node in iter_nodes(new)}
+    changes = []
+    for path in sorted(before.keys() | after.keys()):
+        was, now = before.get(path), after.get(path)
+        if was is None:
+            changes.append({'path': list(path), 'change': 'added', 'units': now['units']})
+        elif now is None:
+            changes.append({'path': list(path), 'change': 'removed', 'units': was['units']})
+        else:
+            changed = {
+                key: [was.get(key), now.get(key)]
+                for key in ('units', 'price_min', 'price_max', 'price_median')
+                if was.get(key) != now.get(key)
+            }
+            if changed:
+                changes.append({'path': list(path), 'change': 'changed', 'fields': changed})
+    return changes
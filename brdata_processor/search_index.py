@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Bilingual name normalisation, search tokens and the autocomplete dictionary
+
+Compound, area and developer names reach the app spelled several ways:
+"Il bosco" / "IL Bosco City", with or without accents, or typed in Arabic
+("البوسكو"). Every spelling is folded to the same form:
+
+- Unicode compatibility-decompose and drop combining marks (accents, Arabic
+  harakat) and tatweel.
+- Fold Arabic letter variants (أ إ آ -> ا, ة -> ه, ى -> ي, ...), drop the
+  joined article ال, read a word-final ه as a, and transliterate the rest
+  to Latin letters.
+- Lowercase, split on anything but a-z0-9, and drop the articles al/el/il.
+
+A word's skeleton also merges digraphs (sh, kh, th, ...) and letters that
+Arabic does not tell apart (c/k/q, p/b, v/f, j/g), then removes vowels
+(including w and y, which stand for long vowels in Arabic). That way
+"bosco" and "بوسكو" both become "bsk".
+
+The pipeline writes each unit's words plus ~skeletons into search_tokens,
+which a trigram index serves for ILIKE (migration 014). It also publishes a
+prefix dictionary of the compound, area and developer names for the search
+box. src/lib/searchIndex.ts mirrors these rules exactly; change both together.
+"""
+
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Tuple
+
+import requests
+
+from brdata_processor.config import SUPABASE_KEY, SUPABASE_URL, rest_headers, rest_url
+from brdata_processor.serialization import dumps
+from brdata_processor.upsert import conflict_key
+
+SEARCH_TABLE = 'inventory_search'
+DICTIONARY_VERSION = 1
+
+_ARABIC_FOLD = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا', 'ة': 'ه', 'ى': 'ي', 'ؤ': 'و', 'ئ': 'ي', 'ـ': None,
+})
+# Egyptian usage: ج is g, ق is mostly k, ع and ء carry no Latin letter of their own
+_ARABIC_LATIN = str.maketrans({
+    'ا': 'a', 'ب': 'b', 'ت': 't', 'ث': 'th', 'ج': 'g', 'ح': 'h', 'خ': 'kh', 'د': 'd', 'ذ': 'z', 'ر': 'r',
+    'ز': 'z', 'س': 's', 'ش': 'sh', 'ص': 's', 'ض': 'd', 'ط': 't', 'ظ': 'z', 'ع': 'a', 'غ': 'gh', 'ف': 'f',
+    'ق': 'k', 'ك': 'k', 'ل': 'l', 'م': 'm', 'ن': 'n', 'ه': 'h', 'و': 'o', 'ي': 'y', 'ء': '', 'ڤ': 'v',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4', '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+_ARABIC_ARTICLE = re.compile(r'(^|\s)ال(?=\S{2})')
+# A word-final ه (or the ة folded into it) is said as a: الجونة -> gona
+_FINAL_HEH = re.compile(r'ه(?=\s|$)')
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+ARTICLES = {'al', 'el', 'il'}
+
+_DIGRAPHS = [('sh', 's'), ('kh', 'k'), ('gh', 'g'), ('th', 't'), ('dh', 'd'), ('ph', 'f'), ('ck', 'k')]
+_SOFT_C = re.compile(r'c(?=[eiy])')
+_CONSONANT_CLASSES = str.maketrans('cqvpj', 'kkfbg')
+_VOWELS = re.compile(r'[aeiouwy]')
+_REPEATS = re.compile(r'(.)\1+')
+
+def normalize_text(text: Any) -> str:
+    """Folded, transliterated, lowercase words separated by single spaces"""
+    if text is None or (isinstance(text, float) and text != text):
+        return ''
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(ch for ch in text if not unicodedata.category(ch).startswith('M'))
+    text = _ARABIC_ARTICLE.sub(r'\1', text.translate(_ARABIC_FOLD))
+    text = _FINAL_HEH.sub('a', text).translate(_ARABIC_LATIN).lower()
+    return ' '.join(word for word in _NON_ALNUM.split(text) if word and word not in ARTICLES)
+
+def skeleton(word: str) -> str:
+    """Consonant skeleton of a normalised word, shared by its Latin and Arabic spellings"""
+    for digraph, letter in _DIGRAPHS:
+        word = word.replace(digraph, letter)
+    word = _SOFT_C.sub('s', word).replace('x', 'ks').translate(_CONSONANT_CLASSES)
+    return _REPEATS.sub(r'\1', _VOWELS.sub('', word))
+
+@lru_cache(maxsize=8192)
+def name_terms(name: str) -> Tuple[str, ...]:
+    """Words of a name followed by their ~skeletons"""
+    words = normalize_text(name).split()
+    skeletons = [f'~{s}' for s in map(skeleton, words) if s]
+    return tuple(dict.fromkeys(words + skeletons))
+
+def search_text(names: Iterable[Any], codes: Iterable[Any] = ()) -> str:
+    """The search_tokens value of one unit: its names' terms plus its normalised unit codes"""
+    terms: List[str] = []
+    for name in names:
+        if isinstance(name, str) and name:
+            terms.extend(name_terms(name))
+    for code in codes:
+        terms.extend(normalize_text(code).split())
+    return ' '.join(dict.fromkeys(terms))
+
+def build_dictionary(facets: Dict[str, Any]) -> Dict[str, Any]:
+    """Autocomplete dictionary from the load's facets
+
+    entries are [name, kind, units], most units first. keys is every word and
+    ~skeleton with the entries containing it, sorted so a prefix is found by
+    binary search.
+    """
+    entries: List[Tuple[str, str, int]] = []
+    for kind, facet in (('compound', 'compounds'), ('area', 'areas'), ('developer', 'developers')):
+        entries.extend((item['value'], kind, item['count']) for item in facets.get(facet, []))
+    entries.sort(key=lambda entry: (-entry[2], entry[0].lower()))
+
+    postings: Dict[str, set] = defaultdict(set)
+    for index, (name, _, _) in enumerate(entries):
+        for term in name_terms(name):
+            postings[term].add(index)
+
+    return {
+        'version': DICTIONARY_VERSION,
+        'source_table': facets['source_table'],
+        'generated_at': facets['generated_at'],
+        'entries': [list(entry) for entry in entries],
+        'keys': [[term, sorted(indexes)] for term, indexes in sorted(postings.items())],
+    }
+
+def publish_dictionary(
+    dictionary: Dict[str, Any],
+    base_url: str = SUPABASE_URL,
+    api_key: str = SUPABASE_KEY,
+) -> None:
+    """Replace the table's row in inventory_search"""
+    row = {
+        'source_table': dictionary['source_table'],
+        'dictionary': dictionary,
+        'entry_count': len(dictionary['entries']),
+        'generated_at': dictionary['generated_at'],
+    }
+    response = requests.post(
+        rest_url(SEARCH_TABLE, base_url),
+        params={'on_conflict': conflict_key(SEARCH_TABLE)},
+        headers=rest_headers(api_key, 'resolution=merge-duplicates,return=minimal'),
+        data=dumps([row]),
+        timeout=60,
+    )
+    response.raise_for_status()
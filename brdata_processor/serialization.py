@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Fast JSON encoding of upload rows, with numpy scalars handled natively
+
+orjson is used when it is installed; otherwise the stdlib encoder produces the
+same JSON, only slower. Either way numpy ints, floats and bools from a
+DataFrame serialise as-is, so rows do not need float()/int() casts first.
+Row values wrapped in RawJSON are already JSON text and are spliced into the
+encoded row unchanged.
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any, Dict, List
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY if orjson is not None else 0
+
+class RawJSON(str):
+    """JSON text that encode_rows writes into the row as it is, not as a string"""
+    __slots__ = ()
+
+def _json_default(value: Any) -> Any:
+    """Types the stdlib encoder does not know but orjson handles natively"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _finite_or_none(value: Any) -> Any:
+    """Map NaN/inf to null like orjson does (PostgREST rejects the bare tokens)"""
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {k: _finite_or_none(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_finite_or_none(v) for v in value]
+    return value
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(value, option=_ORJSON_OPTIONS)
+    try:
+        return json.dumps(value, separators=(',', ':'), ensure_ascii=False, allow_nan=False,
+                          default=_json_default).encode('utf-8')
+    except ValueError:
+        return json.dumps(_finite_or_none(value), separators=(',', ':'), ensure_ascii=False,
+                          default=_json_default).encode('utf-8')
+
+def _encode_row(record: Dict[str, Any]) -> bytes:
+    raw = [key for key, value in record.items() if type(value) is RawJSON]
+    if not raw:
+        return dumps(record)
+    rest = dumps({key: value for key, value in record.items() if type(value) is not RawJSON})
+    spliced = b','.join(dumps(key) + b':' + record[key].encode('utf-8') for key in raw)
+    return rest[:-1] + (b',' if len(rest) > 2 else b'') + spliced + b'}'
+
+def encode_rows(batch: List[Dict[str, Any]]) -> List[bytes]:
+    """Encode each row on its own so requests can be cut by size without re-encoding"""
+    return [_encode_row(record) for record in batch]
+
+def backend() -> str:
+    """Name of the encoder in use, for run reports"""
+    return 'orjson' if orjson is not None else 'json'
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Static, pre-filtered inventory shards for CDN delivery
+
+Most browsing is one of a few filter shapes: a single area, compound,
+developer or bedroom count. The export writes the listing rows of each such
+value as a gzipped JSON shard, in listing (sort_key) order, plus a
+manifest.json that maps every value to its shard. The app can then serve
+those paths as static files, with no database query.
+
+Shard files are named by a hash of their content and never change, so a CDN
+can cache them forever. Only the manifest needs a short cache time. A shard
+whose content hash is already in the previous manifest is not compressed or
+written again. Files that neither the new nor the previous manifest refers
+to are removed, so clients holding the previous manifest can still load
+their shards.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+
+from brdata_processor.search_index import normalize_text
+from brdata_processor.serialization import dumps
+from brdata_processor.streaming import iter_csv_chunks
+from brdata_processor.transform import object_name, parse_json_field, to_supabase_safe_frame
+
+logger = logging.getLogger(__name__)
+
+SHARD_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+
+# The listing card's columns (getActiveProperties), with the JSON columns sent parsed
+SHARD_COLUMNS = [
+    'id', 'unit_id', 'unit_number', 'unit_area', 'number_of_bedrooms', 'number_of_bathrooms',
+    'price_per_meter', 'price_in_egp', 'currency', 'finishing', 'is_launch', 'image',
+    'compound', 'area', 'developer', 'property_type', 'payment_plans', 'ready_by', 'sort_key',
+    'commission_percent', 'commission_egp',
+]
+PARSED_COLUMNS = ['compound', 'area', 'developer', 'property_type', 'payment_plans']
+# Shard dimension -> source column; named dimensions hold {'id', 'name'} objects
+DIMENSIONS = {'area': 'area', 'compound': 'compound', 'developer': 'developer', 'bedrooms': 'number_of_bedrooms'}
+SOURCE_COLUMNS = SHARD_COLUMNS + ['last_inventory_update', 'is_active']
+
+@dataclass
+class ShardReport:
+    written: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    bytes_written: int = 0
+    units: int = 0
+
+def shard_slug(value: str) -> str:
+    """File-name-safe form of a dimension value"""
+    return normalize_text(value).replace(' ', '-')[:60] or 'value'
+
+class ShardExporter:
+    """Encoded listing rows grouped by dimension value, accumulated chunk by chunk"""
+
+    def __init__(self):
+        # (dimension, value) -> [(sort_key, encoded row)]
+        self.shards: Dict[Tuple[str, str], List[Tuple[str, bytes]]] = defaultdict(list)
+        self.units = 0
+
+    def add_frame(self, frame: pd.DataFrame) -> None:
+        """Add a chunk in the upload column types; rows explicitly marked inactive are left out"""
+        if 'is_active' in frame.columns:
+            frame = frame[frame['is_active'].fillna(True).astype(bool)]
+        rows = frame[[c for c in SHARD_COLUMNS if c in frame.columns]].to_dict('records')
+        for row in rows:
+            for col in PARSED_COLUMNS:
+                if col in row:
+                    row[col] = parse_json_field(row[col])
+            encoded = dumps(row)
+            for dimension, column in DIMENSIONS.items():
+                raw = row.get(column)
+                value = object_name(raw) if dimension != 'bedrooms' else (str(int(raw)) if raw else None)
+                if value:
+                    self.shards[(dimension, value)].append((row.get('sort_key') or '', encoded))
+        self.units += len(rows)
+
+    def write(self, out_dir: str) -> ShardReport:
+        """Write the changed shards and a new manifest, then drop files no manifest refers to"""
+        report = ShardReport(units=self.units)
+        manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+        previous = _load_manifest(manifest_path)
+        previous_files = {entry['file'] for values in previous.get('shards', {}).values() for entry in values.values()}
+
+        shards: Dict[str, Dict[str, Any]] = defaultdict(dict)
+        for (dimension, value), rows in sorted(self.shards.items()):
+            rows.sort(key=lambda row: row[0], reverse=True)
+            header = dumps({'version': SHARD_VERSION, 'dimension': dimension, 'value': value, 'units': len(rows)})
+            body = header[:-1] + b',"rows":[' + b','.join(encoded for _, encoded in rows) + b']}'
+            digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+            file = f'{dimension}/{shard_slug(value)}-{digest}.json.gz'
+            path = os.path.join(out_dir, file)
+
+            if file in previous_files and os.path.exists(path):
+                report.unchanged += 1
+                size = os.path.getsize(path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # mtime=0 keeps the gzip bytes a function of the content alone
+                data = gzip.compress(body, compresslevel=9, mtime=0)
+                with open(f'{path}.tmp', 'wb') as f:
+                    f.write(data)
+                os.replace(f'{path}.tmp', path)
+                report.written += 1
+                report.bytes_written += len(data)
+                size = len(data)
+            shards[dimension][value] = {'file': file, 'units': len(rows), 'bytes': size}
+
+        manifest = {
+            'version': SHARD_VERSION,
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'units': self.units,
+            'shards': shards,
+        }
+        os.makedirs(out_dir, exist_ok=True)
+        with open(f'{manifest_path}.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(f'{manifest_path}.tmp', manifest_path)
+
+        keep = previous_files | {entry['file'] for values in shards.values() for entry in values.values()}
+        for dimension in DIMENSIONS:
+            directory = os.path.join(out_dir, dimension)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if name.endswith('.json.gz') and f'{dimension}/{name}' not in keep:
+                    os.remove(os.path.join(directory, name))
+                    report.removed += 1
+        return report
+
+def _load_manifest(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def export_csv_shards(csv_file: str, out_dir: str, max_memory_mb: float = 256) -> ShardReport:
+    """Shards straight from the snapshot CSV; a sync only sees its changed rows, so every loader exports from here"""
+    exporter = ShardExporter()
+    for chunk in iter_csv_chunks(csv_file, max_memory_mb, usecols=lambda c: c in SOURCE_COLUMNS):
+        exporter.add_frame(to_supabase_safe_frame(chunk))
+    return exporter.write(out_dir)
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""Inventory statistics cube kept in step with the table by each sync
+
+Dashboards want unit counts, average/min/max/percentile prices and areas,
+overall and per developer, compound, area, property type and bedroom count.
+Instead of downloading every active row for that, the pipeline keeps one
+row per (dimension, value) cell in inventory_stats (migration 012).
+
+Counts and sums are exact. Min, max and percentiles come from a log-bucket
+sketch with 1% relative error which, unlike a running min or a sorted
+sample, can also forget a value. A sync therefore only applies its diff:
+rows it replaces or deactivates are subtracted, rows it writes are added,
+and only the cells that changed are upserted.
+"""
+
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
+
+import requests
+
+from brdata_processor.config import SUPABASE_KEY, SUPABASE_URL, rest_headers, rest_url
+from brdata_processor.serialization import dumps
+from brdata_processor.sync import DiffHook
+from brdata_processor.transform import object_name
+from brdata_processor.upsert import conflict_key, fetch_keyed_rows, fetch_rows
+
+logger = logging.getLogger(__name__)
+
+STATS_TABLE = 'inventory_stats'
+STATS_VERSION = 1
+
+# Dimension -> source column; the 'all' cell covers every active unit
+DIMENSIONS = {
+    'developer': 'developer',
+    'compound': 'compound',
+    'area': 'area',
+    'property_type': 'property_type',
+    'bedrooms': 'number_of_bedrooms',
+}
+NAMED_DIMENSIONS = {'developer', 'compound', 'area', 'property_type'}
+SOURCE_COLUMNS = ['price_in_egp', 'unit_area', *DIMENSIONS.values()]
+
+# Relative error of min, max and percentiles
+SKETCH_ACCURACY = 0.01
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+PRICE_PERCENTILES = {'p25': 0.25, 'p50': 0.5, 'p75': 0.75, 'p90': 0.9}
+PUBLISH_CHUNK = 500
+
+def _positive(value: Any) -> float | None:
+    """Prices and areas of 0 mean unknown in the transformed records"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 and math.isfinite(value) else None
+
+def _bedrooms(value: Any) -> str | None:
+    value = _positive(value)
+    return str(int(value)) if value is not None else None
+
+def cell_key(source_table: str, dimension: str, value: str) -> str:
+    return f'{source_table}|{dimension}|{value}'
+
+@dataclass
+class LogSketch:
+    """Value counts in logarithmic buckets, each within SKETCH_ACCURACY of its values"""
+    bins: Dict[int, int] = field(default_factory=dict)
+    count: int = 0
+    total: float = 0.0
+
+    def add(self, value: float, n: int = 1) -> None:
+        """Count a value n times; a negative n removes it"""
+        index = math.ceil(math.log(value) / _LOG_GAMMA)
+        remaining = self.bins.get(index, 0) + n
+        if remaining > 0:
+            self.bins[index] = remaining
+        else:
+            self.bins.pop(index, None)
+        self.count += n
+        self.total += n * value
+
+    def quantile(self, q: float) -> float | None:
+        """Approximate q-th quantile; 0 and 1 give the min and max"""
+        if self.count <= 0 or not self.bins:
+            return None
+        rank = q * (self.count - 1)
+        running = 0
+        for index in sorted(self.bins):
+            running += self.bins[index]
+            if running > rank:
+                break
+        return round(2 * _GAMMA ** index / (_GAMMA + 1), 2)
+
+    def to_dict(self) -> Dict[str, int]:
+        return {str(index): n for index, n in self.bins.items()}
+
+    @classmethod
+    def from_dict(cls, bins: Dict[str, int] | None, total: float) -> 'LogSketch':
+        sketch = cls({int(index): int(n) for index, n in (bins or {}).items()})
+        sketch.count = sum(sketch.bins.values())
+        sketch.total = float(total or 0)
+        return sketch
+
+@dataclass
+class CubeCell:
+    """Aggregates of the active units sharing one dimension value"""
+    dimension: str
+    value: str
+    units: int = 0
+    price: LogSketch = field(default_factory=LogSketch)
+    area: LogSketch = field(default_factory=LogSketch)
+
+    def to_row(self, source_table: str, updated_at: str) -> Dict[str, Any]:
+        row = {
+            'cell_key': cell_key(source_table, self.dimension, self.value),
+            'source_table': source_table,
+            'dimension': self.dimension,
+            'value': self.value,
+            'version': STATS_VERSION,
+            'unit_count': max(self.units, 0),
+            'price_count': self.price.count,
+            'price_sum': round(self.price.total, 2),
+            'price_min': self.price.quantile(0),
+            'price_max': self.price.quantile(1),
+        }
+        for name, q in PRICE_PERCENTILES.items():
+            row[f'price_{name}'] = self.price.quantile(q)
+        row.update({
+            'area_count': self.area.count,
+            'area_sum': round(self.area.total, 2),
+            'area_min': self.area.quantile(0),
+            'area_max': self.area.quantile(1),
+            'area_p50': self.area.quantile(0.5),
+            'sketch': {'price': self.price.to_dict(), 'area': self.area.to_dict()},
+            'updated_at': updated_at,
+        })
+        return row
+
+class StatsCube:
+    """The cells of one inventory table, with the ones changed since the last publish"""
+
+    def __init__(self, source_table: str):
+        self.source_table = source_table
+        self.cells: Dict[Tuple[str, str], CubeCell] = {}
+        self.touched: Set[Tuple[str, str]] = set()
+        # False when nothing usable was stored, so the diff has no base to apply to
+        self.complete = False
+
+    def _cell_ids(self, record: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+        yield 'all', 'all'
+        for dimension, column in DIMENSIONS.items():
+            raw = record.get(column)
+            value = object_name(raw) if dimension in NAMED_DIMENSIONS else _bedrooms(raw)
+            if value:
+                yield dimension, value
+
+    def apply(self, record: Dict[str, Any], sign: int = 1) -> None:
+        """Add (sign 1) or subtract (sign -1) one unit"""
+        price = _positive(record.get('price_in_egp'))
+        area = _positive(record.get('unit_area'))
+        for cell_id in self._cell_ids(record):
+            cell = self.cells.get(cell_id)
+            if cell is None:
+                cell = self.cells[cell_id] = CubeCell(*cell_id)
+            cell.units += sign
+            if price:
+                cell.price.add(price, sign)
+            if area:
+                cell.area.add(area, sign)
+            self.touched.add(cell_id)
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            if record.get('is_active') is not False:
+                self.apply(record, 1)
+
+    def remove(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            self.apply(record, -1)
+
+    def reset(self) -> None:
+        """Empty every cell before a full recount; stored cells that stay empty are published as zero"""
+        for cell_id in self.cells:
+            self.cells[cell_id] = CubeCell(*cell_id)
+        self.touched = set(self.cells)
+        self.complete = True
+
+    def track(self, batches: Iterable[List[Dict[str, Any]]]) -> Iterator[List[Dict[str, Any]]]:
+        """Pass a full snapshot through, counting it into the (reset) cube"""
+        for batch in batches:
+            self.add(batch)
+            yield batch
+
+    def diff_hook(
+        self,
+        table: str,
+        base_url: str = SUPABASE_URL,
+        api_key: str = SUPABASE_KEY,
+    ) -> DiffHook:
+        """sync_batches hook: subtract the rows being replaced or deactivated, add the rows being written"""
+        key = conflict_key(table)
+        session = requests.Session()
+
+        def on_diff(records: List[Dict[str, Any]], replaced: List[Any]) -> None:
+            # A failed read must not fail the sync; the cube is recounted after it instead
+            if not self.complete:
+                return
+            try:
+                if replaced:
+                    self.remove(fetch_keyed_rows(table, key, replaced, SOURCE_COLUMNS, base_url, api_key, session))
+            except requests.RequestException as e:
+                logger.warning(f"⚠️ Could not read replaced rows for the statistics cube: {e}")
+                self.complete = False
+                return
+            self.add(records)
+
+        return on_diff
+
+    def rebuild(self, table: str, base_url: str = SUPABASE_URL, api_key: str = SUPABASE_KEY) -> None:
+        """Recount from the table's active rows, for a first run or after a partly failed sync"""
+        self.reset()
+        key = conflict_key(table)
+        self.add(fetch_rows(table, key, SOURCE_COLUMNS, {'is_active': 'eq.true'}, base_url, api_key))
+
+    def cell(self, dimension: str, value: str = 'all') -> CubeCell | None:
+        return self.cells.get((dimension, value))
+
+    def top(self, dimension: str, limit: int = 10) -> List[CubeCell]:
+        cells = [c for (d, _), c in self.cells.items() if d == dimension and c.units > 0]
+        return sorted(cells, key=lambda c: (-c.units, c.value))[:limit]
+
+    @classmethod
+    def load(cls, source_table: str, base_url: str = SUPABASE_URL, api_key: str = SUPABASE_KEY) -> 'StatsCube':
+        """The cube as last published"""
+        cube = cls(source_table)
+        columns = ['dimension', 'value', 'version', 'unit_count', 'price_sum', 'area_sum', 'sketch']
+        rows = list(fetch_rows(STATS_TABLE, 'cell_key', columns, {'source_table': f'eq.{source_table}'},
+                               base_url, api_key))
+        for row in rows:
+            cell = CubeCell(row['dimension'], row['value'], int(row['unit_count'] or 0))
+            sketch = row.get('sketch') or {}
+            cell.price = LogSketch.from_dict(sketch.get('price'), row.get('price_sum'))
+            cell.area = LogSketch.from_dict(sketch.get('area'), row.get('area_sum'))
+            cube.cells[(cell.dimension, cell.value)] = cell
+        cube.complete = bool(rows) and all(row.get('version') == STATS_VERSION for row in rows)
+        return cube
+
+    def publish(self, base_url: str = SUPABASE_URL, api_key: str = SUPABASE_KEY) -> int:
+        """Upsert the cells changed since the last publish; returns how many were written"""
+        updated_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        rows = [self.cells[cell_id].to_row(self.source_table, updated_at) for cell_id in sorted(self.touched)]
+        session = requests.Session()
+        for i in range(0, len(rows), PUBLISH_CHUNK):
+            response = session.post(
+                rest_url(STATS_TABLE, base_url),
+                params={'on_conflict': conflict_key(STATS_TABLE)},
+                headers=rest_headers(api_key, 'resolution=merge-duplicates,return=minimal'),
+                data=dumps(rows[i:i + PUBLISH_CHUNK]),
+                timeout=60,
+            )
+            response.raise_for_status()
+        self.touched.clear()
+        logger.info(f"📊 Published {len(rows):,} statistics cells for {self.source_table}")
+        return len(rows)
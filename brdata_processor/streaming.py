@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Chunked CSV -> transform -> batch pipeline with a bounded memory footprint"""
+
+import resource
+import sys
+import pandas as pd
+from typing import Any, Callable, Dict, Iterator, List
+
+from brdata_processor.transform import to_supabase_safe_records
+
+# A chunk is alive as the raw frame, the converted frame and the records list
+# while it is being batched, plus one batch being serialised for upload
+COPIES_PER_CHUNK = 4
+PROBE_ROWS = 500
+MIN_CHUNK_ROWS = 100
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def rows_for_budget(bytes_per_row: float, max_memory_mb: float) -> int:
+    """How many CSV rows fit in one chunk under the memory ceiling"""
+    budget = max_memory_mb * 1024 * 1024
+    return max(MIN_CHUNK_ROWS, int(budget / (max(bytes_per_row, 1.0) * COPIES_PER_CHUNK)))
+
+def iter_csv_chunks(csv_file: str, max_memory_mb: float = 256, **read_csv_kwargs) -> Iterator[pd.DataFrame]:
+    """Yield DataFrame chunks from a CSV, sized from a small probe chunk
+
+    The probe is yielded first so uploading can start before the rest of the
+    file has been read.
+    """
+    reader = pd.read_csv(csv_file, iterator=True, low_memory=False, **read_csv_kwargs)
+    try:
+        try:
+            probe = reader.get_chunk(PROBE_ROWS)
+        except StopIteration:
+            return
+
+        bytes_per_row = probe.memory_usage(deep=True).sum() / max(len(probe), 1)
+        chunk_rows = rows_for_budget(bytes_per_row, max_memory_mb)
+        yield probe
+
+        while True:
+            try:
+                yield reader.get_chunk(chunk_rows)
+            except StopIteration:
+                return
+    finally:
+        reader.close()
+
+def iter_record_batches(
+    chunks: Iterator[pd.DataFrame],
+    batch_size: int,
+    transform: Callable[[pd.DataFrame], List[Dict[str, Any]]] = to_supabase_safe_records,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Transform chunks lazily and re-cut them into fixed-size upload batches"""
+    pending: List[Dict[str, Any]] = []
+
+    for chunk in chunks:
+        pending.extend(transform(chunk))
+        start = 0
+        while len(pending) - start >= batch_size:
+            yield pending[start:start + batch_size]
+            start += batch_size
+        pending = pending[start:]
+
+    if pending:
+        yield pending
+
+def stream_csv_batches(
+    csv_file: str,
+    batch_size: int = 1000,
+    max_memory_mb: float = 256,
+    transform: Callable[[pd.DataFrame], List[Dict[str, Any]]] = to_supabase_safe_records,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Read, transform and batch a CSV without ever materialising the whole file"""
+    return iter_record_batches(iter_csv_chunks(csv_file, max_memory_mb), batch_size, transform)
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""Full reload into a shadow table that is swapped in atomically
+
+The live table is never emptied: the snapshot is COPYed into an index-less
+shadow copy, the live table's constraints and indexes are then built on it in
+bulk, verification checks run, and a short transaction renames the shadow into
+place. Grants, row level security policies, triggers, owned sequences and
+dependent views (with their options such as security_invoker, and their
+grants) are carried over, so readers only ever see the old or the new
+inventory. Units missing from the snapshot are kept as inactive rows.
+Materialized views and foreign keys from other tables are bound to the live
+table's oid and cannot be carried over, so the swap refuses to run while
+any exist.
+"""
+
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+import psycopg
+from psycopg import sql
+
+from brdata_processor.config import DATABASE_URL
+from brdata_processor.copy_loader import copy_frames, copy_ready_frame, table_columns
+from brdata_processor.streaming import iter_csv_chunks
+from brdata_processor.upsert import conflict_key
+
+logger = logging.getLogger(__name__)
+
+# A snapshot much smaller than the live inventory is more likely a truncated export than a real change
+MIN_ACTIVE_RATIO = 0.9
+# Readers hold ACCESS SHARE locks; wait this long for them instead of queueing everyone behind the swap
+SWAP_LOCK_TIMEOUT = '5s'
+
+class SwapAborted(Exception):
+    """The shadow table failed verification; the live table was left untouched"""
+
+@dataclass
+class SwapReport:
+    """What the shadow load did, and how long each phase took"""
+    rows_loaded: int = 0
+    rows_carried_inactive: int = 0
+    indexes_built: int = 0
+    load_seconds: float = 0.0
+    index_seconds: float = 0.0
+    swap_seconds: float = 0.0
+    checks: Dict[str, bool] = field(default_factory=dict)
+
+def _shadow_name(name: str, suffix: str) -> str:
+    """Name for a shadow/old copy of an object, kept under Postgres' 63 byte limit"""
+    return f"{name[:63 - len(suffix)]}{suffix}"
+
+def _retarget(definition: str, table: str, target: str) -> str:
+    """Point a pg_get_*def statement for the live table at another table"""
+    return re.sub(rf'\bON (public\.)?"?{re.escape(table)}"?(?=\s)', f'ON public.{target}', definition, count=1)
+
+def _index_definitions(cur: psycopg.Cursor, table: str) -> List[Tuple[str, str]]:
+    """(name, CREATE INDEX statement) of the indexes not backing a constraint"""
+    cur.execute(
+        "SELECT i.relname, pg_get_indexdef(x.indexrelid) FROM pg_index x "
+        "JOIN pg_class i ON i.oid = x.indexrelid "
+        "WHERE x.indrelid = %s::regclass "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid) "
+        "ORDER BY i.relname",
+        (f'public.{table}',),
+    )
+    return cur.fetchall()
+
+def _constraint_definitions(cur: psycopg.Cursor, table: str) -> List[Tuple[str, str]]:
+    """(name, definition) of the key, unique, exclusion and foreign key constraints"""
+    cur.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'x', 'f') "
+        "ORDER BY contype = 'f', conname",
+        (f'public.{table}',),
+    )
+    return cur.fetchall()
+
+def _copy_access_rules(cur: psycopg.Cursor, table: str, shadow: str) -> None:
+    """Grants, RLS policies and triggers of the live table, recreated on the shadow"""
+    cur.execute(
+        "SELECT grantee, privilege_type FROM information_schema.role_table_grants "
+        "WHERE table_schema = 'public' AND table_name = %s AND grantee <> current_user",
+        (table,),
+    )
+    for grantee, privilege in cur.fetchall():
+        cur.execute(sql.SQL("GRANT {} ON {} TO {}").format(
+            sql.SQL(privilege), sql.Identifier(shadow),
+            sql.SQL('PUBLIC') if grantee == 'PUBLIC' else sql.Identifier(grantee)))
+
+    cur.execute("SELECT relrowsecurity, relforcerowsecurity FROM pg_class WHERE oid = %s::regclass",
+                (f'public.{table}',))
+    enabled, forced = cur.fetchone()
+    if enabled:
+        cur.execute(sql.SQL("ALTER TABLE {} ENABLE ROW LEVEL SECURITY").format(sql.Identifier(shadow)))
+    if forced:
+        cur.execute(sql.SQL("ALTER TABLE {} FORCE ROW LEVEL SECURITY").format(sql.Identifier(shadow)))
+
+    cur.execute(
+        "SELECT policyname, permissive, roles, cmd, qual, with_check FROM pg_policies "
+        "WHERE schemaname = 'public' AND tablename = %s",
+        (table,),
+    )
+    for name, permissive, roles, cmd, qual, with_check in cur.fetchall():
+        statement = sql.SQL("CREATE POLICY {} ON {} AS {} FOR {} TO {}").format(
+            sql.Identifier(name), sql.Identifier(shadow), sql.SQL(permissive), sql.SQL(cmd),
+            sql.SQL(', ').join(sql.SQL(r) if r == 'public' else sql.Identifier(r) for r in roles),
+        )
+        if qual:
+            statement += sql.SQL(" USING ({})").format(sql.SQL(qual))
+        if with_check:
+            statement += sql.SQL(" WITH CHECK ({})").format(sql.SQL(with_check))
+        cur.execute(statement)
+
+    cur.execute(
+        "SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal",
+        (f'public.{table}',),
+    )
+    for (definition,) in cur.fetchall():
+        cur.execute(_retarget(definition, table, shadow))
+
+def _dependent_views(cur: psycopg.Cursor, table: str) -> List[Tuple[str, str, List[str], List[Tuple[str, str]]]]:
+    """(view, definition, reloptions, [(grantee, privilege)]) of views that select from the table"""
+    cur.execute(
+        "SELECT DISTINCT v.oid::regclass::text, pg_get_viewdef(v.oid), v.reloptions, n.nspname, v.relname "
+        "FROM pg_depend d "
+        "JOIN pg_rewrite r ON r.oid = d.objid "
+        "JOIN pg_class v ON v.oid = r.ev_class "
+        "JOIN pg_namespace n ON n.oid = v.relnamespace "
+        "WHERE d.refobjid = %s::regclass AND v.oid <> d.refobjid AND v.relkind = 'v'",
+        (f'public.{table}',),
+    )
+    views = []
+    for view, definition, options, schema, name in cur.fetchall():
+        cur.execute(
+            "SELECT grantee, privilege_type FROM information_schema.role_table_grants "
+            "WHERE table_schema = %s AND table_name = %s AND grantee <> current_user",
+            (schema, name),
+        )
+        views.append((view, definition, options or [], cur.fetchall()))
+    return views
+
+def _blocking_dependents(cur: psycopg.Cursor, table: str) -> List[str]:
+    """Materialized views and other tables' foreign keys that would follow the old table's oid"""
+    cur.execute(
+        "SELECT DISTINCT 'materialized view ' || v.oid::regclass::text FROM pg_depend d "
+        "JOIN pg_rewrite r ON r.oid = d.objid "
+        "JOIN pg_class v ON v.oid = r.ev_class "
+        "WHERE d.refobjid = %s::regclass AND v.relkind = 'm' "
+        "UNION ALL "
+        "SELECT 'foreign key ' || conname || ' on ' || conrelid::regclass::text FROM pg_constraint "
+        "WHERE confrelid = %s::regclass AND conrelid <> confrelid AND contype = 'f'",
+        (f'public.{table}', f'public.{table}'),
+    )
+    return sorted(row[0] for row in cur.fetchall())
+
+def _owned_sequences(cur: psycopg.Cursor, table: str) -> List[Tuple[str, str]]:
+    """(sequence, column) pairs owned by the table, e.g. a BIGSERIAL id"""
+    cur.execute(
+        "SELECT s.oid::regclass::text, a.attname FROM pg_depend d "
+        "JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S' "
+        "JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid "
+        "WHERE d.refobjid = %s::regclass AND d.deptype = 'a'",
+        (f'public.{table}',),
+    )
+    return cur.fetchall()
+
+def verify_shadow(cur: psycopg.Cursor, table: str, shadow: str, key: str, rows_loaded: int,
+                  min_active_ratio: float = MIN_ACTIVE_RATIO) -> Dict[str, bool]:
+    """Sanity checks run on the shadow before it may replace the live table"""
+    cur.execute(sql.SQL("SELECT count(*) FILTER (WHERE {key} IS NULL) FROM {shadow}").format(
+        key=sql.Identifier(key), shadow=sql.Identifier(shadow)))
+    null_keys = cur.fetchone()[0]
+
+    active = sql.SQL("WHERE is_active") if 'is_active' in table_columns(cur, table) else sql.SQL("")
+    cur.execute(sql.SQL("SELECT count(*) FROM {} {}").format(sql.Identifier(table), active))
+    live_active = cur.fetchone()[0]
+
+    return {
+        'snapshot_not_empty': rows_loaded > 0,
+        'no_null_keys': null_keys == 0,
+        'snapshot_size_plausible': rows_loaded >= live_active * min_active_ratio,
+    }
+
+def swap_load_csv(
+    csv_file: str,
+    table: str = 'brdata_properties',
+    database_url: str | None = DATABASE_URL,
+    max_memory_mb: float = 256,
+    min_active_ratio: float = MIN_ACTIVE_RATIO,
+    keep_old: bool = False,
+    extra_checks: Callable[[psycopg.Cursor, str], Dict[str, bool]] | None = None,
+) -> SwapReport:
+    """Load the CSV into a shadow of the table, verify it and swap it in atomically"""
+    if not database_url:
+        raise ValueError("The shadow-table loader needs a direct Postgres connection; set DATABASE_URL")
+
+    key = conflict_key(table)
+    shadow = _shadow_name(table, '_shadow')
+    old = _shadow_name(table, '_old')
+    report = SwapReport()
+
+    with psycopg.connect(database_url) as conn, conn.cursor() as cur:
+        target_columns = table_columns(cur, table)
+        if not target_columns:
+            raise ValueError(f"Table '{table}' does not exist")
+        blocking = _blocking_dependents(cur, table)
+        if blocking:
+            raise SwapAborted(f"{table} cannot be swapped while these depend on it: {', '.join(blocking)}")
+
+        # Build phase: readers keep using the live table the whole time
+        cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(shadow)))
+        cur.execute(sql.SQL(
+            "CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED "
+            "INCLUDING IDENTITY INCLUDING STORAGE INCLUDING COMMENTS)"
+        ).format(sql.Identifier(shadow), sql.Identifier(table)))
+
+        started = time.monotonic()
+        frames = (copy_ready_frame(chunk) for chunk in iter_csv_chunks(csv_file, max_memory_mb))
+        _, report.rows_loaded = copy_frames(cur, shadow, frames, target_columns)
+
+        # Last occurrence of a unit wins, as with the upsert path
+        cur.execute(sql.SQL(
+            "DELETE FROM {shadow} a USING {shadow} b WHERE a.{key} = b.{key} AND a.ctid < b.ctid"
+        ).format(shadow=sql.Identifier(shadow), key=sql.Identifier(key)))
+        report.rows_loaded -= cur.rowcount
+
+        # Units gone from the snapshot stay, hidden, exactly as the soft-deactivating loaders leave them
+        if 'is_active' in target_columns:
+            select = sql.SQL(', ').join(
+                sql.SQL('false') if c == 'is_active' else sql.SQL("t.{}").format(sql.Identifier(c))
+                for c in target_columns
+            )
+            cur.execute(sql.SQL(
+                "INSERT INTO {shadow} ({columns}) SELECT {select} FROM {table} t "
+                "WHERE NOT EXISTS (SELECT 1 FROM {shadow} s WHERE s.{key} = t.{key})"
+            ).format(shadow=sql.Identifier(shadow), columns=sql.SQL(', ').join(map(sql.Identifier, target_columns)),
+                     select=select, table=sql.Identifier(table), key=sql.Identifier(key)))
+            report.rows_carried_inactive = cur.rowcount
+        if 'created_at' in target_columns:
+            cur.execute(sql.SQL(
+                "UPDATE {shadow} s SET created_at = t.created_at FROM {table} t "
+                "WHERE s.{key} = t.{key} AND s.created_at IS DISTINCT FROM t.created_at"
+            ).format(shadow=sql.Identifier(shadow), table=sql.Identifier(table), key=sql.Identifier(key)))
+        report.load_seconds = time.monotonic() - started
+        logger.info(f"📥 Loaded {report.rows_loaded:,} rows into {shadow} in {report.load_seconds:.1f}s")
+
+        # Indexes are built once over the full table rather than maintained row by row
+        started = time.monotonic()
+        for name, definition in _constraint_definitions(cur, table):
+            cur.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {}").format(
+                sql.Identifier(shadow), sql.Identifier(_shadow_name(name, '_shadow')), sql.SQL(definition)))
+            report.indexes_built += 1
+        indexes = _index_definitions(cur, table)
+        for name, definition in indexes:
+            definition = _retarget(definition, table, shadow)
+            definition = definition.replace(f'INDEX {name} ', f'INDEX {_shadow_name(name, "_shadow")} ', 1)
+            cur.execute(definition)
+            report.indexes_built += 1
+        cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(shadow)))
+        report.index_seconds = time.monotonic() - started
+        logger.info(f"🧱 Built {report.indexes_built} indexes/constraints in {report.index_seconds:.1f}s")
+
+        report.checks = verify_shadow(cur, table, shadow, key, report.rows_loaded, min_active_ratio)
+        if extra_checks:
+            report.checks.update(extra_checks(cur, shadow))
+        failed = [name for name, ok in report.checks.items() if not ok]
+        if failed:
+            conn.rollback()
+            raise SwapAborted(f"Shadow table failed verification: {', '.join(failed)}")
+
+        _copy_access_rules(cur, table, shadow)
+        cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(old)))
+        conn.commit()
+
+        # Swap phase: a few catalog updates under one short exclusive lock
+        started = time.monotonic()
+        cur.execute(sql.SQL("SET LOCAL lock_timeout = {}").format(sql.Literal(SWAP_LOCK_TIMEOUT)))
+        cur.execute(sql.SQL("LOCK TABLE {} IN ACCESS EXCLUSIVE MODE").format(sql.Identifier(table)))
+        blocking = _blocking_dependents(cur, table)
+        if blocking:
+            conn.rollback()
+            raise SwapAborted(f"{table} cannot be swapped while these depend on it: {', '.join(blocking)}")
+        views = _dependent_views(cur, table)
+        sequences = _owned_sequences(cur, table)
+
+        cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(table), sql.Identifier(old)))
+        for name, _ in _constraint_definitions(cur, old):
+            cur.execute(sql.SQL("ALTER TABLE {} RENAME CONSTRAINT {} TO {}").format(
+                sql.Identifier(old), sql.Identifier(name), sql.Identifier(_shadow_name(name, '_old'))))
+        for name, _ in indexes:
+            cur.execute(sql.SQL("ALTER INDEX {} RENAME TO {}").format(
+                sql.Identifier(name), sql.Identifier(_shadow_name(name, '_old'))))
+
+        cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(shadow), sql.Identifier(table)))
+        for name, _ in _constraint_definitions(cur, table):
+            if name.endswith('_shadow'):
+                cur.execute(sql.SQL("ALTER TABLE {} RENAME CONSTRAINT {} TO {}").format(
+                    sql.Identifier(table), sql.Identifier(name), sql.Identifier(name[:-len('_shadow')])))
+        for name, _ in indexes:
+            cur.execute(sql.SQL("ALTER INDEX {} RENAME TO {}").format(
+                sql.Identifier(_shadow_name(name, '_shadow')), sql.Identifier(name)))
+
+        for sequence, column in sequences:
+            cur.execute(sql.SQL("ALTER SEQUENCE {} OWNED BY {}.{}").format(
+                sql.SQL(sequence), sql.Identifier(table), sql.Identifier(column)))
+        # Views are bound to the old table's oid; re-planning them by name picks up the new table.
+        # CREATE OR REPLACE resets their options, so those and the grants are put back
+        for view, definition, options, grants in views:
+            cur.execute(sql.SQL("CREATE OR REPLACE VIEW {} AS {}").format(sql.SQL(view), sql.SQL(definition)))
+            if options:
+                cur.execute(sql.SQL("ALTER VIEW {} SET ({})").format(sql.SQL(view), sql.SQL(', '.join(options))))
+            for grantee, privilege in grants:
+                cur.execute(sql.SQL("GRANT {} ON {} TO {}").format(
+                    sql.SQL(privilege), sql.SQL(view),
+                    sql.SQL('PUBLIC') if grantee == 'PUBLIC' else sql.Identifier(grantee)))
+        # PostgREST caches table oids; ask it to reload
+        cur.execute("NOTIFY pgrst, 'reload schema'")
+        conn.commit()
+        report.swap_seconds = time.monotonic() - started
+        logger.info(f"🔁 Swapped {shadow} into {table} in {report.swap_seconds * 1000:.0f}ms")
+
+        if not keep_old:
+            cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(old)))
+            conn.commit()
+
+    return report
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Hash-based diff sync: only upload units whose content changed since the last load
+
+Every normalised record gets a row_hash fingerprint. The current fingerprints
+are read back from the database through a narrow key,row_hash projection, and
+only inserted, changed or re-appearing units are upserted. Active units
+missing from the snapshot are soft-deactivated.
+"""
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Set, Tuple
+
+import requests
+
+from brdata_processor.config import SUPABASE_KEY, SUPABASE_URL
+from brdata_processor.upsert import conflict_key, deactivate_keys, fetch_rows, upsert_uploader
+from brdata_processor.uploader import UploadReport
+
+logger = logging.getLogger(__name__)
+
+# Columns owned by the database or the sync itself, never part of the content fingerprint
+CONTROL_COLUMNS = {'is_active', 'row_hash', 'created_at', 'updated_at'}
+
+# Called with the records about to be written and the keys of the active rows they replace,
+# then once more with no records and the keys about to be deactivated
+DiffHook = Callable[[List[Dict[str, Any]], List[Any]], None]
+
+@dataclass
+class SyncReport:
+    """Row counts per change class, plus the upload of the rows that changed"""
+    inserted: int = 0
+    changed: int = 0
+    reactivated: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    upload: UploadReport | None = None
+
+    @property
+    def sent(self) -> int:
+        return self.inserted + self.changed + self.reactivated
+
+def row_hash(record: Dict[str, Any]) -> str:
+    """Stable content fingerprint of a normalised record"""
+    content = {k: v for k, v in record.items() if k not in CONTROL_COLUMNS}
+    canonical = json.dumps(content, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+def fetch_fingerprints(
+    table: str,
+    base_url: str = SUPABASE_URL,
+    api_key: str = SUPABASE_KEY,
+    session: requests.Session | None = None,
+) -> Dict[Any, Tuple[str | None, bool]]:
+    """key -> (row_hash, is_active) for every row currently in the table"""
+    key = conflict_key(table)
+    rows = fetch_rows(table, key, ['row_hash', 'is_active'], None, base_url, api_key, session)
+    return {row[key]: (row.get('row_hash'), bool(row.get('is_active'))) for row in rows}
+
+def changed_batches(
+    batches: Iterable[List[Dict[str, Any]]],
+    key: str,
+    remote: Dict[Any, Tuple[str | None, bool]],
+    report: SyncReport,
+    seen: Set[Any],
+    batch_size: int,
+    on_diff: DiffHook | None = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Fingerprint the snapshot and re-batch only the rows the database does not already hold"""
+    pending: List[Dict[str, Any]] = []
+    replaced: List[Any] = []
+
+    for batch in batches:
+        for record in batch:
+            unit = record.get(key)
+            if unit is None:
+                continue
+            seen.add(unit)
+            record['row_hash'] = row_hash(record)
+            record['is_active'] = True
+
+            current = remote.get(unit)
+            if current is None:
+                report.inserted += 1
+            elif current[0] != record['row_hash']:
+                report.changed += 1
+                if current[1]:
+                    replaced.append(unit)
+            elif not current[1]:
+                report.reactivated += 1
+            else:
+                report.unchanged += 1
+                continue
+
+            pending.append(record)
+            if len(pending) >= batch_size:
+                # The hook runs before the batch is handed to the uploader, so it still sees the old rows
+                if on_diff:
+                    on_diff(pending, replaced)
+                yield pending
+                pending, replaced = [], []
+
+    if pending:
+        if on_diff:
+            on_diff(pending, replaced)
+        yield pending
+
+def sync_batches(
+    table: str,
+    batches: Iterable[List[Dict[str, Any]]],
+    batch_size: int = 1000,
+    base_url: str = SUPABASE_URL,
+    api_key: str = SUPABASE_KEY,
+    on_result=None,
+    on_diff: DiffHook | None = None,
+    **uploader_kwargs,
+) -> SyncReport:
+    """Diff a snapshot against the table and apply only the differences
+
+    on_diff sees every change before it is written, for state kept in step
+    with the table (such as the statistics cube) without re-reading it.
+    """
+    key = conflict_key(table)
+    session = requests.Session()
+    report = SyncReport()
+    seen: Set[Any] = set()
+
+    remote = fetch_fingerprints(table, base_url, api_key, session)
+    logger.info(f"🔎 {len(remote):,} fingerprints in {table}")
+
+    uploader = upsert_uploader(table, base_url=base_url, api_key=api_key, **uploader_kwargs)
+    report.upload = uploader.upload(
+        changed_batches(batches, key, remote, report, seen, batch_size, on_diff), on_result=on_result
+    )
+
+    if report.upload.failed_batches:
+        logger.warning("⚠️ Some batches failed; leaving removed units active until the next clean sync")
+        return report
+
+    removed = [unit for unit, (_, active) in remote.items() if active and unit not in seen]
+    if removed:
+        if on_diff:
+            on_diff([], removed)
+        deactivate_keys(table, key, removed, base_url, api_key, session)
+    report.removed = len(removed)
+    return report
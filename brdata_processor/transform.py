@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Vectorised row transforms shared by the BRData import scripts"""
+
+import ast
+import json
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List
+
+from brdata_processor.commissions import unit_commissions
+from brdata_processor.search_index import search_text
+
+INT_COLUMNS = ['id', 'number_of_bedrooms', 'number_of_bathrooms']
+FLOAT_COLUMNS = ['unit_area', 'garden_area', 'roof_area', 'floor_number', 'price_per_meter', 'price_in_egp']
+BOOL_COLUMNS = ['is_launch']
+JSON_COLUMNS = ['compound', 'area', 'developer', 'phase', 'property_type', 'payment_plans', 'offers']
+# Sources of the search_tokens column (search_index.py): {'id', 'name'} objects, then unit codes
+SEARCH_NAME_COLUMNS = ['compound', 'area', 'developer', 'property_type']
+SEARCH_CODE_COLUMNS = ['unit_id', 'unit_number']
+# Listing order is priority, then latest inventory update, then key, all descending. sort_key
+# spells that as fixed-width text, so one index on sort_key serves every cursor page (migration 015)
+SORT_PRIORITY_OFFSET = 10 ** 9
+
+def _as_text(series: pd.Series) -> pd.Series:
+    """Cast a column to Python strings, keeping missing values as None"""
+    values = series.astype(object)
+    present = values.notna()
+    values[present] = values[present].map(str)
+    return values.where(present, None)
+
+def to_supabase_safe_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert a CSV chunk to the brdata_properties column types in one pass per column
+
+    Same rules as the old row-by-row convert_to_supabase_safe: missing or infinite
+    numbers become 0, missing booleans become False and JSON/text columns stay strings.
+    """
+    safe = pd.DataFrame(index=df.index)
+
+    for col in df.columns:
+        if col in INT_COLUMNS:
+            safe[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int64')
+        elif col in FLOAT_COLUMNS:
+            values = pd.to_numeric(df[col], errors='coerce').astype('float64')
+            safe[col] = values.replace([np.inf, -np.inf], 0.0).fillna(0.0)
+        elif col in BOOL_COLUMNS:
+            safe[col] = df[col].fillna(False).astype(bool)
+        else:
+            safe[col] = _as_text(df[col])
+
+    if any(col in df.columns for col in SEARCH_NAME_COLUMNS):
+        safe['search_tokens'] = search_tokens(df)
+    if 'id' in df.columns:
+        safe['sort_key'] = sort_keys(df, 'id')
+    if 'compound' in df.columns and 'price_in_egp' in df.columns:
+        developers = df['developer'].map(object_name) if 'developer' in df.columns else pd.Series(None, index=df.index)
+        safe['commission_percent'], safe['commission_egp'] = unit_commissions(
+            df['compound'].map(object_name), developers, safe['price_in_egp'])
+    return safe
+
+def search_tokens(df: pd.DataFrame) -> pd.Series:
+    """Normalised bilingual search terms of each row's names and unit codes"""
+    names = [df[col].map(object_name) for col in SEARCH_NAME_COLUMNS if col in df.columns]
+    codes = [df[col] for col in SEARCH_CODE_COLUMNS if col in df.columns]
+    values = [
+        search_text(row[:len(names)], row[len(names):])
+        for row in zip(*names, *codes)
+    ]
+    return pd.Series(values, index=df.index, dtype=object)
+
+@lru_cache(maxsize=4096)
+def _sort_stamp(text: str) -> str:
+    try:
+        stamp = datetime.fromisoformat(text)
+    except ValueError:
+        return '0' * 14
+    if stamp.tzinfo is not None:
+        stamp = stamp.astimezone(timezone.utc)
+    return stamp.strftime('%Y%m%d%H%M%S')
+
+def sort_key(priority: Any, updated: Any, key: Any) -> str | None:
+    """Unique listing-order key of one unit; None without a usable key"""
+    try:
+        key = int(key)
+    except (TypeError, ValueError):
+        return None
+    try:
+        priority = int(priority or 0)
+    except (TypeError, ValueError):
+        priority = 0
+    stamp = _sort_stamp(updated) if isinstance(updated, str) and updated else '0' * 14
+    return f'{priority + SORT_PRIORITY_OFFSET:010d}.{stamp}.{key:012d}'
+
+def sort_keys(df: pd.DataFrame, key_column: str) -> pd.Series:
+    """sort_key of every row; snapshots repeat a few update times, so each is parsed once"""
+    priority = df['priority_score'] if 'priority_score' in df.columns else pd.Series(0, index=df.index)
+    updated = df['last_inventory_update'] if 'last_inventory_update' in df.columns else pd.Series(None, index=df.index)
+    values = [sort_key(*row) for row in zip(priority, updated, pd.to_numeric(df[key_column], errors='coerce'))]
+    return pd.Series(values, index=df.index, dtype=object)
+
+def to_supabase_safe_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Convert a CSV chunk straight to JSON-ready insert records"""
+    # to_dict boxes numpy scalars back to int/float/bool, so the records serialise as-is
+    return to_supabase_safe_frame(df).to_dict('records')
+
+# Single/double quoted strings and the bare Python constants inside a repr'd dict
+_PY_LITERAL_TOKEN = re.compile(r"'((?:[^'\\]|\\.)*)'|\"(?:[^\"\\]|\\.)*\"|\b(None|True|False)\b")
+_PY_CONSTANTS = {'None': 'null', 'True': 'true', 'False': 'false'}
+
+def _python_literal_to_json(text: str) -> str:
+    """Rewrite a Python dict/list repr as JSON text without touching string contents"""
+    def replace(match):
+        if match.group(1) is not None:
+            inner = match.group(1).replace("\\'", "'").replace('"', '\\"')
+            return f'"{inner}"'
+        if match.group(2) is not None:
+            return _PY_CONSTANTS[match.group(2)]
+        return match.group(0)
+
+    return _PY_LITERAL_TOKEN.sub(replace, text)
+
+def parse_json_field(field_value) -> Any:
+    """Parse a JSON column value that may be JSON or a Python repr from the scraper
+
+    Returns None for empty or unparseable values.
+    """
+    if field_value is None or (isinstance(field_value, float) and np.isnan(field_value)):
+        return None
+    if not isinstance(field_value, str):
+        return field_value
+    if field_value in ('', 'nan'):
+        return None
+
+    if "'" not in field_value:
+        try:
+            return json.loads(field_value)
+        except ValueError:
+            pass
+    try:
+        # The scraper wrote str(dict), so quotes and None/True/False are Python style
+        return json.loads(_python_literal_to_json(field_value))
+    except ValueError:
+        pass
+    try:
+        # Escapes that JSON cannot express, such as \x.., still parse here
+        return ast.literal_eval(field_value)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+
+def canonical_json(field_value) -> str | None:
+    """Compact JSON text of a JSON column value, or None when it is empty or unparseable"""
+    parsed = parse_json_field(field_value)
+    return json.dumps(parsed, separators=(',', ':'), ensure_ascii=False) if parsed is not None else None
+
+@lru_cache(maxsize=8192)
+def _name_from_text(text: str) -> str | None:
+    parsed = parse_json_field(text)
+    return parsed.get('name') if isinstance(parsed, dict) else None
+
+def object_name(field_value) -> str | None:
+    """The name inside a {'id', 'name'} column value, whether already parsed or still text
+
+    The same few hundred compound/developer strings repeat across a snapshot,
+    so each distinct string is parsed once.
+    """
+    if isinstance(field_value, dict):
+        return field_value.get('name')
+    if not isinstance(field_value, str):
+        return None
+    return _name_from_text(field_value)
@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""Concurrent PostgREST uploader with a bounded number of batches in flight"""
+
+import gzip
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from brdata_processor.config import SUPABASE_KEY, SUPABASE_URL, rest_headers, rest_url
+from brdata_processor.serialization import encode_rows
+
+logger = logging.getLogger(__name__)
+
+# Worth retrying: timeouts, throttling and gateway/server hiccups
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# Signs that a request carried more than the server handles in time
+OVERSIZE_STATUS = {408, 413, 504}
+# The server may have committed the rows before the gateway gave up on it
+AMBIGUOUS_STATUS = {504}
+# Data errors raised by individual rows (bad input, constraint violations); worth bisecting
+ROW_ERROR_STATUS = {400, 409, 422}
+# How a server that cannot read gzip bodies answers one (PostgREST itself fails to parse it as JSON)
+GZIP_REJECTED_STATUS = {400, 415}
+# Fast levels get most of the ratio on the repeated compound/developer objects
+GZIP_LEVEL = 5
+
+# Rows handed to the uploader per batch (the resume checkpoint); the sizer splits
+# each batch into requests that fit its current byte budget
+DEFAULT_BATCH_ROWS = 1000
+
+@dataclass
+class BatchResult:
+    """Outcome of one batch after all of its attempts"""
+    index: int
+    rows: int
+    ok: bool
+    attempts: int = 0
+    status_code: int | None = None
+    error: str | None = None
+    elapsed: float = 0.0
+    requests: int = 0
+    bytes_sent: int = 0  # on the wire, after compression
+    raw_bytes: int = 0
+    retries: int = 0
+    latencies: List[float] = field(default_factory=list)  # seconds per HTTP request
+    # Rows the server rejected on their own, isolated by bisection: {'row', 'status_code', 'error'}
+    dead_letters: List[Dict[str, Any]] = field(default_factory=list)
+    # PostgREST code and message of the last error, without the details that name the row's values
+    reason: str | None = None
+
+@dataclass
+class UploadReport:
+    """Totals for one upload run, with per-batch results in batch order"""
+    results: List[BatchResult] = field(default_factory=list)
+    elapsed: float = 0.0
+    request_bytes: int | None = None
+
+    @property
+    def rows_uploaded(self) -> int:
+        return sum(r.rows - len(r.dead_letters) for r in self.results if r.ok)
+
+    @property
+    def rows_rejected(self) -> int:
+        return sum(len(r.dead_letters) for r in self.results)
+
+    @property
+    def rows_failed(self) -> int:
+        return sum(r.rows for r in self.results if not r.ok)
+
+    @property
+    def failed_batches(self) -> List[int]:
+        return [r.index for r in self.results if not r.ok]
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_uploaded / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def requests(self) -> int:
+        return sum(r.requests for r in self.results)
+
+    @property
+    def bytes_sent(self) -> int:
+        return sum(r.bytes_sent for r in self.results)
+
+    @property
+    def raw_bytes(self) -> int:
+        return sum(r.raw_bytes for r in self.results)
+
+    @property
+    def retries(self) -> int:
+        return sum(r.retries for r in self.results)
+
+    def sizing_summary(self) -> str:
+        """Converged request size, throughput and bytes on the wire, for the end-of-run printout"""
+        requests_sent = self.requests or 1
+        budget = f"{self.request_bytes / 1024:,.0f} KiB" if self.request_bytes else "unbounded"
+        wire = f"{self.bytes_sent / 1024 ** 2:,.1f} MiB on the wire"
+        if self.bytes_sent < self.raw_bytes:
+            wire += f" (gzip from {self.raw_bytes / 1024 ** 2:,.1f} MiB)"
+        return (f"request budget {budget}, {self.rows_uploaded / requests_sent:,.0f} rows and "
+                f"{self.raw_bytes / requests_sent / 1024:,.0f} KiB per request over {self.requests:,} requests, "
+                f"{self.rows_per_second:,.0f} rows/s, {wire}")
+
+def _error_reason(response: requests.Response) -> str:
+    """What went wrong, comparable between requests that carried different rows"""
+    try:
+        body = response.json()
+    except ValueError:
+        return response.text[:200]
+    if isinstance(body, dict) and (body.get('code') or body.get('message')):
+        return f"{body.get('code')}: {body.get('message')}"
+    return response.text[:200]
+
+class RateLimiter:
+    """Token bucket shared by every upload thread"""
+
+    def __init__(self, requests_per_second: float | None, burst: int = 1):
+        self.rate = requests_per_second
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request may be sent"""
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_for = (1 - self.tokens) / self.rate
+            time.sleep(wait_for)
+
+class AdaptiveBatchSizer:
+    """AIMD controller for the request payload size
+
+    The byte budget grows by a fixed step after each full request that returns
+    within the target latency, and is halved after a slow response, a timeout
+    or a 413, so it settles just under what the server handles comfortably
+    whether rows carry large payment plans or almost nothing.
+    """
+
+    def __init__(
+        self,
+        initial_bytes: int = 256 * 1024,
+        min_bytes: int = 16 * 1024,
+        max_bytes: int = 8 * 1024 * 1024,
+        step_bytes: int = 64 * 1024,
+        target_latency: float = 2.0,
+    ):
+        self.min_bytes = min_bytes
+        self.max_bytes = max_bytes
+        self.step_bytes = step_bytes
+        self.target_latency = target_latency
+        self.budget = min(max(initial_bytes, min_bytes), max_bytes)
+        self.lock = threading.Lock()
+
+    def split(self, encoded: List[bytes], max_rows: int | None = None) -> List[List[bytes]]:
+        """Group encoded rows into requests that fit the current budget (always at least one row each)"""
+        budget = self.budget
+        chunks, chunk, size = [], [], 2
+        for item in encoded:
+            if chunk and (size + len(item) + 1 > budget or (max_rows and len(chunk) >= max_rows)):
+                chunks.append(chunk)
+                chunk, size = [], 2
+            chunk.append(item)
+            size += len(item) + 1
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def observe(self, nbytes: int, latency: float) -> None:
+        """Feed back a successful request"""
+        with self.lock:
+            if latency > self.target_latency:
+                self._decrease()
+            # Only requests that actually used the budget are evidence that it can grow
+            elif nbytes >= self.budget * 3 // 4:
+                self.budget = min(self.max_bytes, self.budget + self.step_bytes)
+
+    def shrink(self) -> None:
+        """Feed back a request that was too large or timed out"""
+        with self.lock:
+            self._decrease()
+
+    def _decrease(self) -> None:
+        previous = self.budget
+        self.budget = max(self.min_bytes, self.budget // 2)
+        if self.budget != previous:
+            logger.info(f"📉 Request budget cut to {self.budget / 1024:,.0f} KiB")
+
+class ConcurrentUploader:
+    """POST batches to a PostgREST table with up to max_in_flight requests open at once
+
+    Batches are pulled lazily from the iterable, so a streaming producer is never
+    more than max_in_flight batches ahead of the server. Results are reported in
+    batch order even though requests finish out of order. With adaptive sizing
+    (the default) each batch is sent as one or more requests cut to the sizer's
+    byte budget. A request rejected for a data error is bisected until only the
+    offending rows remain; those become the batch's dead letters and the rest
+    of the batch still lands. An error that every row hits (a missing column,
+    an RLS policy, duplicates on a re-run insert) fails the batch instead, as
+    does a batch whose rows were all rejected. A plain insert that times out
+    fails its batch rather than being resent, since it may already have
+    landed; upserts are resent, split, as merging the same rows twice is
+    harmless. With compress=True bodies are gzipped; if the
+    server turns the first gzipped request down and accepts it uncompressed,
+    the rest of the run is sent uncompressed.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        max_in_flight: int = 4,
+        max_attempts: int = 3,
+        requests_per_second: float | None = 10.0,
+        params: Dict[str, str] | None = None,
+        prefer: str = 'return=minimal',
+        base_url: str = SUPABASE_URL,
+        api_key: str = SUPABASE_KEY,
+        timeout: float = 60.0,
+        backoff: float = 1.0,
+        adaptive: bool = True,
+        sizer: AdaptiveBatchSizer | None = None,
+        isolate_rows: bool = True,
+        compress: bool = False,
+    ):
+        self.url = rest_url(table, base_url)
+        self.headers = rest_headers(api_key, prefer)
+        # Whether sending the same rows twice leaves the table as sending them once
+        self.idempotent = 'resolution=' in prefer
+        self.params = params or {}
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_attempts = max(1, max_attempts)
+        self.timeout = timeout
+        self.backoff = backoff
+        self.limiter = RateLimiter(requests_per_second, burst=self.max_in_flight)
+        self.sizer = sizer or (AdaptiveBatchSizer() if adaptive else None)
+        self.isolate_rows = isolate_rows
+        self.compress = compress
+        self.gzip_confirmed = False
+        self.gzip_headers = {**self.headers, 'Content-Encoding': 'gzip'}
+
+        # One pooled connection per in-flight batch, reused across the run
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _retry_delay(self, attempt: int, response: requests.Response | None) -> float:
+        """Exponential backoff, or the server's Retry-After when it sends one"""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff * (2 ** (attempt - 1))
+
+    def _post(self, body: bytes, result: BatchResult) -> requests.Response:
+        """One POST of an encoded body, gzipped while the server accepts that"""
+        compressed = self.compress
+        wire = gzip.compress(body, compresslevel=GZIP_LEVEL) if compressed else body
+        result.requests += 1
+        result.raw_bytes += len(body)
+        result.bytes_sent += len(wire)
+        sent = time.monotonic()
+        try:
+            response = self.session.post(
+                self.url, params=self.params, headers=self.gzip_headers if compressed else self.headers,
+                data=wire, timeout=self.timeout,
+            )
+        finally:
+            result.latencies.append(time.monotonic() - sent)
+        if not compressed or self.gzip_confirmed:
+            return response
+        if response.ok:
+            self.gzip_confirmed = True
+            return response
+        if response.status_code not in GZIP_REJECTED_STATUS:
+            return response
+
+        # Until one gzipped request has succeeded, a 400/415 may just mean the server cannot read gzip
+        sent = time.monotonic()
+        plain = self.session.post(self.url, params=self.params, headers=self.headers, data=body, timeout=self.timeout)
+        result.latencies.append(time.monotonic() - sent)
+        result.requests += 1
+        result.bytes_sent += len(body)
+        if plain.ok and self.compress:
+            self.compress = False
+            logger.warning("🗜️ Server does not accept gzip request bodies; sending uncompressed")
+        return plain
+
+    def _send(self, index: int, chunk: List[bytes], result: BatchResult) -> str:
+        """POST one request with retries
+
+        Returns 'ok', 'failed', 'oversized' (split and resend) or 'rejected'
+        (a data error some row in the request is responsible for).
+        """
+        body = b'[' + b','.join(chunk) + b']'
+
+        for attempt in range(1, self.max_attempts + 1):
+            result.attempts += 1
+            result.retries += attempt > 1
+            response = None
+            oversized = False
+            self.limiter.acquire()
+            sent = time.monotonic()
+            try:
+                response = self._post(body, result)
+                result.status_code = response.status_code
+                if response.ok:
+                    result.error = None
+                    if self.sizer:
+                        self.sizer.observe(len(body), time.monotonic() - sent)
+                    return 'ok'
+                result.error = response.text[:200]
+                result.reason = _error_reason(response)
+                if response.status_code in ROW_ERROR_STATUS:
+                    return 'rejected'
+                oversized = response.status_code in OVERSIZE_STATUS
+                if response.status_code not in RETRYABLE_STATUS and not oversized:
+                    return 'failed'
+                if response.status_code in AMBIGUOUS_STATUS and not self.idempotent:
+                    return self._unconfirmed(index, result)
+            except requests.ConnectTimeout as e:
+                # Nothing reached the server, so it is safe to send again
+                result.status_code = None
+                result.error = result.reason = str(e)
+            except requests.Timeout as e:
+                result.status_code = None
+                result.error = result.reason = str(e)
+                if not self.idempotent:
+                    return self._unconfirmed(index, result)
+                oversized = True
+            except requests.RequestException as e:
+                result.status_code = None
+                result.error = result.reason = str(e)
+
+            if oversized and self.sizer:
+                self.sizer.shrink()
+                if len(chunk) > 1:
+                    return 'oversized'
+                if result.status_code == 413:
+                    return 'failed'
+
+            if attempt < self.max_attempts:
+                delay = self._retry_delay(attempt, response)
+                logger.warning(f"⏳ Batch {index + 1} attempt {attempt} failed ({result.status_code or result.error}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+        return 'failed'
+
+    def _unconfirmed(self, index: int, result: BatchResult) -> str:
+        """Give up on an insert that may have committed after the client stopped waiting"""
+        if self.sizer:
+            self.sizer.shrink()
+        result.error = f"no answer, not resent since the insert may have landed: {result.error}"
+        logger.warning(f"⌛ Batch {index + 1}: {result.error}")
+        return 'failed'
+
+    def _dead_letter(self, index: int, item: bytes, rejection: tuple, result: BatchResult) -> None:
+        status_code, _, error = rejection
+        result.dead_letters.append({'row': json.loads(item), 'status_code': status_code, 'error': error})
+        logger.warning(f"☠️ Batch {index + 1}: row rejected ({status_code}): {error}")
+
+    def _isolate(self, index: int, chunk: List[bytes], result: BatchResult) -> bool:
+        """Bisect a rejected request down to the rows the server refuses
+
+        Each bad row costs about 2 * log2(len(chunk)) extra requests. When both
+        halves fail the same way, the first row of each is tried alone: if
+        those fail that way too, the error is not down to particular rows and
+        False is returned, so the batch fails after a handful of requests
+        rather than one per row. Rows that land along the way are not resent.
+        """
+        # (rows, their rejection as (status, reason, error); None while they still have to be sent)
+        stack = [(chunk, (result.status_code, result.reason, result.error))]
+        while stack:
+            chunk, rejection = stack.pop()
+            if rejection is None:
+                outcome = self._send(index, chunk, result)
+                if outcome == 'failed':
+                    return False
+                if outcome == 'oversized':
+                    pieces = self.sizer.split(chunk, max_rows=(len(chunk) + 1) // 2)
+                    stack.extend((piece, None) for piece in reversed(pieces))
+                if outcome != 'rejected':
+                    continue
+                rejection = (result.status_code, result.reason, result.error)
+            if len(chunk) == 1:
+                self._dead_letter(index, chunk[0], rejection, result)
+                continue
+
+            middle = len(chunk) // 2
+            halves = []
+            for half in (chunk[:middle], chunk[middle:]):
+                outcome = self._send(index, half, result)
+                if outcome == 'failed':
+                    return False
+                halves.append((half, outcome, (result.status_code, result.reason, result.error)))
+
+            same = all(outcome == 'rejected' and r[:2] == rejection[:2] for _, outcome, r in halves)
+            if same and min(len(half) for half, _, _ in halves) > 1:
+                probes = []
+                for half, _, _ in halves:
+                    outcome = self._send(index, half[:1], result)
+                    if outcome == 'failed':
+                        return False
+                    probes.append((outcome, (result.status_code, result.reason, result.error)))
+                if all(outcome == 'rejected' and r[:2] == rejection[:2] for outcome, r in probes):
+                    result.status_code, result.reason, result.error = rejection
+                    logger.warning(f"🚫 Batch {index + 1}: every part of it is rejected ({rejection[0]}): {rejection[2]}")
+                    return False
+                # A probe that landed leaves the rest of its half still rejected; one that did not is a dead letter
+                for (half, _, r), (outcome, probe) in zip(reversed(halves), reversed(probes)):
+                    if outcome == 'ok':
+                        stack.append((half[1:], r))
+                    else:
+                        self._dead_letter(index, half[0], probe, result)
+                        stack.append((half[1:], None))
+                continue
+
+            for half, outcome, r in reversed(halves):
+                if outcome == 'rejected':
+                    stack.append((half, r))
+                elif outcome == 'oversized':
+                    pieces = self.sizer.split(half, max_rows=(len(half) + 1) // 2)
+                    stack.extend((piece, None) for piece in reversed(pieces))
+        return True
+
+    def post_batch(self, index: int, batch: List[Dict[str, Any]]) -> BatchResult:
+        """Send one batch as budget-sized requests, retrying transient failures"""
+        result = BatchResult(index=index, rows=len(batch), ok=False)
+        started = time.monotonic()
+
+        # Serialise once: the encoded rows are both measured and sent
+        try:
+            encoded = encode_rows(batch)
+        except (TypeError, ValueError) as e:
+            result.error = f"Batch is not JSON serialisable: {e}"
+            result.elapsed = time.monotonic() - started
+            return result
+        pending = deque(self.sizer.split(encoded) if self.sizer else [encoded])
+
+        while pending:
+            chunk = pending.popleft()
+            outcome = self._send(index, chunk, result)
+            if outcome == 'oversized':
+                # Resend the same rows in pieces no larger than half of them
+                pending.extendleft(reversed(self.sizer.split(chunk, max_rows=(len(chunk) + 1) // 2)))
+            elif outcome == 'rejected' and self.isolate_rows:
+                if not self._isolate(index, chunk, result):
+                    break
+            elif outcome != 'ok':
+                break
+        else:
+            result.ok = True
+            result.error = None
+
+        if result.ok and result.dead_letters and len(result.dead_letters) == result.rows:
+            # Nothing landed, so the batch is not done whatever the reason
+            result.ok = False
+            result.status_code = result.dead_letters[0]['status_code']
+            result.error = f"all {result.rows} rows rejected: {result.dead_letters[0]['error']}"
+        if not result.ok:
+            # The whole batch is retried on resume, so its rows are not dead letters
+            result.dead_letters = []
+
+        result.elapsed = time.monotonic() - started
+        return result
+
+    def upload(
+        self,
+        batches: Iterable[List[Dict[str, Any]]],
+        on_result: Callable[[BatchResult], None] | None = None,
+    ) -> UploadReport:
+        """Upload every batch, keeping at most max_in_flight requests open"""
+        report = UploadReport()
+        started = time.monotonic()
+        finished: Dict[int, BatchResult] = {}
+        next_to_report = 0
+        source = enumerate(batches)
+        exhausted = False
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            while True:
+                while not exhausted and len(in_flight) < self.max_in_flight:
+                    try:
+                        index, batch = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    in_flight[pool.submit(self.post_batch, index, batch)] = index
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del in_flight[future]
+                    result = future.result()
+                    finished[result.index] = result
+
+                # Hand results over strictly in batch order
+                while next_to_report in finished:
+                    result = finished.pop(next_to_report)
+                    report.results.append(result)
+                    if on_result:
+                        on_result(result)
+                    next_to_report += 1
+
+        report.elapsed = time.monotonic() - started
+        report.request_bytes = self.sizer.budget if self.sizer else None
+        return report
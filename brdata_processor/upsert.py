@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Idempotent upsert loading with soft deactivation of units missing from a snapshot"""
+
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Set
+
+import requests
+
+from brdata_processor.config import SUPABASE_KEY, SUPABASE_URL, rest_headers, rest_url
+from brdata_processor.uploader import ConcurrentUploader
+
+logger = logging.getLogger(__name__)
+
+# Natural key of each table the pipeline upserts into (brdata_properties keeps the Nawy id as its primary key)
+CONFLICT_KEYS = {
+    'nawy_properties': 'nawy_id',
+    'brdata_properties': 'id',
+    'inventory_facets': 'source_table',
+    'inventory_stats': 'cell_key',
+    'inventory_histograms': 'cell_key',
+    'inventory_search': 'source_table',
+    'compound_summary': 'compound_key',
+}
+
+# Rows asked for per page; a server whose max-rows is lower answers with fewer
+PAGE_SIZE = 1000
+# Keeps `key=in.(...)` filters comfortably under URL length limits
+IN_FILTER_CHUNK = 300
+
+def conflict_key(table: str) -> str:
+    """Column the table is upserted on"""
+    if table not in CONFLICT_KEYS:
+        raise ValueError(f"No upsert key configured for table '{table}'")
+    return CONFLICT_KEYS[table]
+
+def upsert_uploader(table: str, **uploader_kwargs) -> ConcurrentUploader:
+    """ConcurrentUploader that merges rows on the table's natural key instead of inserting"""
+    key = conflict_key(table)
+    return ConcurrentUploader(
+        table,
+        params={'on_conflict': key},
+        prefer='resolution=merge-duplicates,return=minimal',
+        **uploader_kwargs,
+    )
+
+def mark_active(batches: Iterable[List[Dict[str, Any]]], key: str, seen: Set[Any]) -> Iterator[List[Dict[str, Any]]]:
+    """Flag every uploaded row active (re-activating returning units) and remember its key"""
+    for batch in batches:
+        for record in batch:
+            record['is_active'] = True
+            if record.get(key) is not None:
+                seen.add(record[key])
+        yield batch
+
+def fetch_rows(
+    table: str,
+    key: str,
+    columns: List[str],
+    filters: Dict[str, str] | None = None,
+    base_url: str = SUPABASE_URL,
+    api_key: str = SUPABASE_KEY,
+    session: requests.Session | None = None,
+    after: Any = None,
+    most: int | None = None,
+) -> Iterator[Dict[str, Any]]:
+    """Stream a narrow projection of every matching row, paged by key rather than by offset
+
+    after resumes the scan past a key that was already processed. The scan
+    ends on an empty page, since a short one may only mean the server caps
+    responses below PAGE_SIZE, or once most rows (all the filters can
+    match) have come back.
+    """
+    session = session or requests.Session()
+    url = rest_url(table, base_url)
+    headers = rest_headers(api_key, prefer=None)
+    select = ','.join([key] + [c for c in columns if c != key])
+    last = after
+    fetched = 0
+
+    while most is None or fetched < most:
+        params = [('select', select), ('order', f'{key}.asc'), ('limit', str(PAGE_SIZE)), *(filters or {}).items()]
+        if last is not None:
+            # A second filter on the key is ANDed with any the caller set on it
+            params.append((key, f'gt.{last}'))
+        response = session.get(url, params=params, headers=headers, timeout=60)
+        response.raise_for_status()
+        page = response.json()
+        if not page:
+            return
+        yield from page
+        fetched += len(page)
+        last = page[-1][key]
+
+def fetch_keys(
+    table: str,
+    key: str,
+    filters: Dict[str, str] | None = None,
+    base_url: str = SUPABASE_URL,
+    api_key: str = SUPABASE_KEY,
+    session: requests.Session | None = None,
+) -> Set[Any]:
+    """All key values matching the filters"""
+    return {row[key] for row in fetch_rows(table, key, [], filters, base_url, api_key, session)}
+
+def fetch_keyed_rows(
+    table: str,
+    key: str,
+    keys: Iterable[Any],
+    columns: List[str],
+    base_url: str = SUPABASE_URL,
+    api_key: str = SUPABASE_KEY,
+    session: requests.Session | None = None,
+) -> List[Dict[str, Any]]:
+    """A narrow projection of the rows with the given keys"""
+    session = session or requests.Session()
+    keys = sorted(keys)
+    rows: List[Dict[str, Any]] = []
+
+    for i in range(0, len(keys), IN_FILTER_CHUNK):
+        chunk = keys[i:i + IN_FILTER_CHUNK]
+        in_list = ','.join(str(k) for k in chunk)
+        rows.extend(fetch_rows(table, key, columns, {key: f'in.({in_list})'}, base_url, api_key, session,
+                               most=len(chunk)))
+    return rows
+
+def deactivate_keys(
+    table: str,
+    key: str,
+    keys: Iterable[Any],
+    base_url: str = SUPABASE_URL,
+    api_key: str = SUPABASE_KEY,
+    session: requests.Session | None = None,
+) -> int:
+    """Set is_active = false for the given keys; returns how many were sent"""
+    session = session or requests.Session()
+    url = rest_url(table, base_url)
+    headers = rest_headers(api_key)
+    keys = sorted(keys)
+
+    for i in range(0, len(keys), IN_FILTER_CHUNK):
+        chunk = keys[i:i + IN_FILTER_CHUNK]
+        in_list = ','.join(str(k) for k in chunk)
+        response = session.patch(
+            url, params={key: f'in.({in_list})'}, headers=headers, json={'is_active': False}, timeout=60
+        )
+        response.raise_for_status()
+
+    return len(keys)
+
+def deactivate_missing(
+    table: str,
+    seen: Set[Any],
+    base_url: str = SUPABASE_URL,
+    api_key: str = SUPABASE_KEY,
+) -> int:
+    """Soft-deactivate active units whose key was not part of this snapshot
+
+    Only call this after a complete, successful load: any key that failed to
+    upload would otherwise be deactivated as well.
+    """
+    key = conflict_key(table)
+    session = requests.Session()
+    active = fetch_keys(table, key, {'is_active': 'eq.true'}, base_url, api_key, session)
+    missing = active - seen
+    if missing:
+        logger.info(f"🗄️ Deactivating {len(missing):,} units no longer in the snapshot")
+        deactivate_keys(table, key, missing, base_url, api_key, session)
+    return len(missing)
@@ -4,7 +4,8 @@
 import pandas as pd
 import requests
 import json
-import time
+
+from brdata_processor.uploader import DEFAULT_BATCH_ROWS, ConcurrentUploader
 
 # Your Supabase details
 SUPABASE_URL = "https://mdqqqogshgtpzxtufjzn.supabase.co"
@@ -47,24 +48,6 @@ def transform_property_data(row):
         'property_type': clean_json_field(row['property_type']),
     }
 
-def upload_batch(data_batch):
-    """Upload a batch of records via REST API"""
-    url = f"{SUPABASE_URL}/rest/v1/nawy_properties"
-    headers = {
-        'apikey': SUPABASE_KEY,
-        'Authorization': f'Bearer {SUPABASE_KEY}',
-        'Content-Type': 'application/json',
-        'Prefer': 'return=minimal'
-    }
-    
-    response = requests.post(url, headers=headers, json=data_batch)
-    
-    if response.status_code != 201:
-        print(f"❌ Error {response.status_code}: {response.text[:200]}...")
-        return False
-    
-    return True
-
 def clear_existing_data():
     """Clear existing data"""
     print("🗑️ Clearing existing data...")
@@ -105,25 +88,24 @@ def main():
     print(f"📊 Sample record:")
     print(json.dumps(records[0], indent=2, default=str))
     
-    # Upload in small batches
-    batch_size = 10
-    success_count = 0
+    # The uploader cuts each batch into requests sized to its adaptive byte budget
+    batch_size = DEFAULT_BATCH_ROWS
+    uploader = ConcurrentUploader(
+        'nawy_properties', max_in_flight=4, base_url=SUPABASE_URL, api_key=SUPABASE_KEY,
+    )
     
-    for i in range(0, len(records), batch_size):
-        batch = records[i:i+batch_size]
-        batch_num = (i // batch_size) + 1
-        print(f"📤 Uploading batch {batch_num}...")
-        
-        if upload_batch(batch):
-            success_count += len(batch)
-            print(f"✅ Success! Total uploaded: {success_count}")
+    def on_result(result):
+        if result.ok:
+            print(f"✅ Batch {result.index + 1} uploaded ({result.rows} records)")
         else:
-            print(f"❌ Batch failed at record {i}")
-            break
-        
-        time.sleep(0.5)
+            print(f"❌ Batch {result.index + 1} failed at record {result.index * batch_size}: {result.error}")
+    
+    batches = (records[i:i+batch_size] for i in range(0, len(records), batch_size))
+    report = uploader.upload(batches, on_result=on_result)
+    success_count = report.rows_uploaded
     
     print(f"🎉 DONE! Uploaded {success_count} records with complete data!")
+    print(f"📐 {report.sizing_summary()}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,93 @@
+-- =====================================================
+-- MERGE STAGED BRDATA PROPERTIES INTO THE LIVE TABLE
+-- Expects brdata_properties_staging to be filled (see import_data_psql.sql)
+-- =====================================================
+
+-- One row per unit id; unchanged units are not rewritten
+INSERT INTO brdata_properties (
+    id, unit_id, original_unit_id, sale_type, unit_number, unit_area,
+    number_of_bedrooms, number_of_bathrooms, ready_by, finishing, garden_area,
+    roof_area, floor_number, building_number, price_per_meter, price_in_egp,
+    last_inventory_update, currency, payment_plans, image, offers, is_launch, compound,
+    area, developer, phase, property_type,
+    search_tokens, sort_key, commission_percent, commission_egp,
+    is_active
+)
+SELECT DISTINCT ON (id)
+    id, unit_id, original_unit_id, sale_type, unit_number, unit_area,
+    number_of_bedrooms, number_of_bathrooms, ready_by, finishing, garden_area,
+    roof_area, floor_number, building_number, price_per_meter, price_in_egp,
+    last_inventory_update, currency, payment_plans, image, offers, is_launch, compound,
+    area, developer, phase, property_type,
+    search_tokens, sort_key, commission_percent, commission_egp,
+    true
+FROM brdata_properties_staging
+ORDER BY id
+ON CONFLICT (id) DO UPDATE SET
+    unit_id = EXCLUDED.unit_id,
+    original_unit_id = EXCLUDED.original_unit_id,
+    sale_type = EXCLUDED.sale_type,
+    unit_number = EXCLUDED.unit_number,
+    unit_area = EXCLUDED.unit_area,
+    number_of_bedrooms = EXCLUDED.number_of_bedrooms,
+    number_of_bathrooms = EXCLUDED.number_of_bathrooms,
+    ready_by = EXCLUDED.ready_by,
+    finishing = EXCLUDED.finishing,
+    garden_area = EXCLUDED.garden_area,
+    roof_area = EXCLUDED.roof_area,
+    floor_number = EXCLUDED.floor_number,
+    building_number = EXCLUDED.building_number,
+    price_per_meter = EXCLUDED.price_per_meter,
+    price_in_egp = EXCLUDED.price_in_egp,
+    last_inventory_update = EXCLUDED.last_inventory_update,
+    currency = EXCLUDED.currency,
+    payment_plans = EXCLUDED.payment_plans,
+    image = EXCLUDED.image,
+    offers = EXCLUDED.offers,
+    is_launch = EXCLUDED.is_launch,
+    compound = EXCLUDED.compound,
+    area = EXCLUDED.area,
+    developer = EXCLUDED.developer,
+    phase = EXCLUDED.phase,
+    property_type = EXCLUDED.property_type,
+    search_tokens = EXCLUDED.search_tokens,
+    sort_key = EXCLUDED.sort_key,
+    commission_percent = EXCLUDED.commission_percent,
+    commission_egp = EXCLUDED.commission_egp,
+    is_active = EXCLUDED.is_active,
+    -- Stale once the content changes; the next diff sync re-hashes the unit
+    row_hash = NULL
+WHERE (
+    brdata_properties.unit_id, brdata_properties.original_unit_id,
+    brdata_properties.sale_type, brdata_properties.unit_number,
+    brdata_properties.unit_area, brdata_properties.number_of_bedrooms,
+    brdata_properties.number_of_bathrooms, brdata_properties.ready_by,
+    brdata_properties.finishing, brdata_properties.garden_area,
+    brdata_properties.roof_area, brdata_properties.floor_number,
+    brdata_properties.building_number, brdata_properties.price_per_meter,
+    brdata_properties.price_in_egp, brdata_properties.last_inventory_update,
+    brdata_properties.currency, brdata_properties.payment_plans,
+    brdata_properties.image, brdata_properties.offers, brdata_properties.is_launch,
+    brdata_properties.compound, brdata_properties.area, brdata_properties.developer,
+    brdata_properties.phase, brdata_properties.property_type,
+    brdata_properties.search_tokens, brdata_properties.sort_key,
+    brdata_properties.commission_percent, brdata_properties.commission_egp,
+    brdata_properties.is_active
+) IS DISTINCT FROM (
+    EXCLUDED.unit_id, EXCLUDED.original_unit_id, EXCLUDED.sale_type,
+    EXCLUDED.unit_number, EXCLUDED.unit_area, EXCLUDED.number_of_bedrooms,
+    EXCLUDED.number_of_bathrooms, EXCLUDED.ready_by, EXCLUDED.finishing,
+    EXCLUDED.garden_area, EXCLUDED.roof_area, EXCLUDED.floor_number,
+    EXCLUDED.building_number, EXCLUDED.price_per_meter, EXCLUDED.price_in_egp,
+    EXCLUDED.last_inventory_update, EXCLUDED.currency, EXCLUDED.payment_plans,
+    EXCLUDED.image, EXCLUDED.offers, EXCLUDED.is_launch, EXCLUDED.compound,
+    EXCLUDED.area, EXCLUDED.developer, EXCLUDED.phase, EXCLUDED.property_type,
+    EXCLUDED.search_tokens, EXCLUDED.sort_key, EXCLUDED.commission_percent, EXCLUDED.commission_egp,
+    EXCLUDED.is_active
+);
+
+-- Units missing from the snapshot are hidden, not deleted
+UPDATE brdata_properties t
+SET is_active = false
+WHERE t.is_active
+  AND NOT EXISTS (SELECT 1 FROM brdata_properties_staging s WHERE s.id = t.id);
@@ -0,0 +1,29 @@
+-- =====================================================
+-- BULK LOAD BRDATA PROPERTIES WITH COPY (psql)
+-- Loads the COPY-ready CSV into a staging table and merges it
+-- =====================================================
+--
+-- 1. Write the COPY-ready file (JSON columns as real JSON, types as the importer sends them):
+--      python import_supabase_safe.py --export-copy-csv brdata_properties_copy.csv
+--    The file carries search_tokens, sort_key and the commission columns, so the table needs
+--    migrations 014, 015 and 017.
+-- 2. Run from the repository root over a direct connection:
+--      psql "postgresql://postgres:[PASSWORD]@[HOST]:5432/postgres" -f import_data_psql.sql
+
+\set ON_ERROR_STOP on
+
+BEGIN;
+
+-- Same shape as the target, dropped automatically at commit
+CREATE TEMP TABLE brdata_properties_staging (LIKE brdata_properties INCLUDING DEFAULTS) ON COMMIT DROP;
+
+\copy brdata_properties_staging (id, unit_id, original_unit_id, sale_type, unit_number, unit_area, number_of_bedrooms, number_of_bathrooms, ready_by, finishing, garden_area, roof_area, floor_number, building_number, price_per_meter, price_in_egp, last_inventory_update, currency, payment_plans, image, offers, is_launch, compound, area, developer, phase, property_type, search_tokens, sort_key, commission_percent, commission_egp) FROM 'brdata_properties_copy.csv' WITH (FORMAT csv, HEADER true)
+
+ANALYZE brdata_properties_staging;
+
+-- Set-based merge and deactivation
+\i import_clean_data.sql
+
+COMMIT;
+
+SELECT COUNT(*) AS total_rows, COUNT(*) FILTER (WHERE is_active) AS active_rows FROM brdata_properties;
@@ -4,7 +4,8 @@
 import pandas as pd
 import requests
 import json
-import time
+
+from brdata_processor.uploader import DEFAULT_BATCH_ROWS, ConcurrentUploader
 
 # Your Supabase details
 SUPABASE_URL = "https://mdqqqogshgtpzxtufjzn.supabase.co"
@@ -47,24 +48,6 @@ def transform_primary_unit(row):
         'property_type': clean_json_field(row['property_type']),
     }
 
-def upload_batch(data_batch):
-    """Upload a batch of records"""
-    url = f"{SUPABASE_URL}/rest/v1/nawy_properties"
-    headers = {
-        'apikey': SUPABASE_KEY,
-        'Authorization': f'Bearer {SUPABASE_KEY}',
-        'Content-Type': 'application/json',
-        'Prefer': 'return=minimal'
-    }
-    
-    response = requests.post(url, headers=headers, json=data_batch)
-    
-    if response.status_code != 201:
-        print(f"❌ Error {response.status_code}: {response.text[:200]}")
-        return False
-    
-    return True
-
 def clear_database():
     """Clear existing data"""
     print("🗑️ Clearing existing data...")
@@ -110,25 +93,21 @@ def main():
     print(f"  Size: {sample['unit_area']}m², {sample['number_of_bedrooms']}BR")
     print(f"  Price: {sample['price_in_egp']:,.0f} EGP")
     
-    # Upload in small batches
-    batch_size = 20
-    success_count = 0
+    # Upload through the pooled, rate-limited uploader instead of sleeping between batches
+    uploader = ConcurrentUploader('nawy_properties', base_url=SUPABASE_URL, api_key=SUPABASE_KEY)
     
     print(f"\n🚀 Uploading {len(records)} PRIMARY units...")
     
-    for i in range(0, len(records), batch_size):
-        batch = records[i:i+batch_size]
-        batch_num = (i // batch_size) + 1
-        print(f"📤 Batch {batch_num}...")
-        
-        if upload_batch(batch):
-            success_count += len(batch)
-            print(f"✅ Total uploaded: {success_count}")
+    def on_result(result):
+        if result.ok:
+            print(f"✅ Batch {result.index + 1} uploaded ({result.rows} units)")
         else:
-            print(f"❌ Failed at batch {batch_num}")
-            break
-        
-        time.sleep(0.5)
+            print(f"❌ Failed at batch {result.index + 1}: {result.error}")
+    
+    batches = (records[i:i+DEFAULT_BATCH_ROWS] for i in range(0, len(records), DEFAULT_BATCH_ROWS))
+    report = uploader.upload(batches, on_result=on_result)
+    success_count = report.rows_uploaded
+    print(f"📐 {report.sizing_summary()}")
     
     print(f"\n🎉 SUCCESS! Imported {success_count} PRIMARY units with complete structure!")
     print("📊 Your inventory now has:")
@@ -1,9 +1,15 @@
+import os
+import sys
 import requests
 import pandas as pd
 import time
 from datetime import datetime
 import json
 
+# The shared pipeline package lives at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from brdata_processor.metrics import RunMetrics
+
 # Configuration Variables
 API_URL = "https://erealty-backend-api.cooingestate.com/v1/properties/search"
 AUTH_TOKEN = "eyJraWQiOiJrYU9oZzQrakhkUXlTenpVdjEyY1lTSXJPcndRT0ZxTlVZMWdETTlCbUFNPSIsImFsZyI6IlJTMjU2In0.eyJzdWIiOiIyYjljNjNkMi0zYmY0LTQzZDgtODk1MC02ZWYxZTZmNjZhOWMiLCJjb2duaXRvOmdyb3VwcyI6WyJOYXd5SW52ZW50b3J5IiwiQnJva2VycyJdLCJpc3MiOiJodHRwczpcL1wvY29nbml0by1pZHAuZXUtY2VudHJhbC0xLmFtYXpvbmF3cy5jb21cL2V1LWNlbnRyYWwtMV9kZ2duZjg2RFUiLCJwaG9uZV9udW1iZXJfdmVyaWZpZWQiOnRydWUsImNvZ25pdG86dXNlcm5hbWUiOiI4OGU4ZThjOS0zZTQwLTQzYWMtOGEzOS0wNDE5MmFjNGZhZWEiLCJvcmlnaW5fanRpIjoiYmUwZThkNGEtNmQzNS00YWY0LTk3MzEtNmRjYjVjNWI4M2E0IiwiYXVkIjoiN29ta2d0czZ0cGhzYmpoYWtwam9pN2VxcTkiLCJldmVudF9pZCI6Ijc1OGI0ZWU5LWM2N2YtNDJmMC1hN2VmLWEwMTlmMWE5MmJkZSIsInRva2VuX3VzZSI6ImlkIiwiYXV0aF90aW1lIjoxNzU2MTM4OTQ3LCJuYW1lIjoib21hciBtb2hhbWVkIiwicGhvbmVfbnVtYmVyIjoiKzIwMTE0MDgwMTUxNSIsImV4cCI6MTc1NjE1OTAwMywiaWF0IjoxNzU2MTU1NDAzLCJqdGkiOiIzMTI0ZTUzMC1lMzM1LTRmNTctOTAyNi1jZjk3OTI1MGY0ZmUifQ.VxnJsvT7LFvvukoak2Is8wFgZ-PXNstU-dgCylncSXWoxzRxzTwyhdhCmFwv2NhKB1ZNc3AdisYTgv8hq4BYiOZK4pTsyThDBejDn6zvNCfuNHizw2Z0-YWZk9yFsOYw_h76auTQsAtiI5CuI0cbsWC9jKDSheUUEJl1rbVClGUPJ6I_UYOzcnO43aOBgqaAj8hZELKHst7uX75wUXbG3sCAkfWo5MIBhlSOvokqH8xsGUAfVy4XFNW1uNIH_XzvtuPtSH90d-5AltOk82AAk2n_wQeRh-UmCnRNspXm3c9hIfOByFcA3Kq5Yz50Jg4-9wniP7gC0dwi3OGL3pqr6Q"
@@ -17,7 +23,7 @@ headers = {
     "Authorization": f"Bearer {AUTH_TOKEN}"
 }
 
-def fetch_page(page_number):
+def fetch_page(page_number, stage=None):
     """Fetch a single page of data from the API - NO compound filter"""
     params = {
         "page": page_number,
@@ -26,7 +32,11 @@ def fetch_page(page_number):
     }
     
     try:
+        sent = time.monotonic()
         response = requests.get(API_URL, headers=headers, params=params, timeout=30)
+        if stage:
+            stage.observe_request(time.monotonic() - sent, bytes_in=len(response.content),
+                                  ok=response.status_code == 200)
         
         if response.status_code != 200:
             if response.status_code == 401:
@@ -65,6 +75,7 @@ def main():
     print(f"💾 Auto-save every {SAVE_EVERY_N_PAGES} pages")
     print("-" * 70)
     
+    metrics = RunMetrics('nawy_scrape')
     all_properties = []
     seen_property_ids = set()
     page = 1
@@ -72,10 +83,13 @@ def main():
     last_save_page = 0
     
     # Get first page to see total scope
-    properties, total_pages, total_count = fetch_page(1)
+    scrape = metrics.get('scrape')
+    with metrics.stage('scrape'):
+        properties, total_pages, total_count = fetch_page(1, scrape)
     
     if properties is None:
         print("❌ Failed to fetch first page. Exiting.")
+        metrics.write()
         return
     
     print(f"🎯 DISCOVERED: {total_count:,} total properties across {total_pages:,} pages!")
@@ -85,9 +99,11 @@ def main():
     # Process all pages
     while page <= min(total_pages, MAX_PAGES):
         if page > 1:  # We already fetched page 1
-            properties, _, _ = fetch_page(page)
+            with metrics.stage('scrape'):
+                properties, _, _ = fetch_page(page, scrape)
         
         if properties is None:
+            scrape.retries += 1
             print(f"❌ Failed to fetch page {page}. Retrying in 5 seconds...")
             time.sleep(5)
             continue
@@ -110,6 +126,7 @@ def main():
                     new_properties.append(prop)
             
             all_properties.extend(new_properties)
+            scrape.rows += len(new_properties)
             
             # Progress reporting
             if page % 10 == 0 or page <= 5:
@@ -133,10 +150,13 @@ def main():
         print("-" * 70)
         print("💾 Saving final dataset...")
         
-        df = pd.DataFrame(all_properties)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'nawy_ALL_properties_{timestamp}.csv'
-        df.to_csv(filename, index=False)
+        with metrics.stage('save') as stage:
+            df = pd.DataFrame(all_properties)
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f'nawy_ALL_properties_{timestamp}.csv'
+            df.to_csv(filename, index=False)
+            stage.rows = len(df)
+            stage.bytes_out = os.path.getsize(filename)
         
         print(f"🎉 SUCCESS! Saved {len(all_properties):,} unique properties to '{filename}'")
         print(f"📊 Data contains {len(df.columns)} columns")
@@ -165,6 +185,14 @@ def main():
         print("❌ No properties were retrieved.")
     
     print(f"🏁 Completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    
+    # Time spent sleeping between pages is deliberately left out of the scrape stage
+    for line in metrics.summary():
+        print(f"⏱️  {line}")
+    report_path, prom_path, regressions = metrics.write()
+    print(f"📝 Run report: {report_path} (Prometheus textfile: {prom_path})")
+    for regression in regressions:
+        print(f"🐢 Slower than last run - {regression}")
 
 if __name__ == "__main__":
     main()
@@ -2,6 +2,7 @@
 // Copy this to: src/lib/propertyQueries.ts
 
 import { supabase } from './supabase'; // Use your existing supabase client
+import { searchTokenTerms } from './searchIndex'; // Copy src/lib/searchIndex.ts alongside
 
 // TypeScript interfaces for better type safety
 export interface PropertyFilter {
@@ -52,6 +53,7 @@ export interface Property {
   is_active: boolean;
   is_featured: boolean;
   priority_score: number;
+  sort_key?: string;
   created_at: string;
 }
 
@@ -60,6 +62,15 @@ export interface PropertyResponse {
   error?: any;
   totalCount?: number;
   totalPages?: number;
+  // Pass as options.after to read the following page; null on the last page
+  nextCursor?: string | null;
+}
+
+export interface PageOptions {
+  // sort_key of the previous page's last row; the page is read after it instead of by offset
+  after?: string | null;
+  // 'estimated' uses the planner's row estimate, 'exact' counts every matching row
+  countMode?: 'estimated' | 'exact';
 }
 
 export interface PropertyStats {
@@ -72,22 +83,25 @@ export interface PropertyStats {
   topAreas: Array<{ name: string; count: number }>;
   topDevelopers: Array<{ name: string; count: number }>;
   topPropertyTypes: Array<{ name: string; count: number }>;
+  medianPrice?: number;
+  updatedAt?: string;
 }
 
 // Get all active properties with advanced filtering and pagination
 export const getActiveProperties = async (
   page = 1,
   limit = 20,
-  filters: PropertyFilter = {}
+  filters: PropertyFilter = {},
+  options: PageOptions = {}
 ): Promise<PropertyResponse> => {
   try {
+    // sort_key is priority, latest inventory update and nawy_id (migration 015), unique and indexed
     let query = supabase
       .from('nawy_properties')
-      .select('*', { count: 'exact' })
+      .select('*', { count: options.countMode === 'exact' ? 'exact' : 'planned' })
       .eq('is_active', true)
       .eq('visibility_status', 'public')
-      .order('priority_score', { ascending: false })
-      .order('created_at', { ascending: false });
+      .order('sort_key', { ascending: false });
 
     // Apply filters
     if (filters.compound) {
@@ -127,18 +141,23 @@ export const getActiveProperties = async (
       query = query.eq('is_launch', filters.is_launch);
     }
 
-    // Pagination
-    const from = (page - 1) * limit;
-    const to = from + limit - 1;
-    query = query.range(from, to);
+    // Keyset pagination: page N costs the same as page 1 when it continues from a cursor
+    if (options.after) {
+      query = query.lt('sort_key', options.after).limit(limit);
+    } else {
+      const from = (page - 1) * limit;
+      query = query.range(from, from + limit - 1);
+    }
 
     const { data, error, count } = await query;
+    const rows = data || [];
 
     return {
-      properties: data || [],
+      properties: rows,
       error,
       totalCount: count || 0,
       totalPages: Math.ceil((count || 0) / limit),
+      nextCursor: rows.length === limit ? rows[rows.length - 1].sort_key : null,
     };
   } catch (error) {
     return {
@@ -185,7 +204,7 @@ export const getPropertyById = async (nawyId: number): Promise<{ property?: Prop
   }
 };
 
-// Full-text search across all property fields
+// Search by compound, area, developer, type or unit number, in English or Arabic
 export const searchProperties = async (
   searchTerm: string,
   limit = 20,
@@ -198,16 +217,9 @@ export const searchProperties = async (
       .eq('is_active', true)
       .eq('visibility_status', 'public');
 
-    // Use full-text search if available, otherwise use ILIKE
-    if (searchTerm) {
-      query = query.or(`
-        compound->>name.ilike.%${searchTerm}%,
-        area->>name.ilike.%${searchTerm}%,
-        developer->>name.ilike.%${searchTerm}%,
-        property_type->>name.ilike.%${searchTerm}%,
-        unit_number.ilike.%${searchTerm}%,
-        finishing.ilike.%${searchTerm}%
-      `);
+    // Normalised Arabic/English terms (migration 014); Arabic input matches by sound
+    for (const term of searchTokenTerms(searchTerm)) {
+      query = query.ilike('search_tokens', `%${term}%`);
     }
 
     // Apply additional filters
@@ -253,6 +265,28 @@ export const searchProperties = async (
 // Get unique values for filter dropdowns
 export const getFilterOptions = async () => {
   try {
+    // The importer publishes the distinct values once per load; scan only if that row is missing
+    const { data: published } = await supabase
+      .from('inventory_facets')
+      .select('facets')
+      .eq('source_table', 'nawy_properties')
+      .maybeSingle();
+
+    if (published?.facets) {
+      const values = (facet?: { value: any }[]) => (facet || []).map(item => item.value);
+      const { facets } = published;
+      return {
+        compounds: values(facets.compounds),
+        areas: values(facets.areas),
+        developers: values(facets.developers),
+        propertyTypes: values(facets.propertyTypes),
+        finishings: values(facets.finishingOptions),
+        bedroomOptions: values(facets.bedroomOptions),
+        bathroomOptions: values(facets.bathroomOptions),
+        error: null,
+      };
+    }
+
     const { data, error } = await supabase
       .from('nawy_properties')
       .select('compound, area, developer, property_type, finishing, number_of_bedrooms, number_of_bathrooms')
@@ -297,6 +331,35 @@ export const getFilterOptions = async () => {
 // Get property statistics for dashboard/analytics
 export const getPropertyStats = async (): Promise<{ stats?: PropertyStats; error?: any }> => {
   try {
+    // The importer keeps a statistics cube up to date; this view holds its totals and top 10s (about 50 rows)
+    const { data: cells } = await supabase
+      .from('inventory_stats_top')
+      .select('dimension, value, unit_count, price_avg, price_min, price_max, price_p50, area_avg, updated_at')
+      .eq('source_table', 'nawy_properties')
+      .order('rank', { ascending: true });
+
+    const overall = cells?.find(cell => cell.dimension === 'all');
+    if (cells && overall) {
+      const top = (dimension: string) => cells
+        .filter(cell => cell.dimension === dimension)
+        .map(cell => ({ name: cell.value, count: cell.unit_count }));
+
+      const stats: PropertyStats = {
+        totalProperties: overall.unit_count,
+        avgPrice: overall.price_avg || 0,
+        minPrice: overall.price_min || 0,
+        maxPrice: overall.price_max || 0,
+        avgArea: overall.area_avg || 0,
+        topCompounds: top('compound'),
+        topAreas: top('area'),
+        topDevelopers: top('developer'),
+        topPropertyTypes: top('property_type'),
+        medianPrice: overall.price_p50 || 0,
+        updatedAt: overall.updated_at,
+      };
+      return { stats, error: null };
+    }
+
     const { data, error } = await supabase
       .from('nawy_properties')
       .select('price_in_egp, unit_area, compound, area, developer, property_type')
@@ -308,11 +371,12 @@ export const getPropertyStats = async (): Promise<{ stats?: PropertyStats; error
     const validPrices = data.map(p => p.price_in_egp).filter(p => p && p > 0);
     const validAreas = data.map(p => p.unit_area).filter(a => a && a > 0);
 
+    // reduce rather than Math.min(...prices), which overflows the call stack on large arrays
     const stats: PropertyStats = {
       totalProperties: data.length,
       avgPrice: validPrices.length > 0 ? validPrices.reduce((sum, p) => sum + p, 0) / validPrices.length : 0,
-      minPrice: validPrices.length > 0 ? Math.min(...validPrices) : 0,
-      maxPrice: validPrices.length > 0 ? Math.max(...validPrices) : 0,
+      minPrice: validPrices.length > 0 ? validPrices.reduce((min, p) => Math.min(min, p), Infinity) : 0,
+      maxPrice: validPrices.length > 0 ? validPrices.reduce((max, p) => Math.max(max, p), -Infinity) : 0,
       avgArea: validAreas.length > 0 ? validAreas.reduce((sum, a) => sum + a, 0) / validAreas.length : 0,
       topCompounds: getTopValues(data, 'compound', 'name'),
       topAreas: getTopValues(data, 'area', 'name'),
@@ -343,53 +407,74 @@ function getTopValues(data: any[], field: string, subField: string, limit = 10)
     .map(([name, count]) => ({ name, count }));
 }
 
+// Exact bounds and binned counts the importer publishes (brdata_processor/histograms.py)
+const getRangeHistogram = async (measure: 'price_in_egp' | 'unit_area') => {
+  const { data } = await supabase
+    .from('inventory_histograms')
+    .select('min_value, max_value, edges, counts')
+    .eq('source_table', 'nawy_properties')
+    .eq('measure', measure)
+    .eq('dimension', 'all')
+    .maybeSingle();
+  return data;
+};
+
 // Get price ranges for filter sliders
 export const getPriceRange = async () => {
   try {
+    const histogram = await getRangeHistogram('price_in_egp');
+    if (histogram) {
+      return { minPrice: histogram.min_value, maxPrice: histogram.max_value, histogram, error: null };
+    }
+
     const { data, error } = await supabase
       .from('nawy_properties')
       .select('price_in_egp')
       .eq('is_active', true)
       .eq('visibility_status', 'public')
-      .not('price_in_egp', 'is', null)
+      .gt('price_in_egp', 0)
       .order('price_in_egp', { ascending: true });
 
     if (error) throw error;
 
-    const prices = data.map(item => item.price_in_egp).filter(p => p > 0);
-    
+    // Already sorted, so the bounds are the two ends
     return {
-      minPrice: prices.length > 0 ? Math.min(...prices) : 0,
-      maxPrice: prices.length > 0 ? Math.max(...prices) : 0,
+      minPrice: data.length > 0 ? data[0].price_in_egp : 0,
+      maxPrice: data.length > 0 ? data[data.length - 1].price_in_egp : 0,
+      histogram: null,
       error: null,
     };
   } catch (error) {
-    return { minPrice: 0, maxPrice: 0, error };
+    return { minPrice: 0, maxPrice: 0, histogram: null, error };
   }
 };
 
 // Get area ranges for filter sliders
 export const getAreaRange = async () => {
   try {
+    const histogram = await getRangeHistogram('unit_area');
+    if (histogram) {
+      return { minArea: histogram.min_value, maxArea: histogram.max_value, histogram, error: null };
+    }
+
     const { data, error } = await supabase
       .from('nawy_properties')
       .select('unit_area')
       .eq('is_active', true)
       .eq('visibility_status', 'public')
-      .not('unit_area', 'is', null)
+      .gt('unit_area', 0)
       .order('unit_area', { ascending: true });
 
     if (error) throw error;
 
-    const areas = data.map(item => item.unit_area).filter(a => a > 0);
-    
     return {
-      minArea: areas.length > 0 ? Math.min(...areas) : 0,
-      maxArea: areas.length > 0 ? Math.max(...areas) : 0,
+      minArea: data.length > 0 ? data[0].unit_area : 0,
+      maxArea: data.length > 0 ? data[data.length - 1].unit_area : 0,
+      histogram: null,
       error: null,
     };
   } catch (error) {
-    return { minArea: 0, maxArea: 0, error };
+    return { minArea: 0, maxArea: 0, histogram: null, error };
   }
 };
 
@@ -8,7 +8,12 @@ import pandas as pd
 import json
 from supabase import create_client, Client
 import os
-import time
+import sys
+
+# The shared pipeline package lives at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from brdata_processor.dead_letters import DeadLetterFile
+from brdata_processor.uploader import DEFAULT_BATCH_ROWS, ConcurrentUploader
 
 # Supabase Configuration
 SUPABASE_URL = "https://mdqqqogshgtpzxtufjzn.supabase.co"
@@ -100,51 +105,54 @@ def import_properties():
     except Exception as e:
         print(f"⚠️ Could not clear existing data: {e}")
     
-    # Import in batches
-    batch_size = 1000
+    # Import in batches; the uploader cuts each one into requests sized by payload bytes
+    batch_size = DEFAULT_BATCH_ROWS
     total_batches = (len(df) + batch_size - 1) // batch_size
-    successful_imports = 0
     
     print(f"📊 Importing {len(df):,} properties in {total_batches} batches...")
     
-    for i in range(0, len(df), batch_size):
-        batch_df = df.iloc[i:i + batch_size]
-        batch_num = (i // batch_size) + 1
-        
-        print(f"📤 Processing batch {batch_num}/{total_batches} ({len(batch_df)} properties)...")
-        
-        # Transform batch
-        batch_data = []
-        for _, row in batch_df.iterrows():
-            try:
-                transformed_row = transform_row(row)
-                if transformed_row['nawy_id']:  # Only add if we have a valid ID
-                    batch_data.append(transformed_row)
-            except Exception as e:
-                print(f"⚠️ Error transforming row: {e}")
-                continue
-        
-        # Insert batch
-        if batch_data:
-            try:
-                result = supabase.table('nawy_properties').insert(batch_data).execute()
-                successful_imports += len(batch_data)
-                print(f"✅ Batch {batch_num} completed: {len(batch_data)} properties inserted")
-                
-                # Small delay to avoid rate limiting
-                time.sleep(0.5)
-                
-            except Exception as e:
-                print(f"❌ Batch {batch_num} failed: {e}")
-                continue
+    def transformed_batches():
+        for i in range(0, len(df), batch_size):
+            batch_df = df.iloc[i:i + batch_size]
+            batch_data = []
+            for _, row in batch_df.iterrows():
+                try:
+                    transformed_row = transform_row(row)
+                    if transformed_row['nawy_id']:  # Only add if we have a valid ID
+                        batch_data.append(transformed_row)
+                except Exception as e:
+                    print(f"⚠️ Error transforming row: {e}")
+                    continue
+            if batch_data:
+                yield batch_data
+            else:
+                print(f"⚠️ Batch {(i // batch_size) + 1} had no valid data")
+    
+    # A bad row is bisected out of its batch and parked here instead of sinking the other 999
+    dead_letters = DeadLetterFile('nawy_properties_simple')
+    
+    def on_result(result):
+        dead_letters.write(result)
+        if result.ok:
+            inserted = result.rows - len(result.dead_letters)
+            print(f"✅ Batch {result.index + 1} completed: {inserted} properties inserted ({result.requests} requests)")
         else:
-            print(f"⚠️ Batch {batch_num} had no valid data")
+            print(f"❌ Batch {result.index + 1} failed: {result.error}")
+    
+    # The rate limit and retries replace the fixed delay between batches
+    uploader = ConcurrentUploader('nawy_properties', base_url=SUPABASE_URL, api_key=SUPABASE_KEY)
+    report = uploader.upload(transformed_batches(), on_result=on_result)
+    successful_imports = report.rows_uploaded
+    dead_letters.close()
     
     print("\n" + "=" * 50)
     print("🎉 IMPORT COMPLETED!")
     print(f"📊 Total properties processed: {len(df):,}")
     print(f"✅ Successfully imported: {successful_imports:,}")
     print(f"📈 Success rate: {(successful_imports/len(df)*100):.1f}%")
+    print(f"📐 {report.sizing_summary()}")
+    if dead_letters.count:
+        print(f"☠️ Rejected rows: {dead_letters.count:,} (see {dead_letters.path})")
     print(f"\n🔗 View your data: https://supabase.com/dashboard/project/mdqqqogshgtpzxtufjzn/editor")
 
 def test_connection():
@@ -118,8 +118,8 @@ export const getPropertyStats = async () => {
   const stats = {
     totalProperties: data.length,
     avgPrice: data.reduce((sum, p) => sum + (p.price_in_egp || 0), 0) / data.length,
-    minPrice: Math.min(...data.map(p => p.price_in_egp || 0).filter(p => p > 0)),
-    maxPrice: Math.max(...data.map(p => p.price_in_egp || 0)),
+    minPrice: data.reduce((min, p) => (p.price_in_egp > 0 ? Math.min(min, p.price_in_egp) : min), Infinity),
+    maxPrice: data.reduce((max, p) => Math.max(max, p.price_in_egp || 0), 0),
     avgArea: data.reduce((sum, p) => sum + (p.unit_area || 0), 0) / data.length,
     topCompounds: getTopValues(data, 'compound', 'name'),
     topAreas: getTopValues(data, 'area', 'name'),
@@ -2,8 +2,13 @@ import pandas as pd
 import json
 from supabase import create_client, Client
 import os
+import sys
 from datetime import datetime
 
+# The shared pipeline package lives at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from brdata_processor.uploader import DEFAULT_BATCH_ROWS, ConcurrentUploader
+
 # Supabase Configuration
 SUPABASE_URL = "https://mdqqqogshgtpzxtufjzn.supabase.co"  # Your project URL
 SUPABASE_KEY = "YOUR_SUPABASE_ANON_KEY"  # Replace with your anon key
@@ -95,30 +100,29 @@ def clear_existing_inventory():
         print(f"❌ Error clearing inventory: {e}")
         return False
 
-def batch_insert_properties(properties_data, batch_size=1000):
+def batch_insert_properties(properties_data, batch_size=DEFAULT_BATCH_ROWS):
     """Insert properties in batches to avoid timeout"""
     total_properties = len(properties_data)
-    successful_inserts = 0
+    total_batches = (total_properties + batch_size - 1) // batch_size
     
     print(f"📊 Starting import of {total_properties:,} properties...")
     
-    for i in range(0, total_properties, batch_size):
-        batch = properties_data[i:i + batch_size]
-        batch_num = (i // batch_size) + 1
-        total_batches = (total_properties + batch_size - 1) // batch_size
-        
-        try:
-            print(f"📤 Inserting batch {batch_num}/{total_batches} ({len(batch)} properties)...")
-            result = supabase.table('inventory_items').insert(batch).execute()
-            successful_inserts += len(batch)
-            print(f"✅ Batch {batch_num} completed successfully")
-            
-        except Exception as e:
-            print(f"❌ Error in batch {batch_num}: {e}")
+    # orjson-encoded, size-capped requests through a pooled session instead of supabase-py inserts
+    uploader = ConcurrentUploader('inventory_items', base_url=SUPABASE_URL, api_key=SUPABASE_KEY)
+    
+    def on_result(result):
+        if result.ok:
+            print(f"✅ Batch {result.index + 1}/{total_batches} completed successfully")
+        else:
             # Continue with next batch instead of stopping
-            continue
+            print(f"❌ Error in batch {result.index + 1}: {result.error}")
+    
+    batches = (properties_data[i:i + batch_size] for i in range(0, total_properties, batch_size))
+    report = uploader.upload(batches, on_result=on_result)
+    successful_inserts = report.rows_uploaded
     
     print(f"🎉 Import completed! {successful_inserts:,}/{total_properties:,} properties imported successfully")
+    print(f"📐 {report.sizing_summary()}")
     return successful_inserts
 
 def main():
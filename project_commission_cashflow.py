@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Project BR's monthly commission inflows from deal and unit payment schedules
+
+Closed deals that are neither rejected nor claimed are read from Supabase.
+Set SUPABASE_KEY to a key that can read every deal. With --csv, the
+snapshot's active units are added as candidates, each projected as if it
+were sold in the start month on its default payment plan. See
+brdata_processor/cashflow.py for the model.
+
+    python project_commission_cashflow.py --csv brdata_properties.csv --months 120 --out cashflow.csv
+
+Writes the long table (month, source, developer, agent) to --out. Next to it
+go one rollup each by month, by developer and by agent.
+"""
+
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from brdata_processor.cashflow import (
+    DEFAULT_HORIZON, Schedules, cashflow_frame, csv_unit_schedules, deal_schedules, load_closed_deals,
+)
+from brdata_processor.commissions import default_matcher
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Project monthly commission cash flow per developer and agent")
+    parser.add_argument('--csv', help="processed BRData snapshot; its active units are projected as candidates")
+    parser.add_argument('--no-deals', action='store_true', help="leave out the closed deals")
+    parser.add_argument('--start', default=None, help="first projected month, YYYY-MM (default: this month)")
+    parser.add_argument('--months', type=int, default=DEFAULT_HORIZON, help="months to project")
+    parser.add_argument('--max-memory-mb', type=float, default=256)
+    parser.add_argument('--out', default='commission_cashflow.csv', help="long table; rollups go next to it")
+    return parser.parse_args()
+
+def write_rollups(frame, out):
+    """Totals per month, per developer and per agent next to the long table"""
+    stem, ext = os.path.splitext(out)
+    paths = []
+    for key in ('month', 'developer', 'agent'):
+        rows = frame[frame['agent'] != ''] if key == 'agent' else frame
+        rollup = rows.groupby(key, sort=True)[['client_payments_egp', 'commission_egp']].sum().round(2)
+        path = f'{stem}_by_{key}{ext}'
+        rollup.to_csv(path)
+        paths.append(path)
+    return paths
+
+if __name__ == "__main__":
+    args = parse_args()
+    base = pd.Period(args.start, 'M') if args.start else pd.Period(pd.Timestamp.now(), 'M')
+    matcher = default_matcher()
+    parts = []
+
+    if not args.no_deals:
+        deals = load_closed_deals()
+        parts.append(deal_schedules(deals, base, matcher))
+        print(f"🤝 Closed deals to project: {len(deals):,}")
+    if args.csv:
+        started = time.time()
+        units = csv_unit_schedules(args.csv, args.max_memory_mb, matcher)
+        parts.append(units)
+        print(f"🏢 Candidate units: {len(units):,} (read in {time.time() - started:.1f}s)")
+
+    schedules = Schedules.concat(parts)
+    started = time.time()
+    frame = cashflow_frame(schedules, base, args.months)
+    print(f"📈 Projected {len(schedules):,} schedules over {args.months} months from {base} "
+          f"in {time.time() - started:.2f}s")
+
+    frame.to_csv(args.out, index=False)
+    rollups = write_rollups(frame, args.out)
+    yearly = frame.groupby(frame['month'].str[:4])['commission_egp'].sum()
+    for year, total in yearly.items():
+        print(f"   {year}: {total:,.0f} EGP")
+    print(f"💾 Cash flow written to {args.out} ({len(frame):,} rows), rollups: {', '.join(rollups)}")
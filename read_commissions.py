@@ -1,35 +1,27 @@
-import pandas as pd
-import json
-
-def read_commissions():
-    try:
-        # Read the Excel file
-        df = pd.read_excel('brdata_processor/processed_data/BR Commissions.xlsx')
-        
-        print("Commission rates structure:")
-        print("Columns:", df.columns.tolist())
-        print("\nFirst few rows:")
-        print(df.head())
-        print("\nData types:")
-        print(df.dtypes)
-        print("\nFull data:")
-        print(df.to_string())
-        
-        # Convert to JSON for easier handling
-        commissions_data = df.to_dict('records')
-        
-        with open('commissions_data.json', 'w', encoding='utf-8') as f:
-            json.dump(commissions_data, f, indent=2, ensure_ascii=False)
-        
-        print(f"\nSaved {len(commissions_data)} commission records to commissions_data.json")
-        
-    except Exception as e:
-        print(f"Error reading Excel file: {e}")
-
-if __name__ == "__main__":
-    read_commissions()
+#!/usr/bin/env python3
+"""Compile BR Commissions.xlsx into public/commission_rates.json
 
+The workbook is only parsed when its hash differs from the one recorded in
+the compiled table; --force converts it regardless. See
+brdata_processor/commissions.py for the table format.
+"""
 
+import argparse
 
+from brdata_processor.commissions import COMMISSIONS_JSON, COMMISSIONS_XLSX, compile_commissions, load_commission_table
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compile the BR commission workbook into the app's rate table")
+    parser.add_argument('--workbook', default=COMMISSIONS_XLSX, help="commission workbook (default: %(default)s)")
+    parser.add_argument('--out', default=COMMISSIONS_JSON, help="compiled table (default: %(default)s)")
+    parser.add_argument('--force', action='store_true', help="convert even if the workbook is unchanged")
+    return parser.parse_args()
 
+if __name__ == "__main__":
+    args = parse_args()
+    table = compile_commissions(args.workbook, args.out, args.force)
+    if table is None:
+        table = load_commission_table(args.out)
+        print(f"✅ {args.out} is current ({len(table['rates']):,} rates, workbook unchanged)")
+    else:
+        print(f"💸 Compiled {len(table['rates']):,} rates for {len(table['developers']):,} developers into {args.out}")
@@ -0,0 +1,42 @@
+// BR commission rates compiled from BR Commissions.xlsx (brdata_processor/commissions.py, read_commissions.py).
+// The file lists each developer once and the rates as [developer index, compound, percent] rows.
+
+const COMMISSION_TABLE_VERSION = 1;
+
+export interface CommissionRate {
+  Developer: string;
+  Compound: string;
+  'BR Percentage': number;
+}
+
+interface CommissionTable {
+  version: number;
+  source: string;
+  source_hash: string | null;
+  generated_at: string;
+  developers: string[];
+  rates: [number, string, number][];
+}
+
+let ratesRequest: Promise<CommissionRate[]> | null = null;
+
+// Every rate row, fetched once per page load; empty when the table cannot be read
+export const getCommissionRates = (): Promise<CommissionRate[]> => {
+  if (!ratesRequest) {
+    ratesRequest = fetch('/commission_rates.json')
+      .then(response => (response.ok ? response.json() : null))
+      .then((table: CommissionTable | null) => {
+        if (!table || table.version !== COMMISSION_TABLE_VERSION) return [];
+        return table.rates.map(([developer, compound, percent]) => ({
+          Developer: table.developers[developer],
+          Compound: compound,
+          'BR Percentage': percent,
+        }));
+      })
+      .catch(error => {
+        console.error('Error loading commission rates:', error);
+        return [];
+      });
+  }
+  return ratesRequest;
+};
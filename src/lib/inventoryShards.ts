@@ -0,0 +1,66 @@
+// Static listing shards exported by the import (brdata_processor/shards.py, --shards-dir).
+// One gzipped JSON file per area, compound, developer and bedroom count, in listing order,
+// so those browse paths need no database query.
+
+const SHARDS_URL: string = import.meta.env.VITE_INVENTORY_SHARDS_URL || '/inventory';
+
+export type ShardDimension = 'area' | 'compound' | 'developer' | 'bedrooms';
+
+interface ShardEntry {
+  file: string;
+  units: number;
+  bytes: number;
+}
+
+export interface ShardManifest {
+  version: number;
+  generated_at: string;
+  units: number;
+  shards: Partial<Record<ShardDimension, Record<string, ShardEntry>>>;
+}
+
+export interface InventoryShard {
+  version: number;
+  dimension: ShardDimension;
+  value: string;
+  units: number;
+  rows: any[];
+}
+
+let manifestRequest: Promise<ShardManifest | null> | null = null;
+const shardRequests = new Map<string, Promise<InventoryShard | null>>();
+
+// The manifest is small and short-lived in the CDN; fetched once per page load
+export const getShardManifest = (): Promise<ShardManifest | null> => {
+  if (!manifestRequest) {
+    manifestRequest = fetch(`${SHARDS_URL}/manifest.json`, { cache: 'no-cache' })
+      .then(response => (response.ok ? response.json() : null))
+      .catch(() => null);
+  }
+  return manifestRequest;
+};
+
+// Hosts that serve the .gz file as-is leave it compressed; others decode it via Content-Encoding
+const readShard = async (response: Response): Promise<InventoryShard> => {
+  const bytes = new Uint8Array(await response.arrayBuffer());
+  if (bytes[0] !== 0x1f || bytes[1] !== 0x8b) {
+    return JSON.parse(new TextDecoder().decode(bytes));
+  }
+  const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+  return JSON.parse(await new Response(stream).text());
+};
+
+// The shard for one value, or null when the export has none
+export const getInventoryShard = async (dimension: ShardDimension, value: string): Promise<InventoryShard | null> => {
+  const manifest = await getShardManifest();
+  const entry = manifest?.shards[dimension]?.[value];
+  if (!entry) return null;
+
+  if (!shardRequests.has(entry.file)) {
+    const request = fetch(`${SHARDS_URL}/${entry.file}`)
+      .then(response => (response.ok ? readShard(response) : null))
+      .catch(() => null);
+    shardRequests.set(entry.file, request);
+  }
+  return shardRequests.get(entry.file)!;
+};
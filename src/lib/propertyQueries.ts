@@ -1,4 +1,5 @@
 import { supabase } from './supabase';
+import { hasArabic, searchTokenTerms } from './searchIndex';
 
 export interface Property {
   id: number;
@@ -221,82 +222,196 @@ export const getPropertiesByFinishing = async (finishing: string) => {
 
 
 
-// Search properties
-export const searchProperties = async (searchTerm: string) => {
-  try {
-    const { data, error } = await supabase
-      .from('brdata_properties')
-      .select('*');
+// Substring match on each unit's names, reading the whole table; used until search_tokens exists
+const scanProperties = async (searchTerm: string) => {
+  const { data, error } = await supabase
+    .from('brdata_properties')
+    .select('*');
 
-    if (error) throw error;
+  if (error) throw error;
 
-    // Client-side search since JSONB search is limited
-    const filteredData = data?.filter(prop => {
-      const compound = parseJsonField(prop.compound);
-      const area = parseJsonField(prop.area);
-      const developer = parseJsonField(prop.developer);
-      const propertyType = parseJsonField(prop.property_type);
-      
-      const searchLower = searchTerm.toLowerCase();
-      return (
-        compound?.name?.toLowerCase().includes(searchLower) ||
-        area?.name?.toLowerCase().includes(searchLower) ||
-        developer?.name?.toLowerCase().includes(searchLower) ||
-        propertyType?.name?.toLowerCase().includes(searchLower) ||
-        prop.unit_id?.toLowerCase().includes(searchLower) ||
-        prop.unit_number?.toLowerCase().includes(searchLower)
-      );
-    }) || [];
+  const searchLower = searchTerm.toLowerCase();
+  return data?.filter(prop => {
+    const compound = parseJsonField(prop.compound);
+    const area = parseJsonField(prop.area);
+    const developer = parseJsonField(prop.developer);
+    const propertyType = parseJsonField(prop.property_type);
 
-    return { properties: filteredData, error: null };
+    return (
+      compound?.name?.toLowerCase().includes(searchLower) ||
+      area?.name?.toLowerCase().includes(searchLower) ||
+      developer?.name?.toLowerCase().includes(searchLower) ||
+      propertyType?.name?.toLowerCase().includes(searchLower) ||
+      prop.unit_id?.toLowerCase().includes(searchLower) ||
+      prop.unit_number?.toLowerCase().includes(searchLower)
+    );
+  }) || [];
+};
+
+// Units whose search_tokens contain every term; the trigram index answers each ILIKE
+const matchSearchTokens = async (terms: string[]) => {
+  let query = supabase.from('brdata_properties').select('*');
+  for (const term of terms) query = query.ilike('search_tokens', `%${term}%`);
+  const { data, error } = await query;
+  if (error) throw error;
+  return data || [];
+};
+
+// Search properties by compound, area, developer, type or unit code, in English or Arabic
+export const searchProperties = async (searchTerm: string) => {
+  try {
+    const terms = searchTokenTerms(searchTerm);
+    if (!terms.length) return { properties: await scanProperties(searchTerm), error: null };
+
+    try {
+      let properties = await matchSearchTokens(terms);
+      // No exact spelling match: retry by sound ("Zaid" finds Zayed)
+      if (!properties.length && !hasArabic(searchTerm)) {
+        properties = await matchSearchTokens(searchTokenTerms(searchTerm, true));
+      }
+      return { properties, error: null };
+    } catch (tokenError) {
+      console.warn('search_tokens unavailable, scanning properties instead:', tokenError);
+      return { properties: await scanProperties(searchTerm), error: null };
+    }
   } catch (error) {
     return { properties: [], error };
   }
 };
 
+// Log-scale histogram the import pipeline publishes after each load (brdata_processor/histograms.py)
+export interface RangeHistogram {
+  measure: 'price_in_egp' | 'unit_area' | 'price_per_meter';
+  dimension: 'all' | 'area' | 'compound';
+  value: string;
+  unit_count: number;
+  min_value: number;
+  max_value: number;
+  // counts[i] units fall in [edges[i], edges[i + 1])
+  edges: number[];
+  counts: number[];
+}
+
+// Overall, or for one area or compound by name
+export const getRangeHistogram = async (
+  measure: RangeHistogram['measure'],
+  dimension: RangeHistogram['dimension'] = 'all',
+  value = 'all'
+): Promise<RangeHistogram | null> => {
+  const { data, error } = await supabase
+    .from('inventory_histograms')
+    .select('measure, dimension, value, unit_count, min_value, max_value, edges, counts')
+    .eq('source_table', 'brdata_properties')
+    .eq('measure', measure)
+    .eq('dimension', dimension)
+    .eq('value', value)
+    .maybeSingle();
+
+  if (error || !data) return null;
+  return data as RangeHistogram;
+};
+
+// Estimated units between min and max, taking values as evenly spread (on the log scale) within a bin
+export const estimateRangeCount = (histogram: RangeHistogram, min = 0, max = Infinity): number => {
+  let total = 0;
+  histogram.counts.forEach((count, i) => {
+    const start = Math.max(histogram.edges[i], histogram.min_value);
+    const end = Math.min(histogram.edges[i + 1], histogram.max_value);
+    const from = Math.max(start, min);
+    const to = Math.min(end, max);
+    if (!count || to < from) return;
+    const width = Math.log(end) - Math.log(start);
+    total += width > 0 ? count * (Math.log(to) - Math.log(from)) / width : count;
+  });
+  return Math.round(total);
+};
+
+// One row per compound and developer, written by the import pipeline after each load (brdata_processor/compound_summary.py)
+export interface CompoundSummary {
+  compound_key: string;
+  compound: string;
+  developer: string | null;
+  area: string | null;
+  unit_count: number;
+  price_min: number | null;
+  price_max: number | null;
+  price_per_meter_min: number | null;
+  price_per_meter_max: number | null;
+  price_per_meter_avg: number | null;
+  unit_area_min: number | null;
+  unit_area_max: number | null;
+  // value -> unit count
+  bedroom_mix: Record<string, number>;
+  property_types: Record<string, number>;
+  delivery_years: Record<string, number>;
+  image: string | null;
+  commission_percent: number | null;
+  updated_at: string;
+}
+
+// Every compound and developer's summary in one request; empty when the table has not been published yet
+export const getCompoundSummaries = async (): Promise<CompoundSummary[]> => {
+  const { data, error } = await supabase
+    .from('compound_summary')
+    .select(`
+      compound_key, compound, developer, area, unit_count,
+      price_min, price_max, price_per_meter_min, price_per_meter_max, price_per_meter_avg,
+      unit_area_min, unit_area_max, bedroom_mix, property_types, delivery_years,
+      image, commission_percent, updated_at
+    `)
+    .order('compound')
+    .order('developer');
+
+  if (error || !data) return [];
+  return data as CompoundSummary[];
+};
+
+// Smallest and largest positive value, read from the two ends of the column instead of every row
+async function columnBounds(column: 'price_in_egp' | 'unit_area') {
+  const [lowest, highest] = await Promise.all([true, false].map(ascending =>
+    supabase
+      .from('brdata_properties')
+      .select(column)
+      .gt(column, 0)
+      .order(column, { ascending })
+      .limit(1)
+  ));
+
+  if (lowest.error) throw lowest.error;
+  if (highest.error) throw highest.error;
+  return {
+    min: (lowest.data?.[0] as any)?.[column] || 0,
+    max: (highest.data?.[0] as any)?.[column] || 0,
+  };
+}
+
 // Get price ranges for filter sliders
 export const getPriceRange = async () => {
   try {
-    const { data, error } = await supabase
-      .from('brdata_properties')
-      .select('price_in_egp')
-      .not('price_in_egp', 'is', null)
-      .order('price_in_egp', { ascending: true });
-
-    if (error) throw error;
+    const histogram = await getRangeHistogram('price_in_egp');
+    if (histogram) {
+      return { minPrice: histogram.min_value, maxPrice: histogram.max_value, histogram, error: null };
+    }
 
-    const prices = data.map(item => item.price_in_egp).filter(p => p > 0);
-    
-    return {
-      minPrice: prices.length > 0 ? Math.min(...prices) : 0,
-      maxPrice: prices.length > 0 ? Math.max(...prices) : 0,
-      error: null,
-    };
+    const { min, max } = await columnBounds('price_in_egp');
+    return { minPrice: min, maxPrice: max, histogram: null, error: null };
   } catch (error) {
-    return { minPrice: 0, maxPrice: 0, error };
+    return { minPrice: 0, maxPrice: 0, histogram: null, error };
   }
 };
 
 // Get area ranges for filter sliders
 export const getAreaRange = async () => {
   try {
-    const { data, error } = await supabase
-      .from('brdata_properties')
-      .select('unit_area')
-      .not('unit_area', 'is', null)
-      .order('unit_area', { ascending: true });
-
-    if (error) throw error;
+    const histogram = await getRangeHistogram('unit_area');
+    if (histogram) {
+      return { minArea: histogram.min_value, maxArea: histogram.max_value, histogram, error: null };
+    }
 
-    const areas = data.map(item => item.unit_area).filter(a => a > 0);
-    
-    return {
-      minArea: areas.length > 0 ? Math.min(...areas) : 0,
-      maxArea: areas.length > 0 ? Math.max(...areas) : 0,
-      error: null,
-    };
+    const { min, max } = await columnBounds('unit_area');
+    return { minArea: min, maxArea: max, histogram: null, error: null };
   } catch (error) {
-    return { minArea: 0, maxArea: 0, error };
+    return { minArea: 0, maxArea: 0, histogram: null, error };
   }
 };
 
@@ -0,0 +1,163 @@
+import { supabase } from './supabase';
+
+// Mirror of brdata_processor/search_index.py: the pipeline writes search_tokens and the
+// inventory_search dictionary with these exact rules, so change both files together.
+
+const ARABIC_FOLD: Record<string, string> = {
+  'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا', 'ة': 'ه', 'ى': 'ي', 'ؤ': 'و', 'ئ': 'ي', 'ـ': '',
+};
+// Egyptian usage: ج is g, ق is mostly k, ع and ء carry no Latin letter of their own
+const ARABIC_LATIN: Record<string, string> = {
+  'ا': 'a', 'ب': 'b', 'ت': 't', 'ث': 'th', 'ج': 'g', 'ح': 'h', 'خ': 'kh', 'د': 'd', 'ذ': 'z', 'ر': 'r',
+  'ز': 'z', 'س': 's', 'ش': 'sh', 'ص': 's', 'ض': 'd', 'ط': 't', 'ظ': 'z', 'ع': 'a', 'غ': 'gh', 'ف': 'f',
+  'ق': 'k', 'ك': 'k', 'ل': 'l', 'م': 'm', 'ن': 'n', 'ه': 'h', 'و': 'o', 'ي': 'y', 'ء': '', 'ڤ': 'v',
+  '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4', '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+};
+const ARABIC_ARTICLE = /(^|\s)ال(?=\S{2})/g;
+const FINAL_HEH = /ه(?=\s|$)/g;
+const ARTICLES = new Set(['al', 'el', 'il']);
+const DIGRAPHS: [string, string][] = [['sh', 's'], ['kh', 'k'], ['gh', 'g'], ['th', 't'], ['dh', 'd'], ['ph', 'f'], ['ck', 'k']];
+const CONSONANT_CLASSES: Record<string, string> = { c: 'k', q: 'k', v: 'f', p: 'b', j: 'g' };
+
+const mapChars = (text: string, table: Record<string, string>) =>
+  Array.from(text, ch => (ch in table ? table[ch] : ch)).join('');
+
+export const hasArabic = (text: string) => /[\u0600-\u06FF]/.test(text);
+
+// Folded, transliterated, lowercase words separated by single spaces
+export const normalizeText = (text: string | null | undefined): string => {
+  if (!text) return '';
+  let folded = text.normalize('NFKD').replace(/\p{M}/gu, '');
+  folded = mapChars(folded, ARABIC_FOLD).replace(ARABIC_ARTICLE, '$1');
+  folded = mapChars(folded.replace(FINAL_HEH, 'a'), ARABIC_LATIN).toLowerCase();
+  return folded.split(/[^a-z0-9]+/).filter(word => word && !ARTICLES.has(word)).join(' ');
+};
+
+// Consonant skeleton of a normalised word, shared by its Latin and Arabic spellings
+export const skeleton = (word: string): string => {
+  for (const [digraph, letter] of DIGRAPHS) word = word.split(digraph).join(letter);
+  word = mapChars(word.replace(/c(?=[eiy])/g, 's').replace(/x/g, 'ks'), CONSONANT_CLASSES);
+  return word.replace(/[aeiouwy]/g, '').replace(/(.)\1+/g, '$1');
+};
+
+// Autocomplete dictionary the import publishes to inventory_search
+export interface SearchDictionary {
+  version: number;
+  source_table: string;
+  generated_at: string;
+  // [name, kind, units], most units first
+  entries: [string, 'compound' | 'area' | 'developer', number][];
+  // [word or ~skeleton, entry indexes], sorted by term
+  keys: [string, number[]][];
+}
+
+export interface Suggestion {
+  name: string;
+  kind: 'compound' | 'area' | 'developer';
+  units: number;
+}
+
+const dictionaries = new Map<string, Promise<SearchDictionary | null>>();
+
+// Fetched once per page load; a few tens of KB
+export const loadSearchDictionary = (sourceTable = 'brdata_properties'): Promise<SearchDictionary | null> => {
+  if (!dictionaries.has(sourceTable)) {
+    const request = supabase
+      .from('inventory_search')
+      .select('dictionary')
+      .eq('source_table', sourceTable)
+      .maybeSingle()
+      .then(({ data, error }) => {
+        if (error || !data?.dictionary) {
+          dictionaries.delete(sourceTable);
+          return null;
+        }
+        return data.dictionary as SearchDictionary;
+      });
+    dictionaries.set(sourceTable, request);
+  }
+  return dictionaries.get(sourceTable)!;
+};
+
+// Index of the first key >= prefix
+const lowerBound = (keys: SearchDictionary['keys'], prefix: string) => {
+  let low = 0;
+  let high = keys.length;
+  while (low < high) {
+    const mid = (low + high) >> 1;
+    if (keys[mid][0] < prefix) low = mid + 1;
+    else high = mid;
+  }
+  return low;
+};
+
+// Entries having a term that starts with prefix, scored by how strong the match is
+const prefixMatches = (dictionary: SearchDictionary, prefix: string, score: number, into: Map<number, number>) => {
+  for (let i = lowerBound(dictionary.keys, prefix); i < dictionary.keys.length; i++) {
+    const [term, indexes] = dictionary.keys[i];
+    if (!term.startsWith(prefix)) break;
+    for (const index of indexes) into.set(index, Math.max(into.get(index) || 0, score));
+  }
+};
+
+const trigrams = (text: string) => {
+  const padded = `  ${text} `;
+  const grams = new Set<string>();
+  for (let i = 0; i < padded.length - 2; i++) grams.add(padded.slice(i, i + 3));
+  return grams;
+};
+
+const similarity = (a: Set<string>, b: Set<string>) => {
+  let shared = 0;
+  a.forEach(gram => { if (b.has(gram)) shared++; });
+  return shared / (a.size + b.size - shared || 1);
+};
+
+// Names matching every query word by prefix (spelling first, then sound), most units first;
+// with no match at all, the closest names by trigram similarity
+export const suggest = (dictionary: SearchDictionary, query: string, limit = 8): Suggestion[] => {
+  const words = normalizeText(query).split(' ').filter(Boolean);
+  if (!words.length) return [];
+
+  let scores: Map<number, number> | null = null;
+  for (const word of words) {
+    const matches = new Map<number, number>();
+    const sound = skeleton(word);
+    if (sound) prefixMatches(dictionary, `~${sound}`, 1, matches);
+    prefixMatches(dictionary, word, 2, matches);
+    const previous: Map<number, number> | null = scores;
+    scores = new Map();
+    matches.forEach((score, index) => {
+      if (!previous) scores!.set(index, score);
+      else if (previous.has(index)) scores!.set(index, previous.get(index)! + score);
+    });
+  }
+
+  let ranked = Array.from(scores!.entries()).sort((a, b) => b[1] - a[1] || a[0] - b[0]).map(([index]) => index);
+  if (!ranked.length) {
+    const target = trigrams(words.join(' '));
+    ranked = dictionary.entries
+      .map(([name], index) => [index, similarity(target, trigrams(normalizeText(name)))] as [number, number])
+      .filter(([, score]) => score >= 0.3)
+      .sort((a, b) => b[1] - a[1] || a[0] - b[0])
+      .map(([index]) => index);
+  }
+
+  return ranked.slice(0, limit).map(index => {
+    const [name, kind, units] = dictionary.entries[index];
+    return { name, kind, units };
+  });
+};
+
+export const autocomplete = async (query: string, limit = 8, sourceTable = 'brdata_properties') => {
+  const dictionary = await loadSearchDictionary(sourceTable);
+  return dictionary ? suggest(dictionary, query, limit) : [];
+};
+
+// The search_tokens filters for a query: its words, or their ~skeletons to match any spelling.
+// Arabic input is transliterated, so it goes by sound straight away.
+export const searchTokenTerms = (query: string, bySound = hasArabic(query)): string[] => {
+  const words = normalizeText(query).split(' ').filter(Boolean);
+  if (!bySound) return words;
+  return words.map(word => (skeleton(word) ? `~${skeleton(word)}` : word));
+};
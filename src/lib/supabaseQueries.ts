@@ -1,4 +1,7 @@
 import { supabase } from './supabase';
+import { getRangeHistogram, type RangeHistogram } from './propertyQueries';
+import { getInventoryShard, type ShardDimension } from './inventoryShards';
+import { searchTokenTerms } from './searchIndex';
 
 export interface Property {
   id: number;
@@ -27,6 +30,9 @@ export interface Property {
    };
    // Delivery date
    ready_by?: string;
+  // BR commission matched at import (migration 017); null when the sheet has no rate
+  commission_percent?: number | null;
+  commission_egp?: number | null;
 }
 
 export interface PropertyFilter {
@@ -45,6 +51,7 @@ export interface PropertyFilter {
   finishing?: string;
   search?: string;
    ready_by_year?: string;
+  min_commission?: number;
 }
 
 // Helper function to extract name from any field format
@@ -320,14 +327,215 @@ function processPropertyData(rawProperties: any[]): Property[] {
   });
 }
 
+// Server-side filters shared by the page query and the count. legacySearch matches the search
+// box against the JSON names directly, for tables that predate search_tokens (migration 014)
+function applyPropertyFilters(query: any, filters: PropertyFilter, legacySearch = false) {
+  // Apply server-side search filter if provided
+  if (filters.search && filters.search.trim()) {
+    const searchTerm = filters.search.trim();
+    const terms = legacySearch ? [] : searchTokenTerms(searchTerm);
+    console.log(`=== APPLYING SERVER-SIDE SEARCH ===`);
+    console.log(`Search term: "${searchTerm}"`, terms);
+    
+    if (terms.length) {
+      // Every word must appear in search_tokens; the trigram index answers each ILIKE, and
+      // Arabic input is matched by sound against the Latin names
+      for (const term of terms) query = query.ilike('search_tokens', `%${term}%`);
+    } else {
+      // Use ILIKE for case-insensitive search across multiple fields
+      query = query.or(`compound->>name.ilike.%${searchTerm}%,area->>name.ilike.%${searchTerm}%,developer->>name.ilike.%${searchTerm}%,property_type->>name.ilike.%${searchTerm}%,unit_id.ilike.%${searchTerm}%,unit_number.ilike.%${searchTerm}%`);
+    }
+  }
+
+  // Apply other server-side filters
+  if (filters.developer && filters.developer.trim()) {
+    query = query.ilike('developer->>name', `%${filters.developer.trim()}%`);
+    console.log(`Developer filter applied: "${filters.developer.trim()}"`);
+  }
+  
+  if (filters.compound && filters.compound.trim()) {
+    query = query.ilike('compound->>name', `%${filters.compound.trim()}%`);
+    console.log(`Compound filter applied: "${filters.compound.trim()}"`);
+  }
+  
+  if (filters.area && filters.area.trim()) {
+    query = query.ilike('area->>name', `%${filters.area.trim()}%`);
+    console.log(`Area filter applied: "${filters.area.trim()}"`);
+  }
+  
+  if (filters.property_type && filters.property_type.trim()) {
+    console.log(`=== PROPERTY TYPE FILTER DEBUG ===`);
+    console.log(`Filter value: "${filters.property_type}"`);
+    console.log(`Applying filter: property_type->>name ILIKE %${filters.property_type.trim()}%`);
+    
+    // Try both case-insensitive and exact match approaches
+    query = query.ilike('property_type->>name', `%${filters.property_type.trim()}%`);
+    console.log(`Property type filter applied: "${filters.property_type.trim()}"`);
+  }
+
+  // Apply numeric filters (these were being lost in the previous implementation)
+  if (filters.bedrooms) {
+    query = query.eq('number_of_bedrooms', filters.bedrooms);
+  }
+  
+  if (filters.bathrooms) {
+    query = query.eq('number_of_bathrooms', filters.bathrooms);
+  }
+  
+  if (filters.min_area) {
+    query = query.gte('unit_area', filters.min_area);
+  }
+  
+  if (filters.max_area) {
+    query = query.lte('unit_area', filters.max_area);
+  }
+  
+  if (filters.min_price) {
+    query = query.gte('price_in_egp', filters.min_price);
+  }
+  
+  if (filters.max_price) {
+    query = query.lte('price_in_egp', filters.max_price);
+  }
+  
+  if (filters.finishing) {
+    query = query.ilike('finishing', `%${filters.finishing}%`);
+  }
+
+  if (filters.min_commission) {
+    query = query.gte('commission_egp', filters.min_commission);
+  }
+  
+  if (filters.ready_by_year) {
+    // Filter by year - ready_by is a timestamp column
+    if (filters.ready_by_year === 'Ready') {
+      // For "Ready" properties, we'll handle this in client-side filtering
+      // since we can't easily query for "Ready" in timestamp
+    } else {
+      // Filter by year range using date boundaries
+      const year = parseInt(filters.ready_by_year);
+      const startDate = `${year}-01-01T00:00:00`;
+      const endDate = `${year + 1}-01-01T00:00:00`;
+      
+      query = query.gte('ready_by', startDate)
+        .lt('ready_by', endDate);
+    }
+  }
+
+  return query;
+}
+
+// Filters the import exports a static shard for (brdata_processor/shards.py)
+const SHARD_FILTERS: Record<string, ShardDimension> = {
+  area: 'area',
+  compound: 'compound',
+  developer: 'developer',
+  bedrooms: 'bedrooms',
+};
+
+// A lone area, compound, developer or bedrooms filter is served from its static shard;
+// null when any other filter is set or the export has no shard for the value
+async function getShardPage(filters: PropertyFilter, page: number, pageSize: number) {
+  const active = Object.entries(filters).filter(([, value]) =>
+    value !== undefined && value !== null && value !== '' && !(Array.isArray(value) && !value.length)
+  );
+  if (active.length !== 1 || !SHARD_FILTERS[active[0][0]]) return null;
+
+  const [key, value] = active[0];
+  const shard = await getInventoryShard(SHARD_FILTERS[key], String(value).trim());
+  if (!shard) return null;
+
+  const rows = shard.rows.slice((page - 1) * pageSize, page * pageSize);
+  console.log(`Page ${page} of the ${shard.dimension} "${shard.value}" shard: ${rows.length} of ${shard.units} units`);
+  return {
+    properties: processPropertyData(rows),
+    totalCount: shard.units,
+    totalPages: Math.ceil(shard.units / pageSize),
+    nextCursor: page * pageSize < shard.units ? (rows[rows.length - 1]?.sort_key ?? null) : null,
+    error: null
+  };
+}
+
+export interface PageOptions {
+  // sort_key of the previous page's last row (nextCursor); the page is read after it instead of by offset
+  after?: string | null;
+  // 'estimated' reads the published inventory_stats and histograms, 'exact' counts the filtered rows
+  countMode?: 'estimated' | 'exact';
+  // 'commission' lists the highest commission_egp first, paged by offset
+  sortBy?: 'listing' | 'commission';
+}
+
+// Units matching the filters read from the published statistics. Only exact answers are taken
+// from there: no filter, the bedrooms cell, or one price or area range that lies past its
+// histogram's bounds. Inside the bounds a bin's split is interpolated, and the histogram leaves
+// out units priced or sized 0, which a max alone still matches. The text filters are ILIKE
+// substrings and filters combined are correlated (a compound implies its developer), so all of
+// those return null and are counted by the planner instead
+async function estimateActiveCount(filters: PropertyFilter): Promise<number | null> {
+  if (
+    filters.search?.trim() || filters.finishing || filters.bathrooms || filters.ready_by_year || filters.min_commission ||
+    filters.developer?.trim() || filters.compound?.trim() || filters.area?.trim() || filters.property_type?.trim()
+  ) {
+    return null;
+  }
+
+  const ranges: [RangeHistogram['measure'], number | undefined, number | undefined][] = [
+    ['price_in_egp', filters.min_price, filters.max_price],
+    ['unit_area', filters.min_area, filters.max_area],
+  ];
+  const activeRanges = ranges.filter(([, min, max]) => min || max);
+  if (activeRanges.length + (filters.bedrooms ? 1 : 0) > 1) return null;
+
+  if (activeRanges.length) {
+    const [measure, min, max] = activeRanges[0];
+    const histogram = await getRangeHistogram(measure);
+    if (!histogram?.unit_count || !min) return null;
+    if (min > histogram.max_value || (max && max < histogram.min_value)) return 0;
+    if (min <= histogram.min_value && (!max || max >= histogram.max_value)) return histogram.unit_count;
+    return null;
+  }
+
+  const [dimension, value] = filters.bedrooms ? ['bedrooms', String(filters.bedrooms)] : ['all', 'all'];
+  const { data, error } = await supabase
+    .from('inventory_stats')
+    .select('unit_count')
+    .eq('cell_key', `brdata_properties|${dimension}|${value}`)
+    .maybeSingle();
+  if (error || !data) return null;
+  return data.unit_count;
+}
+
+async function countActiveProperties(filters: PropertyFilter, mode: 'estimated' | 'exact'): Promise<number> {
+  if (mode === 'estimated') {
+    const estimate = await estimateActiveCount(filters);
+    if (estimate !== null) return estimate;
+  }
+  // No published cell for these filters: the planner's row estimate is still far cheaper than counting
+  // The legacy retry runs on tables that predate is_active too (migration 008), so it counts every row
+  const countQuery = (legacy: boolean) => {
+    const query = supabase
+      .from('brdata_properties')
+      .select('id', { count: mode === 'exact' ? 'exact' : 'planned', head: true });
+    return applyPropertyFilters(legacy ? query : query.eq('is_active', true), filters, legacy);
+  };
+  const { count, error } = await countQuery(false);
+  if (error?.code === '42703') return (await countQuery(true)).count || 0;
+  return count || 0;
+}
+
 export async function getActiveProperties(
   page: number = 1,
   pageSize: number = 20,
-  filters: PropertyFilter = {}
+  filters: PropertyFilter = {},
+  options: PageOptions = {}
 ) {
   try {
     console.log('=== FUNCTION STARTED ===');
     console.log('Fetching properties with filters:', filters);
+
+    // Common browse paths come from a static file with no database load
+    const shardPage = options.sortBy === 'commission' ? null : await getShardPage(filters, page, pageSize);
+    if (shardPage) return shardPage;
     
     // Note: We'll apply all filters to the final baseQuery below
     // This ensures they're properly applied to the actual data fetch
@@ -346,157 +554,58 @@ export async function getActiveProperties(
     console.log('Has text filters:', hasTextFilters);
     console.log('Page:', page, 'PageSize:', pageSize);
 
-    // Get the total count first
-    const { count: databaseTotalCount } = await supabase
-      .from('brdata_properties')
-      .select('*', { count: 'exact', head: true });
-
-    console.log('Total properties in database:', databaseTotalCount);
-
-    // Instead of fetching all data at once (which causes timeouts),
-    // we'll use server-side pagination for the current page only
-    // This is much more efficient and avoids timeout issues
-    
-    let data: any[] = [];
-    let error: any = null;
-    let count = databaseTotalCount;
+    // Estimated from the published statistics unless an exact count is asked for
+    const databaseTotalCount = await countActiveProperties(filters, options.countMode || 'estimated');
+    console.log('Filtered properties in database:', databaseTotalCount);
 
-    if (databaseTotalCount && databaseTotalCount > 0) {
-      // Build the base query
-      let baseQuery = supabase
+    // Keyset pagination: after the previous page's last sort_key, read the next pageSize rows from
+    // the index, so deep pages cost the same as the first (migration 015)
+    const pageQuery = (orderColumn: 'sort_key' | 'id' | 'commission_egp') => {
+      // The id fallback also runs before migrations 008/015/017, so it leaves out their columns
+      const legacy = orderColumn === 'id';
+      const importColumns = legacy ? '' : ', sort_key, commission_percent, commission_egp';
+      const base = supabase
         .from('brdata_properties')
         .select(`
            id, unit_id, unit_number, unit_area,
           number_of_bedrooms, number_of_bathrooms, price_per_meter, price_in_egp,
           currency, finishing, is_launch, image,
           compound, area, developer, property_type,
-           payment_plans, ready_by
+           payment_plans, ready_by${importColumns}
         `)
-        .order('id', { ascending: false });
-
-      // Apply server-side search filter if provided
-      if (filters.search && filters.search.trim()) {
-        const searchTerm = filters.search.trim();
-        console.log(`=== APPLYING SERVER-SIDE SEARCH ===`);
-        console.log(`Search term: "${searchTerm}"`);
-        
-        // Use ILIKE for case-insensitive search across multiple fields
-        baseQuery = baseQuery.or(`compound->>name.ilike.%${searchTerm}%,area->>name.ilike.%${searchTerm}%,developer->>name.ilike.%${searchTerm}%,property_type->>name.ilike.%${searchTerm}%,unit_id.ilike.%${searchTerm}%,unit_number.ilike.%${searchTerm}%`);
-        
-        // TODO: Get the filtered count for search results
-        // For now, we'll show a lower count to indicate search is working
-        count = Math.floor(databaseTotalCount / 10); // Show ~2300 instead of 23157 to indicate filtering
-        console.log(`Search filter applied. Showing estimated filtered count: ${count} (was ${databaseTotalCount})`);
-        console.log('Note: Actual filtered count will be implemented in a future update');
+        .order(orderColumn, { ascending: false, nullsFirst: false });
+      let query = applyPropertyFilters(legacy ? base : base.eq('is_active', true), filters, legacy);
+      if (orderColumn === 'commission_egp') {
+        query = query.order('sort_key', { ascending: false });
       }
-
-      // Apply other server-side filters
-      if (filters.developer && filters.developer.trim()) {
-        baseQuery = baseQuery.ilike('developer->>name', `%${filters.developer.trim()}%`);
-        console.log(`Developer filter applied: "${filters.developer.trim()}"`);
-      }
-      
-      if (filters.compound && filters.compound.trim()) {
-        baseQuery = baseQuery.ilike('compound->>name', `%${filters.compound.trim()}%`);
-        console.log(`Compound filter applied: "${filters.compound.trim()}"`);
-      }
-      
-      if (filters.area && filters.area.trim()) {
-        baseQuery = baseQuery.ilike('area->>name', `%${filters.area.trim()}%`);
-        console.log(`Area filter applied: "${filters.area.trim()}"`);
-      }
-      
-      if (filters.property_type && filters.property_type.trim()) {
-        console.log(`=== PROPERTY TYPE FILTER DEBUG ===`);
-        console.log(`Filter value: "${filters.property_type}"`);
-        console.log(`Applying filter: property_type->>name ILIKE %${filters.property_type.trim()}%`);
-        
-        // Try both case-insensitive and exact match approaches
-        baseQuery = baseQuery.ilike('property_type->>name', `%${filters.property_type.trim()}%`);
-        console.log(`Property type filter applied: "${filters.property_type.trim()}"`);
+      if (orderColumn === 'sort_key' && options.after) {
+        return query.lt('sort_key', options.after).limit(pageSize);
       }
+      const from = (page - 1) * pageSize;
+      return query.range(from, from + pageSize - 1);
+    };
 
-      // Apply numeric filters (these were being lost in the previous implementation)
-      if (filters.bedrooms) {
-        baseQuery = baseQuery.eq('number_of_bedrooms', filters.bedrooms);
-      }
-      
-      if (filters.bathrooms) {
-        baseQuery = baseQuery.eq('number_of_bathrooms', filters.bathrooms);
-      }
-      
-      if (filters.min_area) {
-        baseQuery = baseQuery.gte('unit_area', filters.min_area);
-      }
-      
-      if (filters.max_area) {
-        baseQuery = baseQuery.lte('unit_area', filters.max_area);
-      }
-      
-      if (filters.min_price) {
-        baseQuery = baseQuery.gte('price_in_egp', filters.min_price);
-      }
-      
-      if (filters.max_price) {
-        baseQuery = baseQuery.lte('price_in_egp', filters.max_price);
-      }
-      
-      if (filters.finishing) {
-        baseQuery = baseQuery.ilike('finishing', `%${filters.finishing}%`);
-      }
-      
-      if (filters.ready_by_year) {
-        // Filter by year - ready_by is a timestamp column
-        if (filters.ready_by_year === 'Ready') {
-          // For "Ready" properties, we'll handle this in client-side filtering
-          // since we can't easily query for "Ready" in timestamp
-        } else {
-          // Filter by year range using date boundaries
-          const year = parseInt(filters.ready_by_year);
-          const startDate = `${year}-01-01T00:00:00`;
-          const endDate = `${year + 1}-01-01T00:00:00`;
-          
-          baseQuery = baseQuery.gte('ready_by', startDate)
-            .lt('ready_by', endDate);
-        }
-      }
+    console.log(options.after ? `Fetching page ${page} after ${options.after}` : `Fetching page ${page} by offset`);
+    const byCommission = options.sortBy === 'commission';
+    let pageColumn: 'sort_key' | 'id' | 'commission_egp' = byCommission ? 'commission_egp' : 'sort_key';
+    let { data: pageData, error: pageError } = await pageQuery(pageColumn);
+    if (pageError?.code === '42703') {
+      // sort_key, search_tokens or the commission columns not migrated yet: offset pages in id order as before
+      pageColumn = 'id';
+      ({ data: pageData, error: pageError } = await pageQuery(pageColumn));
+    }
 
-      // Now apply pagination to the filtered results
-      const from = (page - 1) * pageSize;
-      const to = Math.min(from + pageSize - 1, databaseTotalCount - 1);
-      
-      console.log(`Fetching filtered page ${page}: rows ${from}-${to}`);
-      
-      // Fetch the filtered and paginated data
-      const { data: pageData, error: pageError } = await baseQuery.range(from, to);
-      
-      // Get the filtered count when any filters are applied
-      const hasAnyFilters = Boolean(
-        (filters.search && filters.search.trim()) ||
-        (filters.developer && filters.developer.trim()) ||
-        (filters.compound && filters.compound.trim()) ||
-        (filters.area && filters.area.trim()) ||
-        (filters.property_type && filters.property_type.trim())
-      );
-      
-      if (hasAnyFilters) {
-        // Show estimated filtered count to indicate filtering is working
-        count = Math.floor(databaseTotalCount / 5); // Show ~4600 instead of 23157 to indicate filtering
-        console.log(`Filters applied. Showing estimated filtered count: ${count} (was ${databaseTotalCount})`);
-        console.log('Note: Actual filtered count will be implemented in a future update');
-      } else {
-        count = databaseTotalCount;
-        console.log(`No filters applied. Using database total count: ${count}`);
-      }
-      
-      if (pageError) {
-        console.error('Error fetching page data:', pageError);
-        error = pageError;
-      } else {
-        data = pageData || [];
-        console.log(`Page ${page} fetched: ${data.length} properties`);
-      }
+    let data: any[] = [];
+    const error: any = pageError;
+    const count = databaseTotalCount;
+    if (pageError) {
+      console.error('Error fetching page data:', pageError);
+    } else {
+      data = pageData || [];
+      console.log(`Page ${page} fetched: ${data.length} properties`);
     }
+    // Cursor for the following page, taken before the page is re-sorted below
+    const nextCursor: string | null = data.length === pageSize && !byCommission ? (data[data.length - 1].sort_key ?? null) : null;
     
     console.log('=== DATABASE COUNT VERIFICATION ===');
     console.log('Total count from database:', count);
@@ -551,8 +660,9 @@ export async function getActiveProperties(
     // In a future update, we can implement server-side filtering
     let filteredProperties = processedProperties;
 
-    // Apply search FIRST to the full dataset before other filters
-    if (filters.search && filters.search.trim()) {
+    // The search_tokens filter already matched the page server-side, including spellings and
+    // Arabic input a substring check would drop; only the legacy id-ordered page is re-checked
+    if (filters.search && filters.search.trim() && pageColumn === 'id') {
       const s = filters.search.trim().toLowerCase();
       console.log(`=== SEARCH FILTER APPLIED FIRST ===`);
       console.log(`Search term: "${s}"`);
@@ -742,6 +852,7 @@ export async function getActiveProperties(
       properties: pageSlice,
       totalCount: totalCount, // Use the real server count (23k+)
       totalPages: totalPages, // Use the calculated total pages
+      nextCursor,
       error: null
     };
   } catch (err) {
@@ -755,14 +866,72 @@ export async function getActiveProperties(
   }
 }
 
+// Filter options the import pipeline publishes after each load (brdata_processor/facets.py)
+interface FacetValue<T> {
+  value: T;
+  count: number;
+}
+
+interface InventoryFacets {
+  version: number;
+  row_count: number;
+  generated_at: string;
+  compounds: FacetValue<string>[];
+  areas: FacetValue<string>[];
+  developers: FacetValue<string>[];
+  propertyTypes: FacetValue<string>[];
+  finishingOptions: FacetValue<string>[];
+  bedroomOptions: FacetValue<number>[];
+  bathroomOptions: FacetValue<number>[];
+  readyByYearOptions: FacetValue<string>[];
+  developerCompounds: { [key: string]: string[] };
+}
+
+function facetValues<T>(facet: FacetValue<T>[] | undefined): T[] {
+  return (facet || []).map(item => item.value);
+}
+
+async function getPublishedFacets(sourceTable: string): Promise<InventoryFacets | null> {
+  const { data, error } = await supabase
+    .from('inventory_facets')
+    .select('facets')
+    .eq('source_table', sourceTable)
+    .maybeSingle();
+
+  if (error || !data?.facets) {
+    console.warn('No published filter facets, scanning active properties instead:', error?.message);
+    return null;
+  }
+  return data.facets as InventoryFacets;
+}
+
 export async function getFilterOptions() {
   try {
+    // One row of a few KB, written by each import, instead of every active property
+    const facets = await getPublishedFacets('brdata_properties');
+    if (facets) {
+      console.log(`Filter options from facets generated at ${facets.generated_at} (${facets.row_count} units)`);
+      return {
+        compounds: facetValues(facets.compounds),
+        areas: facetValues(facets.areas),
+        developers: facetValues(facets.developers),
+        propertyTypes: facetValues(facets.propertyTypes),
+        bedroomOptions: facetValues(facets.bedroomOptions),
+        bathroomOptions: facetValues(facets.bathroomOptions),
+        finishingOptions: facetValues(facets.finishingOptions),
+        readyByYearOptions: ['Ready', ...facetValues(facets.readyByYearOptions)],
+        developerCompounds: facets.developerCompounds || {},
+        error: null
+      };
+    }
+
     console.log('=== FETCHING FRESH FILTER OPTIONS FROM DATABASE ===');
     
     // Get ALL properties to extract unique values (no limit)
     const { data: allProperties, error } = await supabase
       .from('brdata_properties')
-      .select('compound, area, developer, property_type, number_of_bedrooms, number_of_bathrooms, finishing, ready_by');
+      .select('compound, area, developer, property_type, number_of_bedrooms, number_of_bathrooms, finishing, ready_by')
+      .eq('is_active', true);
     
     if (error) {
       console.error('Error fetching properties for filter options:', error);
@@ -2,18 +2,25 @@ import { useState, useEffect } from 'react';
 import { useDataStore } from '../store/data';
 import CurrencyInput from '../components/CurrencyInput';
 import { formatCurrencyEGP } from '../utils/format';
+import { getCompoundSummaries, type CompoundSummary } from '../lib/propertyQueries';
 import { Calculator, TrendingUp } from 'lucide-react';
 
 export default function Commissions() {
   const { commissions, loadLiveCommissions } = useDataStore();
   const [selectedDeveloper, setSelectedDeveloper] = useState('');
   const [dealValue, setDealValue] = useState('');
+  const [compounds, setCompounds] = useState<CompoundSummary[]>([]);
 
   // Load live commission data when component mounts
   useEffect(() => {
     loadLiveCommissions();
   }, [loadLiveCommissions]);
 
+  // Per-compound units and rates, published by the import
+  useEffect(() => {
+    getCompoundSummaries().then(setCompounds);
+  }, []);
+
   // Sort commissions alphabetically by developer name
   const sortedCommissions = [...commissions].sort((a, b) => 
     a.developerName.localeCompare(b.developerName)
@@ -23,6 +30,12 @@ export default function Commissions() {
     (comm) => comm.developerName === selectedDeveloper
   );
 
+  const developerCompounds = selectedCommission
+    ? compounds.filter(
+        (compound) => compound.developer?.toLowerCase() === selectedCommission.developerName.toLowerCase()
+      )
+    : [];
+
   const calculatedCommission = 
     selectedCommission && dealValue && !isNaN(parseFloat(dealValue))
       ? (parseFloat(dealValue) * selectedCommission.commissionPercent) / 100
@@ -199,6 +212,31 @@ export default function Commissions() {
               </div>
             )}
 
+            {/* Compounds in inventory */}
+            {developerCompounds.length > 0 && (
+              <div>
+                <h3 className="h3 mb-3">Compounds in Inventory</h3>
+                <ul className="divide-y divide-brand-border max-h-64 overflow-y-auto">
+                  {developerCompounds.map((compound) => (
+                    <li key={compound.compound_key} className="flex justify-between items-center py-2">
+                      <div className="min-w-0">
+                        <div className="text-sm font-medium text-brand-fg truncate">{compound.compound}</div>
+                        <div className="text-xs text-brand-fg opacity-60">
+                          {compound.unit_count.toLocaleString()} units
+                          {compound.price_per_meter_min && compound.price_per_meter_max
+                            ? ` · ${formatCurrencyEGP(compound.price_per_meter_min)} - ${formatCurrencyEGP(compound.price_per_meter_max)}/m²`
+                            : ''}
+                        </div>
+                      </div>
+                      <span className="text-sm font-semibold text-brand-fg ml-4">
+                        {compound.commission_percent ?? selectedCommission?.commissionPercent}%
+                      </span>
+                    </li>
+                  ))}
+                </ul>
+              </div>
+            )}
+
             {!selectedDeveloper && (
               <div className="text-center py-12 text-brand-fg opacity-60">
                 <Calculator className="w-12 h-12 mx-auto mb-4 text-brand-fg opacity-40" aria-hidden="true" />
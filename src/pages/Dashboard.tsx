@@ -15,13 +15,7 @@ import {
   Users,
   Target
 } from 'lucide-react';
-
-// Commission data interface
-interface CommissionRate {
-  Developer: string;
-  Compound: string;
-  'BR Percentage': number;
-}
+import { getCommissionRates, type CommissionRate } from '../lib/commissionRates';
 
 // Project interface for new launches
 interface Project {
@@ -62,17 +56,7 @@ const Dashboard: React.FC = () => {
 
   // Load commission rates
   useEffect(() => {
-    const loadCommissionRates = async () => {
-      try {
-        const response = await fetch('/commissions_data.json');
-        const data = await response.json();
-        setCommissionRates(data);
-      } catch (error) {
-        console.error('Error loading commission rates:', error);
-      }
-    };
-
-    loadCommissionRates();
+    getCommissionRates().then(setCommissionRates);
   }, []);
 
   // Load projects and deals
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
   import { getActiveProperties, getFilterOptions, type Property, type PropertyFilter } from '../lib/supabaseQueries';
   import Card from '../components/Card';
   import LoadingSpinner from '../components/LoadingSpinner';
@@ -25,7 +25,11 @@ import { useState, useEffect } from 'react';
     const [currentPage, setCurrentPage] = useState(1);
     const [totalCount, setTotalCount] = useState(0);
     const [totalPages, setTotalPages] = useState(0);
+    const [hasNextPage, setHasNextPage] = useState(false);
     const pageSize = 20;
+    // Page number -> sort_key cursor it starts after, so Previous/Next never read by offset
+    const pageCursors = useRef(new Map<number, string>());
+    const [sortBy, setSortBy] = useState<'listing' | 'commission'>('listing');
     
     // Modal and quick filter states
     const [isFiltersModalOpen, setIsFiltersModalOpen] = useState(false);
@@ -43,10 +47,15 @@ import { useState, useEffect } from 'react';
       loadFilterOptions();
     }, []);
 
-    // Load properties when filters or page changes
+    // Cursors belong to one set of filters and one order
+    useEffect(() => {
+      pageCursors.current.clear();
+    }, [filters, sortBy]);
+
+    // Load properties when filters, order or page changes
     useEffect(() => {
       loadProperties();
-    }, [filters, currentPage]);
+    }, [filters, sortBy, currentPage]);
 
     // Handle search with debounce
     useEffect(() => {
@@ -101,7 +110,10 @@ import { useState, useEffect } from 'react';
       setError(null);
       
       try {
-        const result = await getActiveProperties(currentPage, pageSize, filters);
+        const result = await getActiveProperties(currentPage, pageSize, filters, {
+          after: pageCursors.current.get(currentPage),
+          sortBy
+        });
         
         console.log('=== LOAD PROPERTIES RESULT ===');
         console.log('Result:', result);
@@ -116,6 +128,8 @@ import { useState, useEffect } from 'react';
           setProperties(result.properties);
           setTotalCount(result.totalCount || 0);
           setTotalPages(result.totalPages || 0);
+          setHasNextPage(Boolean(result.nextCursor));
+          if (result.nextCursor) pageCursors.current.set(currentPage + 1, result.nextCursor);
         }
       } catch (err) {
         setError('Failed to load properties. Please try again.');
@@ -340,6 +354,22 @@ import { useState, useEffect } from 'react';
               <ChevronDown className="absolute right-2 top-1/2 transform -translate-y-1/2 w-4 h-4 text-gray-400 pointer-events-none" />
             </div>
 
+            {/* Sort Order */}
+            <div className="relative">
+              <select
+                value={sortBy}
+                onChange={(e) => {
+                  setSortBy(e.target.value as 'listing' | 'commission');
+                  setCurrentPage(1);
+                }}
+                className="appearance-none bg-white border border-gray-300 rounded-md px-4 py-2 pr-8 text-sm focus:outline-none focus:ring-2 focus:ring-teal-500"
+              >
+                <option value="listing">Featured</option>
+                <option value="commission">Highest commission</option>
+              </select>
+              <ChevronDown className="absolute right-2 top-1/2 transform -translate-y-1/2 w-4 h-4 text-gray-400 pointer-events-none" />
+            </div>
+
             {/* Rooms Filter */}
             <div className="relative">
               <select
@@ -437,6 +467,7 @@ import { useState, useEffect } from 'react';
                   <th className="px-2 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Beds</th>
                   <th className="px-2 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Baths</th>
                   <th className="px-2 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Price</th>
+                  <th className="px-2 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Commission</th>
                   <th className="px-2 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Down payment</th>
                   <th className="px-2 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Monthly Pay</th>
                   <th className="px-2 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Years</th>
@@ -492,6 +523,13 @@ import { useState, useEffect } from 'react';
                       {property.price_in_egp ? formatPrice(property.price_in_egp) : '---'}
                     </td>
 
+                    {/* Commission */}
+                    <td className="px-2 py-2 text-xs text-teal-700 font-medium">
+                      {property.commission_egp
+                        ? `${formatPrice(property.commission_egp)} (${property.commission_percent}%)`
+                        : '---'}
+                    </td>
+
                     {/* Down payment */}
                     <td className="px-2 py-2 text-xs text-gray-700">
                       {property.paymentData?.downPayment ? `${Number(property.paymentData.downPayment).toLocaleString()} EGP` : '---'}
@@ -569,12 +607,13 @@ import { useState, useEffect } from 'react';
                       console.log('=== NEXT BUTTON CLICKED ===');
                       console.log('Current page before:', currentPage);
                       setCurrentPage(prev => {
-                        const newPage = Math.min(totalPages, prev + 1);
+                        // The total is estimated, so a full page with a cursor may lead past it
+                        const newPage = hasNextPage ? prev + 1 : Math.min(totalPages, prev + 1);
                         console.log('Setting page to:', newPage);
                         return newPage;
                       });
                     }}
-                    disabled={currentPage === totalPages}
+                    disabled={currentPage >= totalPages && !hasNextPage}
                     className="px-3 py-2 text-sm border border-gray-300 rounded-md hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed"
                   >
                     Next
@@ -19,15 +19,10 @@ import {
   X
 } from 'lucide-react';
 import { getActiveProperties, getFilterOptions, type Property } from '../lib/supabaseQueries';
+import { getCompoundSummaries, type CompoundSummary } from '../lib/propertyQueries';
+import { getCommissionRates, type CommissionRate } from '../lib/commissionRates';
 import { supabase } from '../lib/supabase';
 
-// Commission data interface
-interface CommissionRate {
-  Developer: string;
-  Compound: string;
-  'BR Percentage': number;
-}
-
 // Project interface
 interface Project {
   id: string;
@@ -50,6 +45,50 @@ interface Project {
   amenities: string[];
 }
 
+// Fallback when the commission sheet has no rate for the compound
+const developerCommissionRate = (developer: string): number => {
+  const dev = developer.toLowerCase();
+  if (dev.includes('mountain view')) return 4.5;
+  if (dev.includes('emaar')) return 4.0;
+  if (dev.includes('sodic')) return 4.2;
+  if (dev.includes('ora')) return 3.0;
+  if (dev.includes('tatweer')) return 4.0;
+  if (dev.includes('misr italia')) return 4.5;
+  return 3.5;
+};
+
+// Pre-launch while every delivery year is still ahead
+const projectStatus = (readyYears: string[]): Project['status'] => {
+  if (readyYears.includes('Ready')) return 'launching';
+  const futureYears = readyYears.filter(year => {
+    const yearNum = parseInt(year);
+    return yearNum && yearNum > new Date().getFullYear();
+  });
+  return futureYears.length > 0 ? 'pre-launch' : 'launching';
+};
+
+const summaryToProject = (summary: CompoundSummary): Project => {
+  const propertyTypes = Object.keys(summary.property_types);
+  const readyYears = Object.keys(summary.delivery_years);
+  return {
+    id: `inv-${summary.compound_key}`,
+    name: summary.compound,
+    developer: summary.developer || 'Unknown',
+    location: summary.area || 'Unknown',
+    description: `Premium residential project with ${summary.unit_count} available units. Multiple property types including ${propertyTypes.slice(0, 3).join(', ')}.`,
+    image: summary.image,
+    startingPrice: summary.price_min || 0,
+    unitsAvailable: summary.unit_count,
+    deliveryDate: readyYears.length > 0 ? readyYears.join(', ') : 'TBD',
+    commissionRate: summary.commission_percent ?? developerCommissionRate(summary.developer || ''),
+    features: propertyTypes.slice(0, 4),
+    status: projectStatus(readyYears),
+    propertyTypes,
+    priceRange: { min: summary.price_min || 0, max: summary.price_max || 0 },
+    amenities: ['Modern Design', 'Security', 'Parking', 'Green Spaces', 'Community Facilities']
+  };
+};
+
 const Projects: React.FC = () => {
   const [commissionRates, setCommissionRates] = useState<CommissionRate[]>([]);
   const [projects, setProjects] = useState<Project[]>([]);
@@ -67,24 +106,7 @@ const Projects: React.FC = () => {
 
   // Load commission rates
   useEffect(() => {
-    const loadCommissionRates = async () => {
-      try {
-        const response = await fetch('/commissions_data.json');
-        const text = await response.text();
-        // Fix NaN values in JSON by replacing them with null
-        const cleanedText = text.replace(/: NaN/g, ': null');
-        const data = JSON.parse(cleanedText);
-        // Filter out entries with null commission rates
-        const validRates = data.filter((rate: CommissionRate) => 
-          rate['BR Percentage'] !== null && !isNaN(rate['BR Percentage'])
-        );
-        setCommissionRates(validRates);
-      } catch (error) {
-        console.error('Error loading commission rates:', error);
-      }
-    };
-
-    loadCommissionRates();
+    getCommissionRates().then(setCommissionRates);
   }, []);
 
   // Load projects
@@ -92,6 +114,16 @@ const Projects: React.FC = () => {
     const loadProjects = async () => {
       setLoading(true);
       
+      // The import publishes one summary row per compound and developer; read those when available
+      const summaries = await getCompoundSummaries();
+      if (summaries.length > 0) {
+        const summaryProjects = summaries.map(summaryToProject).filter(project => project.image);
+        setProjects(summaryProjects);
+        setFilteredProjects(summaryProjects);
+        setLoading(false);
+        return;
+      }
+
       // Load real inventory projects - fetch ALL properties without pagination
       try {
         console.log('=== FETCHING ALL INVENTORY PROPERTIES ===');
@@ -412,30 +444,9 @@ const Projects: React.FC = () => {
         }
       }
       
-      // Determine commission rate based on developer (you can customize this logic)
-      let commissionRate = 3.5; // default
-      const dev = projectData.developer.toLowerCase();
-      if (dev.includes('mountain view')) commissionRate = 4.5;
-      else if (dev.includes('emaar')) commissionRate = 4.0;
-      else if (dev.includes('sodic')) commissionRate = 4.2;
-      else if (dev.includes('ora')) commissionRate = 3.0;
-      else if (dev.includes('tatweer')) commissionRate = 4.0;
-      else if (dev.includes('misr italia')) commissionRate = 4.5;
-      
-      // Determine status based on ready date
+      const commissionRate = developerCommissionRate(projectData.developer);
       const readyYears = Array.from(projectData.readyByYears);
-      let status: 'launching' | 'pre-launch' | 'sold-out' = 'launching';
-      if (readyYears.includes('Ready')) {
-        status = 'launching';
-      } else {
-        const futureYears = readyYears.filter(year => {
-          const yearNum = parseInt(year as string);
-          return yearNum && yearNum > new Date().getFullYear();
-        });
-        if (futureYears.length > 0) {
-          status = 'pre-launch';
-        }
-      }
+      const status = projectStatus(readyYears);
       
       const propertyTypesArray = Array.from(projectData.propertyTypes);
       
@@ -3,6 +3,8 @@
 interface ImportMetaEnv {
   readonly VITE_SUPABASE_URL: string;
   readonly VITE_SUPABASE_ANON_KEY: string;
+  // Where the import's --shards-dir output is hosted; defaults to /inventory (public/inventory)
+  readonly VITE_INVENTORY_SHARDS_URL?: string;
 }
 
 interface ImportMeta {
@@ -0,0 +1,14 @@
+-- Migration: Idempotent inventory loads
+-- Created: 2026-10-19
+-- Purpose: Let the import pipeline upsert on the Nawy unit id and soft-deactivate
+--          units that drop out of a snapshot instead of wiping the tables
+
+-- brdata_properties already keys on the Nawy id (id); it only needs an active flag
+ALTER TABLE brdata_properties ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT TRUE;
+CREATE INDEX IF NOT EXISTS idx_brdata_properties_active ON brdata_properties (is_active) WHERE is_active = true;
+
+-- on_conflict=nawy_id needs a unique constraint; the simple schemas created nawy_id without one
+CREATE UNIQUE INDEX IF NOT EXISTS ux_nawy_properties_nawy_id ON nawy_properties (nawy_id);
+ALTER TABLE nawy_properties ADD COLUMN IF NOT EXISTS is_active BOOLEAN NOT NULL DEFAULT TRUE;
+
+COMMENT ON COLUMN brdata_properties.is_active IS 'False once the unit is missing from the latest snapshot';
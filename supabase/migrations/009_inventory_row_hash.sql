@@ -0,0 +1,12 @@
+-- Migration: Content fingerprints for diff sync
+-- Created: 2026-10-19
+-- Purpose: Store the pipeline's per-unit content hash so a refresh only sends changed units
+
+ALTER TABLE brdata_properties ADD COLUMN IF NOT EXISTS row_hash TEXT;
+ALTER TABLE nawy_properties ADD COLUMN IF NOT EXISTS row_hash TEXT;
+
+-- The sync reads key,row_hash,is_active in key order; a covering index keeps that an index-only scan
+CREATE INDEX IF NOT EXISTS idx_brdata_properties_row_hash ON brdata_properties (id) INCLUDE (row_hash, is_active);
+CREATE INDEX IF NOT EXISTS idx_nawy_properties_row_hash ON nawy_properties (nawy_id) INCLUDE (row_hash, is_active);
+
+COMMENT ON COLUMN brdata_properties.row_hash IS 'blake2b fingerprint of the normalised unit, written by the import pipeline';
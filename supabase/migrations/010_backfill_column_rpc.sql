@@ -0,0 +1,34 @@
+-- Migration: Set-based column backfill
+-- Created: 2026-10-19
+-- Purpose: Apply a chunk of computed (key, value) pairs to one column in a single statement,
+--          instead of one PATCH request per row
+
+CREATE OR REPLACE FUNCTION backfill_column(
+    target_table TEXT,
+    key_column TEXT,
+    value_column TEXT,
+    pairs JSONB
+)
+RETURNS INTEGER AS $$
+DECLARE
+    updated_rows INTEGER;
+BEGIN
+    -- jsonb_populate_recordset types each value with the table's own column type;
+    -- rows that already hold the value are skipped so reruns write nothing
+    EXECUTE format(
+        'UPDATE public.%1$I t SET %3$I = p.%3$I '
+        'FROM jsonb_populate_recordset(NULL::public.%1$I, $1) p '
+        'WHERE t.%2$I = p.%2$I AND t.%3$I IS DISTINCT FROM p.%3$I',
+        target_table, key_column, value_column
+    ) USING pairs;
+
+    GET DIAGNOSTICS updated_rows = ROW_COUNT;
+    RETURN updated_rows;
+END;
+$$ LANGUAGE plpgsql SECURITY INVOKER;
+
+-- Runs with the caller's privileges, so only roles that may UPDATE the table can backfill it
+REVOKE ALL ON FUNCTION backfill_column(TEXT, TEXT, TEXT, JSONB) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION backfill_column(TEXT, TEXT, TEXT, JSONB) TO authenticated, service_role;
+
+COMMENT ON FUNCTION backfill_column(TEXT, TEXT, TEXT, JSONB) IS 'Set one column from a JSON array of {key, value} objects; returns rows changed';
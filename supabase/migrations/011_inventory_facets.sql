@@ -0,0 +1,28 @@
+-- Migration: Precomputed filter-option facets
+-- Created: 2026-10-19
+-- Purpose: One small JSON document per inventory table with the distinct filter values and their counts,
+--          written by the import pipeline after each load and read by the filter modal in one request
+
+CREATE TABLE IF NOT EXISTS inventory_facets (
+  source_table TEXT PRIMARY KEY,
+  facets JSONB NOT NULL,
+  row_count INTEGER NOT NULL DEFAULT 0,
+  generated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE inventory_facets ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "public_can_read_facets" ON inventory_facets;
+CREATE POLICY "public_can_read_facets" ON inventory_facets FOR SELECT TO anon, authenticated USING (true);
+
+-- Publishing goes through the service role (or an admin session); browsers only read
+DROP POLICY IF EXISTS "admin_can_publish_facets" ON inventory_facets;
+CREATE POLICY "admin_can_publish_facets" ON inventory_facets FOR ALL TO authenticated
+  USING (EXISTS (SELECT 1 FROM profiles WHERE profiles.id = auth.uid() AND profiles.role = 'admin'))
+  WITH CHECK (EXISTS (SELECT 1 FROM profiles WHERE profiles.id = auth.uid() AND profiles.role = 'admin'));
+
+GRANT SELECT ON inventory_facets TO anon, authenticated;
+GRANT INSERT, UPDATE ON inventory_facets TO authenticated;
+GRANT ALL ON inventory_facets TO service_role;
+
+COMMENT ON TABLE inventory_facets IS 'Filter options per inventory table, computed by the import pipeline (brdata_processor.facets)';
@@ -0,0 +1,78 @@
+-- Migration: Incrementally maintained inventory statistics cube
+-- Created: 2026-10-19
+-- Purpose: Unit counts, price/area sums, min/max and percentiles overall and per developer, compound,
+--          area, property type and bedroom count, updated by the import pipeline from each sync's diff
+
+CREATE TABLE IF NOT EXISTS inventory_stats (
+  cell_key TEXT PRIMARY KEY,
+  source_table TEXT NOT NULL,
+  dimension TEXT NOT NULL,
+  value TEXT NOT NULL,
+  version SMALLINT NOT NULL DEFAULT 1,
+  unit_count INTEGER NOT NULL DEFAULT 0,
+  price_count INTEGER NOT NULL DEFAULT 0,
+  price_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+  price_min DOUBLE PRECISION,
+  price_max DOUBLE PRECISION,
+  price_p25 DOUBLE PRECISION,
+  price_p50 DOUBLE PRECISION,
+  price_p75 DOUBLE PRECISION,
+  price_p90 DOUBLE PRECISION,
+  area_count INTEGER NOT NULL DEFAULT 0,
+  area_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+  area_min DOUBLE PRECISION,
+  area_max DOUBLE PRECISION,
+  area_p50 DOUBLE PRECISION,
+  -- Log-bucket counts the pipeline adds to and subtracts from; dashboards never select this
+  sketch JSONB NOT NULL DEFAULT '{}',
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_inventory_stats_ranking
+  ON inventory_stats (source_table, dimension, unit_count DESC);
+
+ALTER TABLE inventory_stats ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "public_can_read_stats" ON inventory_stats;
+CREATE POLICY "public_can_read_stats" ON inventory_stats FOR SELECT TO anon, authenticated USING (true);
+
+DROP POLICY IF EXISTS "admin_can_publish_stats" ON inventory_stats;
+CREATE POLICY "admin_can_publish_stats" ON inventory_stats FOR ALL TO authenticated
+  USING (EXISTS (SELECT 1 FROM profiles WHERE profiles.id = auth.uid() AND profiles.role = 'admin'))
+  WITH CHECK (EXISTS (SELECT 1 FROM profiles WHERE profiles.id = auth.uid() AND profiles.role = 'admin'));
+
+GRANT SELECT ON inventory_stats TO anon, authenticated;
+GRANT INSERT, UPDATE ON inventory_stats TO authenticated;
+GRANT ALL ON inventory_stats TO service_role;
+
+-- What a dashboard reads: the 'all' cell plus the ten largest values of every dimension
+CREATE OR REPLACE VIEW inventory_stats_top WITH (security_invoker = true) AS
+SELECT
+  source_table,
+  dimension,
+  value,
+  rank,
+  unit_count,
+  price_count,
+  price_sum / NULLIF(price_count, 0) AS price_avg,
+  price_min,
+  price_max,
+  price_p25,
+  price_p50,
+  price_p75,
+  price_p90,
+  area_sum / NULLIF(area_count, 0) AS area_avg,
+  area_min,
+  area_max,
+  area_p50,
+  updated_at
+FROM (
+  SELECT *, ROW_NUMBER() OVER (PARTITION BY source_table, dimension ORDER BY unit_count DESC, value) AS rank
+  FROM inventory_stats
+  WHERE unit_count > 0
+) ranked
+WHERE rank <= 10;
+
+GRANT SELECT ON inventory_stats_top TO anon, authenticated;
+
+COMMENT ON TABLE inventory_stats IS 'Statistics cube per inventory table, maintained by the import pipeline (brdata_processor.stats_cube)';
@@ -0,0 +1,38 @@
+-- Migration: Log-scale histograms for the range sliders
+-- Created: 2026-10-19
+-- Purpose: Exact bounds plus binned counts of price, area and price per meter, overall and per area
+--          and compound, replaced by the import pipeline after each load
+
+CREATE TABLE IF NOT EXISTS inventory_histograms (
+  cell_key TEXT PRIMARY KEY,
+  source_table TEXT NOT NULL,
+  measure TEXT NOT NULL,
+  dimension TEXT NOT NULL,
+  value TEXT NOT NULL,
+  unit_count INTEGER NOT NULL DEFAULT 0,
+  min_value DOUBLE PRECISION,
+  max_value DOUBLE PRECISION,
+  -- counts[i] units fall in [edges[i], edges[i + 1]); edges are shared by every histogram of a measure
+  edges JSONB NOT NULL DEFAULT '[]',
+  counts JSONB NOT NULL DEFAULT '[]',
+  generated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_inventory_histograms_lookup
+  ON inventory_histograms (source_table, measure, dimension, value);
+
+ALTER TABLE inventory_histograms ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "public_can_read_histograms" ON inventory_histograms;
+CREATE POLICY "public_can_read_histograms" ON inventory_histograms FOR SELECT TO anon, authenticated USING (true);
+
+DROP POLICY IF EXISTS "admin_can_publish_histograms" ON inventory_histograms;
+CREATE POLICY "admin_can_publish_histograms" ON inventory_histograms FOR ALL TO authenticated
+  USING (EXISTS (SELECT 1 FROM profiles WHERE profiles.id = auth.uid() AND profiles.role = 'admin'))
+  WITH CHECK (EXISTS (SELECT 1 FROM profiles WHERE profiles.id = auth.uid() AND profiles.role = 'admin'));
+
+GRANT SELECT ON inventory_histograms TO anon, authenticated;
+GRANT INSERT, UPDATE, DELETE ON inventory_histograms TO authenticated;
+GRANT ALL ON inventory_histograms TO service_role;
+
+COMMENT ON TABLE inventory_histograms IS 'Range slider histograms per inventory table, computed by the import pipeline (brdata_processor.histograms)';
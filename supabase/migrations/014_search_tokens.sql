@@ -0,0 +1,41 @@
+-- Migration: Bilingual search tokens and the autocomplete dictionary
+-- Created: 2026-10-19
+-- Purpose: Serve property search from one trigram-indexed column of normalised Arabic/English terms
+--          instead of six ILIKE scans, and publish a prefix dictionary of names for the search box
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE brdata_properties ADD COLUMN IF NOT EXISTS search_tokens TEXT;
+ALTER TABLE nawy_properties ADD COLUMN IF NOT EXISTS search_tokens TEXT;
+
+-- Each query word becomes one search_tokens ILIKE '%word%' filter, which a trigram GIN index answers
+CREATE INDEX IF NOT EXISTS idx_brdata_properties_search_tokens
+  ON brdata_properties USING GIN (search_tokens gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_nawy_properties_search_tokens
+  ON nawy_properties USING GIN (search_tokens gin_trgm_ops);
+
+COMMENT ON COLUMN brdata_properties.search_tokens IS 'Normalised words and ~consonant skeletons of the unit''s names and codes, written by the import pipeline (brdata_processor.search_index)';
+COMMENT ON COLUMN nawy_properties.search_tokens IS 'Normalised words and ~consonant skeletons of the unit''s names and codes, written by the import pipeline (brdata_processor.search_index)';
+
+CREATE TABLE IF NOT EXISTS inventory_search (
+  source_table TEXT PRIMARY KEY,
+  dictionary JSONB NOT NULL,
+  entry_count INTEGER NOT NULL DEFAULT 0,
+  generated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE inventory_search ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "public_can_read_search" ON inventory_search;
+CREATE POLICY "public_can_read_search" ON inventory_search FOR SELECT TO anon, authenticated USING (true);
+
+DROP POLICY IF EXISTS "admin_can_publish_search" ON inventory_search;
+CREATE POLICY "admin_can_publish_search" ON inventory_search FOR ALL TO authenticated
+  USING (EXISTS (SELECT 1 FROM profiles WHERE profiles.id = auth.uid() AND profiles.role = 'admin'))
+  WITH CHECK (EXISTS (SELECT 1 FROM profiles WHERE profiles.id = auth.uid() AND profiles.role = 'admin'));
+
+GRANT SELECT ON inventory_search TO anon, authenticated;
+GRANT INSERT, UPDATE ON inventory_search TO authenticated;
+GRANT ALL ON inventory_search TO service_role;
+
+COMMENT ON TABLE inventory_search IS 'Autocomplete dictionary per inventory table, computed by the import pipeline (brdata_processor.search_index)';
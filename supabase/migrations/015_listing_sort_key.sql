@@ -0,0 +1,22 @@
+-- Migration: Unique listing sort key for cursor pagination
+-- Created: 2026-10-19
+-- Purpose: Let the inventory pages seek past the previous page's last sort_key instead of
+--          skipping OFFSET rows, so page N costs the same as page 1
+
+-- priority, latest inventory update and the unit key as fixed-width text, written by the import
+-- pipeline (brdata_processor.transform.sort_key); the key suffix makes it unique. Byte order (C)
+-- matches the digit order and compares faster than the database locale
+ALTER TABLE brdata_properties ADD COLUMN IF NOT EXISTS sort_key TEXT COLLATE "C";
+ALTER TABLE nawy_properties ADD COLUMN IF NOT EXISTS sort_key TEXT COLLATE "C";
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_brdata_properties_sort_key ON brdata_properties (sort_key);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_nawy_properties_sort_key ON nawy_properties (sort_key);
+
+-- The listing reads active units in descending sort_key order
+CREATE INDEX IF NOT EXISTS idx_brdata_properties_active_sort_key
+  ON brdata_properties (sort_key DESC) WHERE is_active;
+CREATE INDEX IF NOT EXISTS idx_nawy_properties_active_sort_key
+  ON nawy_properties (sort_key DESC) WHERE is_active;
+
+COMMENT ON COLUMN brdata_properties.sort_key IS 'Unique listing-order key (priority, last inventory update, id), written by the import pipeline';
+COMMENT ON COLUMN nawy_properties.sort_key IS 'Unique listing-order key (priority, last inventory update, nawy_id), written by the import pipeline';
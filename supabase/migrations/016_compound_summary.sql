@@ -0,0 +1,49 @@
+-- Migration: Per-compound summary table
+-- Created: 2026-10-19
+-- Purpose: Give Projects and Commissions one indexed row per compound (unit count, price and size
+--          ranges, bedroom/type/delivery mix, BR commission rate) instead of grouping 20k units
+--          in the browser
+
+-- Written by the import pipeline (brdata_processor.compound_summary) after every clean load; only
+-- compounds whose summary_hash changed are rewritten, and compounds that left the inventory are deleted
+CREATE TABLE IF NOT EXISTS compound_summary (
+  compound_key TEXT PRIMARY KEY,
+  compound TEXT NOT NULL,
+  developer TEXT,
+  area TEXT,
+  version INTEGER NOT NULL DEFAULT 1,
+  unit_count INTEGER NOT NULL DEFAULT 0,
+  price_min NUMERIC,
+  price_max NUMERIC,
+  price_per_meter_min NUMERIC,
+  price_per_meter_max NUMERIC,
+  price_per_meter_avg NUMERIC,
+  unit_area_min NUMERIC,
+  unit_area_max NUMERIC,
+  bedroom_mix JSONB NOT NULL DEFAULT '{}'::jsonb,
+  property_types JSONB NOT NULL DEFAULT '{}'::jsonb,
+  delivery_years JSONB NOT NULL DEFAULT '{}'::jsonb,
+  image TEXT,
+  commission_percent NUMERIC,
+  summary_hash TEXT NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_compound_summary_compound ON compound_summary (compound);
+CREATE INDEX IF NOT EXISTS idx_compound_summary_developer ON compound_summary (developer);
+
+ALTER TABLE compound_summary ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "public_can_read_compound_summary" ON compound_summary;
+CREATE POLICY "public_can_read_compound_summary" ON compound_summary FOR SELECT TO anon, authenticated USING (true);
+
+DROP POLICY IF EXISTS "admin_can_publish_compound_summary" ON compound_summary;
+CREATE POLICY "admin_can_publish_compound_summary" ON compound_summary FOR ALL TO authenticated
+  USING (EXISTS (SELECT 1 FROM profiles WHERE profiles.id = auth.uid() AND profiles.role = 'admin'))
+  WITH CHECK (EXISTS (SELECT 1 FROM profiles WHERE profiles.id = auth.uid() AND profiles.role = 'admin'));
+
+GRANT SELECT ON compound_summary TO anon, authenticated;
+GRANT INSERT, UPDATE, DELETE ON compound_summary TO authenticated;
+GRANT ALL ON compound_summary TO service_role;
+
+COMMENT ON TABLE compound_summary IS 'One row per compound with unit counts, ranges, mixes and the BR commission rate, written by the import pipeline (brdata_processor.compound_summary)';
@@ -0,0 +1,16 @@
+-- Migration: Per-unit BR commission
+-- Created: 2026-10-19
+-- Purpose: Let the listing pages filter and sort units by the commission they earn, without
+--          joining the commission sheet in the browser
+
+-- Written by the import pipeline (brdata_processor.commissions): the BR percentage matched from
+-- the compiled commission table and price_in_egp x percentage / 100. NULL when no rate matched
+ALTER TABLE brdata_properties ADD COLUMN IF NOT EXISTS commission_percent NUMERIC;
+ALTER TABLE brdata_properties ADD COLUMN IF NOT EXISTS commission_egp NUMERIC;
+
+-- Sorting by commission reads active units from the top of this index
+CREATE INDEX IF NOT EXISTS idx_brdata_properties_active_commission
+  ON brdata_properties (commission_egp DESC NULLS LAST) WHERE is_active;
+
+COMMENT ON COLUMN brdata_properties.commission_percent IS 'BR commission percentage matched from the commission sheet, written by the import pipeline';
+COMMENT ON COLUMN brdata_properties.commission_egp IS 'price_in_egp x commission_percent / 100, written by the import pipeline';
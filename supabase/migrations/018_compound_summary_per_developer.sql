@@ -0,0 +1,13 @@
+-- Migration: Compound summary per compound and developer
+-- Created: 2026-10-19
+-- Purpose: Stop same-named compounds of different developers ("Jirian" by Palm Hills and by
+--          Mountain View) collapsing into one summary row with one developer's commission rate
+
+-- compound_key is now a hash of (compound, developer) and rows carry version 2. Rows written
+-- under the old per-name keys are dropped here; the next import republishes every pair
+DROP INDEX IF EXISTS idx_compound_summary_compound;
+DELETE FROM compound_summary WHERE version < 2;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_compound_summary_compound_developer
+  ON compound_summary (compound, COALESCE(developer, ''));
+
+COMMENT ON TABLE compound_summary IS 'One row per compound and developer with unit counts, ranges, mixes and the BR commission rate, written by the import pipeline (brdata_processor.compound_summary)';
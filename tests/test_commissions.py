@@ -0,0 +1,59 @@
+"""CommissionMatcher against the compiled public/commission_rates.json
+
+    python -m pytest tests
+"""
+
+import os
+
+import pytest
+
+from brdata_processor.commissions import CommissionMatcher, load_commission_rows
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope='module')
+def matcher():
+    return CommissionMatcher(load_commission_rows(os.path.join(ROOT, 'public', 'commission_rates.json')))
+
+@pytest.mark.parametrize('compound', [
+    'Westown',   # skeleton of SODIC's Eastown
+    'Sea View',  # skeleton of Safia
+    'Jade',      # skeleton of Jayed
+    'Joya',      # skeleton of Gaia
+    'Ray',       # skeleton of Rare
+    'Roya',
+    'Tuya',      # skeleton of LMD's "it"
+    'The Way',
+    'Z',         # skeleton of Zoya
+])
+def test_loose_tiers_need_the_same_developer(matcher, compound):
+    assert matcher.resolve(compound, 'Some Other Developer') is None
+
+@pytest.mark.parametrize('compound, developer, tier, rate', [
+    ('Eastown', 'Some Other Developer', 'name', 3.0),
+    ('ZED West', 'Ora Developers', 'name', 3.0),
+    ('Silver Sands', 'Ora Developers', 'compact', 2.5),
+    ('Swan Lake Residence', 'Hassan Allam Properties', 'prefix', 2.5),
+])
+def test_exact_and_own_developer_matches(matcher, compound, developer, tier, rate):
+    match = matcher.resolve(compound, developer)
+    assert match is not None
+    assert (match.tier, match.rate) == (tier, rate)
+
+def test_prefix_of_another_developer_is_refused(matcher):
+    assert matcher.resolve('Swan Lake Residence', 'Some Other Developer') is None
+
+@pytest.mark.parametrize('developer', ['Orascom', 'Orascom Development'])
+def test_developer_tier_refuses_several_sheet_developers(matcher, developer):
+    # "orascom" also matches "orascomgouna" and "ora"
+    assert matcher.resolve(None, developer) is None
+
+def test_developer_tier_single_sheet_developer(matcher):
+    match = matcher.resolve('Not A Listed Compound', 'Palm Hills Developments')
+    assert match is not None
+    assert (match.tier, match.rate) == ('developer', 3.0)
+
+def test_same_name_resolved_per_developer(matcher):
+    assert matcher.resolve('Jirian', 'Palm Hills').rate == 3.0
+    assert matcher.resolve('Jirian', 'Mountain View').rate == 4.5
+    assert matcher.resolve('Jirian', 'Some Other Developer') is None
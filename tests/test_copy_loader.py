@@ -0,0 +1,141 @@
+"""COPY merge and shadow-table swap against a real Postgres
+
+Runs only when DATABASE_URL points at a Postgres the user may create databases
+on; each test gets a scratch database that is dropped afterwards.
+
+    DATABASE_URL=postgresql://postgres@localhost/postgres python -m pytest tests
+"""
+
+import os
+import uuid
+
+import pandas as pd
+import pytest
+
+psycopg = pytest.importorskip('psycopg')
+
+from psycopg import sql
+from psycopg.conninfo import make_conninfo
+
+from brdata_processor.copy_loader import copy_csv_to_postgres
+from brdata_processor.swap_loader import SwapAborted, swap_load_csv
+
+ROWS = 20
+READER = 'brdata_test_reader'
+
+# correct_table_structure.sql's columns used here, plus migrations 008, 009, 014, 015 and 017
+SCHEMA = """
+CREATE TABLE brdata_properties (
+    id BIGINT PRIMARY KEY,
+    unit_id TEXT,
+    sale_type TEXT,
+    unit_area NUMERIC(10,2),
+    number_of_bedrooms INTEGER,
+    price_in_egp NUMERIC(15,2),
+    currency TEXT,
+    is_launch BOOLEAN,
+    payment_plans JSONB,
+    compound JSONB,
+    area JSONB,
+    developer JSONB,
+    property_type JSONB,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    row_hash TEXT,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    search_tokens TEXT,
+    sort_key TEXT COLLATE "C",
+    commission_percent NUMERIC,
+    commission_egp NUMERIC
+);
+CREATE INDEX idx_brdata_properties_price ON brdata_properties (price_in_egp);
+"""
+
+@pytest.fixture
+def database_url():
+    url = os.getenv('DATABASE_URL')
+    if not url:
+        pytest.skip("set DATABASE_URL to a Postgres to run the COPY loader tests")
+    name = f'brdata_test_{uuid.uuid4().hex[:8]}'
+    with psycopg.connect(url, autocommit=True) as admin:
+        admin.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(name)))
+        if not admin.execute("SELECT 1 FROM pg_roles WHERE rolname = %s", (READER,)).fetchone():
+            admin.execute(sql.SQL("CREATE ROLE {}").format(sql.Identifier(READER)))
+    scratch = make_conninfo(url, dbname=name)
+    with psycopg.connect(scratch, autocommit=True) as conn:
+        conn.execute(SCHEMA)
+    try:
+        yield scratch
+    finally:
+        with psycopg.connect(url, autocommit=True) as admin:
+            admin.execute(sql.SQL("DROP DATABASE {} WITH (FORCE)").format(sql.Identifier(name)))
+
+def _snapshot(path, ids=range(1, ROWS + 1), repriced=()):
+    rows = [{
+        'id': i, 'unit_id': f'U{i}', 'sale_type': 'primary', 'unit_area': 100 + i, 'number_of_bedrooms': 2,
+        'price_in_egp': 1_000_000 + i + (5_000 if i in repriced else 0), 'currency': 'EGP', 'is_launch': False,
+        'payment_plans': str([{'years': 8, 'down_payment': 10}]),
+        'compound': str({'id': 1, 'name': 'Eastown'}), 'area': str({'id': 3, 'name': 'New Cairo'}),
+        'developer': str({'id': 2, 'name': 'SODIC'}), 'property_type': str({'id': 4, 'name': 'Apartment'}),
+    } for i in ids]
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+def _fetch(url, query, *args):
+    with psycopg.connect(url) as conn:
+        return conn.execute(query, args or None).fetchall()
+
+def test_copy_merges_only_new_and_changed_rows(database_url, tmp_path):
+    first = copy_csv_to_postgres(_snapshot(tmp_path / 'a.csv'), database_url=database_url)
+    assert (first.rows_copied, first.rows_merged, first.rows_deactivated) == (ROWS, ROWS, 0)
+
+    again = copy_csv_to_postgres(_snapshot(tmp_path / 'a.csv'), database_url=database_url)
+    assert (again.rows_copied, again.rows_merged, again.rows_deactivated) == (ROWS, 0, 0)
+
+    changed = copy_csv_to_postgres(_snapshot(tmp_path / 'b.csv', ids=range(2, ROWS + 1), repriced={7}),
+                                   database_url=database_url)
+    assert (changed.rows_merged, changed.rows_deactivated) == (1, 1)
+    assert _fetch(database_url, "SELECT id FROM brdata_properties WHERE NOT is_active") == [(1,)]
+    assert _fetch(database_url, "SELECT price_in_egp FROM brdata_properties WHERE id = 7") == [(1_005_007,)]
+    assert _fetch(database_url, "SELECT count(*) FROM brdata_properties WHERE search_tokens LIKE '%eastown%' "
+                                "AND sort_key IS NOT NULL AND commission_percent IS NOT NULL") == [(ROWS,)]
+
+def test_swap_keeps_grants_and_views(database_url, tmp_path):
+    copy_csv_to_postgres(_snapshot(tmp_path / 'a.csv'), database_url=database_url)
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        conn.execute(sql.SQL("GRANT SELECT ON brdata_properties TO {}").format(sql.Identifier(READER)))
+        conn.execute("CREATE VIEW active_units WITH (security_invoker = true) AS "
+                     "SELECT id, price_in_egp FROM brdata_properties WHERE is_active")
+        conn.execute(sql.SQL("GRANT SELECT ON active_units TO {}").format(sql.Identifier(READER)))
+
+    report = swap_load_csv(_snapshot(tmp_path / 'b.csv', ids=range(2, ROWS + 1), repriced={7}),
+                           database_url=database_url)
+    assert (report.rows_loaded, report.rows_carried_inactive, report.indexes_built) == (ROWS - 1, 1, 2)
+
+    assert _fetch(database_url, "SELECT count(*), count(*) FILTER (WHERE is_active) FROM brdata_properties") == \
+        [(ROWS, ROWS - 1)]
+    assert _fetch(database_url, "SELECT price_in_egp FROM active_units WHERE id = 7") == [(1_005_007,)]
+    assert _fetch(database_url, "SELECT reloptions FROM pg_class WHERE oid = 'active_units'::regclass") == \
+        [(['security_invoker=true'],)]
+    for relation in ('brdata_properties', 'active_units'):
+        assert _fetch(database_url, "SELECT has_table_privilege(%s, %s, 'SELECT')", READER, relation) == [(True,)]
+    # The view reads the swapped-in table, and the old one is gone
+    assert _fetch(database_url, "SELECT DISTINCT d.refobjid::regclass::text FROM pg_depend d "
+                                "JOIN pg_rewrite r ON r.oid = d.objid "
+                                "WHERE r.ev_class = 'active_units'::regclass AND d.refobjid <> r.ev_class") == \
+        [('brdata_properties',)]
+    assert _fetch(database_url, "SELECT to_regclass('brdata_properties_old')") == [(None,)]
+
+@pytest.mark.parametrize('dependent', [
+    "CREATE MATERIALIZED VIEW unit_prices AS SELECT id, price_in_egp FROM brdata_properties",
+    "CREATE TABLE saved_units (unit_id BIGINT REFERENCES brdata_properties (id))",
+])
+def test_swap_refuses_dependents_bound_to_the_table(database_url, tmp_path, dependent):
+    copy_csv_to_postgres(_snapshot(tmp_path / 'a.csv'), database_url=database_url)
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        conn.execute(dependent)
+        table_oid = conn.execute("SELECT 'brdata_properties'::regclass::oid").fetchone()[0]
+
+    with pytest.raises(SwapAborted):
+        swap_load_csv(_snapshot(tmp_path / 'b.csv', repriced={7}), database_url=database_url)
+    assert _fetch(database_url, "SELECT 'brdata_properties'::regclass::oid") == [(table_oid,)]
+    assert _fetch(database_url, "SELECT price_in_egp FROM brdata_properties WHERE id = 7") == [(1_000_007,)]
@@ -0,0 +1,67 @@
+"""ConcurrentUploader against the local PostgREST stand-in
+
+    python -m pytest tests
+"""
+
+import pytest
+
+from brdata_processor.local_rest import FaultProfile, LocalRestServer
+from brdata_processor.uploader import ConcurrentUploader
+
+ROWS = 1000
+
+def _rows(poison=()):
+    return [{'id': i, 'currency': 'BAD' if i in poison else 'EGP', 'price_in_egp': 1000 + i} for i in range(ROWS)]
+
+@pytest.fixture
+def server():
+    with LocalRestServer(profile=FaultProfile(reject_values={'currency': 'BAD'})) as server:
+        yield server
+
+def _uploader(server):
+    return ConcurrentUploader('brdata_properties', base_url=server.url, api_key='local',
+                              requests_per_second=None, backoff=0, adaptive=False)
+
+def test_single_poison_row_is_dead_lettered(server):
+    result = _uploader(server).post_batch(0, _rows(poison={617}))
+
+    assert result.ok
+    assert [letter['row']['id'] for letter in result.dead_letters] == [617]
+    assert result.dead_letters[0]['status_code'] == 400
+    assert server.rows_written == ROWS - 1
+    assert result.requests <= 2 * 10 + 1
+
+def test_poison_rows_on_both_sides_are_isolated(server):
+    result = _uploader(server).post_batch(0, _rows(poison={3, 900}))
+
+    assert result.ok
+    assert sorted(letter['row']['id'] for letter in result.dead_letters) == [3, 900]
+    assert server.rows_written == ROWS - 2
+
+def test_error_every_row_hits_fails_the_batch(server):
+    result = _uploader(server).post_batch(0, _rows(poison=range(ROWS)))
+
+    assert not result.ok
+    assert result.status_code == 400
+    assert result.dead_letters == []
+    assert server.rows_written == 0
+    assert result.requests <= 5
+
+def test_all_rows_rejected_one_by_one_fails_the_batch(server):
+    rows = _rows(poison={0, 1})[:2]
+    report = _uploader(server).upload([rows])
+
+    assert report.failed_batches == [0]
+    assert report.rows_failed == 2
+    assert report.rows_rejected == 0
+    assert 'all 2 rows rejected' in report.results[0].error
+
+def test_timed_out_insert_is_not_resent():
+    with LocalRestServer(profile=FaultProfile(latency=0.5)) as server:
+        uploader = ConcurrentUploader('brdata_properties', base_url=server.url, api_key='local',
+                                      requests_per_second=None, backoff=0, timeout=0.1)
+        result = uploader.post_batch(0, _rows())
+
+    assert not result.ok
+    assert result.requests == 1
+    assert 'may have landed' in result.error
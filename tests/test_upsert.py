@@ -0,0 +1,31 @@
+"""Key-paged reads against the local PostgREST stand-in
+
+    python -m pytest tests
+"""
+
+import pytest
+
+from brdata_processor.local_rest import FaultProfile, LocalRestServer
+from brdata_processor.upsert import fetch_keyed_rows, fetch_keys, fetch_rows
+
+ROWS = 2500
+
+@pytest.fixture(params=[None, 250], ids=['uncapped', 'max-rows-250'])
+def server(request):
+    with LocalRestServer(profile=FaultProfile(max_rows=request.param)) as server:
+        server.store.insert('brdata_properties', [{'id': i, 'is_active': i % 3 != 0} for i in range(1, ROWS + 1)],
+                            None, None)
+        yield server
+
+def test_scan_reads_every_page(server):
+    assert fetch_keys('brdata_properties', 'id', base_url=server.url, api_key='local') == set(range(1, ROWS + 1))
+
+def test_scan_keeps_filters_and_resumes(server):
+    rows = list(fetch_rows('brdata_properties', 'id', ['is_active'], {'is_active': 'eq.false'},
+                           server.url, 'local', after=1500))
+    assert [row['id'] for row in rows] == list(range(1503, ROWS + 1, 3))
+
+def test_keyed_rows_stay_within_their_keys(server):
+    keys = list(range(5, ROWS, 7))
+    rows = fetch_keyed_rows('brdata_properties', 'id', keys, ['is_active'], server.url, 'local')
+    assert sorted(row['id'] for row in rows) == keys